@@ -11,35 +11,40 @@ import time
 
 from modules.HN import HighwayNetwork
 
-start_time = time.time()
-
-parser = argparse.ArgumentParser()
-parser.add_argument("-s", "--subset", help="subset to certain projects",
-                    action="store_true")
-args = parser.parse_args()
-
-# check if subset = True
-if args.subset:
-    sys_path = sys.argv[0]
-    abs_path = os.path.abspath(sys_path)
-    mfhrn_path = os.path.dirname(os.path.dirname(os.path.dirname(abs_path)))
-    subset_path = os.path.join(mfhrn_path, "input", "1_travel", "subset_hwy_projects.csv")
-
-    if not os.path.exists(subset_path):
-        sys.exit("Please provide a csv of the projects to subset to as subset_hwy_projects.csv.")
-
-# build highway networks
-HN = HighwayNetwork()
-HN.create_base_hwy()
-HN.check_hwy_fcs()
-HN.check_hwyproj_coding_table()
-HN.build_future_hwys()
-
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
-
-print(f"{minutes}m {seconds}s to execute.")
-
-print("Done")
\ No newline at end of file
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--subset", help="subset to certain projects",
+                        action="store_true")
+    args = parser.parse_args()
+
+    # check if subset = True
+    if args.subset:
+        sys_path = sys.argv[0]
+        abs_path = os.path.abspath(sys_path)
+        mfhrn_path = os.path.dirname(os.path.dirname(os.path.dirname(abs_path)))
+        subset_path = os.path.join(mfhrn_path, "input", "1_travel", "subset_hwy_projects.csv")
+
+        if not os.path.exists(subset_path):
+            sys.exit("Please provide a csv of the projects to subset to as subset_hwy_projects.csv.")
+
+    # build highway networks
+    HN = HighwayNetwork()
+    HN.create_base_hwy()
+    HN.check_hwy_fcs()
+    HN.check_hwyproj_coding_table()
+    HN.build_future_hwys()
+
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
+
+    print(f"{minutes}m {seconds}s to execute.")
+
+    print("Done")
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,21 @@
 import os
 import sys
 import shutil
-import arcpy
-import pandas as pd
 from datetime import date
 import math
 import time
+import argparse
 
+from modules.lazy_imports import pd
+from modules.storage import get_storage
 from modules.util_functions import create_directional_hwy_records
+from modules.manifest import (hash_table, hash_config, hash_file, 
+                              read_manifest, write_manifest, find_changed_inputs)
+from modules.output_sinks import OUTPUT_MODES, make_sink, sink_output_exists, remove_sink_output
 
 class EmmeHighwayNetwork:
 
-    def __init__(self):
+    def __init__(self, output_mode = "plain"):
 
         # get paths 
         sys_path = sys.argv[0]
@@ -30,6 +34,12 @@ class EmmeHighwayNetwork:
 
         self.years_dict = pd.read_csv(years_csv_path).set_index("year")["scenario"].to_dict()
 
+        # plain, gzip, zstd, tar or zip (see modules/output_sinks.py)
+        self.output_mode = output_mode
+
+        # arcpy or gpkg (see modules/storage.py)
+        self.storage = get_storage()
+
         # 212 + 221 are not in here bc of TOD restrictions
         self.hwymode_dict = {}
         self.hwymode_dict["ASH"] = ["201", "218"]
@@ -48,47 +58,119 @@ class EmmeHighwayNetwork:
 
     # MAIN METHOD ---------------------------------------------------------------------------------
 
-    def generate_hwy_files(self):
+    def generate_hwy_files(self, full = False):
 
         print("Generating highway files...")
 
         years_dict = self.years_dict
-        arcpy.env.workspace = os.path.join(self.mhn_out_folder, "MHN_all.gdb")
+        self.storage.workspace = os.path.join(self.mhn_out_folder, "MHN_all.gdb")
 
         emme_hwy_folder = os.path.join(self.mhn_out_folder, "highway")
+        manifest_path = os.path.join(emme_hwy_folder, "manifest.json")
 
-        # wipe out the highway folder
-        if os.path.isdir(emme_hwy_folder) == True:
+        # wipe out the highway folder if a full rebuild is requested
+        if full == True and os.path.isdir(emme_hwy_folder) == True:
             shutil.rmtree(emme_hwy_folder)
-        os.mkdir(emme_hwy_folder)
+
+        if os.path.isdir(emme_hwy_folder) == False:
+            os.mkdir(emme_hwy_folder)
+
+        manifest = read_manifest(manifest_path)
+        outputs = manifest["outputs"]
+
+        # remove scenarios which are no longer requested
+        scenarios = [str(scenario) for scenario in years_dict.values()]
+        for scenario in list(outputs.keys()):
+            if scenario not in scenarios:
+
+                remove_sink_output(os.path.join(emme_hwy_folder, scenario))
+
+                del outputs[scenario]
+
+        # inputs shared by every scenario
+        node_hash = hash_table("hwynode_all", storage = self.storage)
+        config_hash = self.get_config_hash()
+
+        skipped = []
 
         for year in years_dict:
 
             scenario = years_dict[year]
 
             emme_scen_folder = os.path.join(emme_hwy_folder, str(scenario))
-            os.mkdir(emme_scen_folder)
 
-            self.write_ln_files(year, emme_scen_folder)
-            self.write_linkshape_file(year, emme_scen_folder)
+            current_inputs = {
+                "year": year,
+                "links": hash_table(f"HWYLINK_{year}", storage = self.storage),
+                "nodes": node_hash,
+                "config": config_hash
+            }
+
+            reasons = find_changed_inputs(outputs.get(str(scenario)), current_inputs)
+
+            if sink_output_exists(self.output_mode, emme_scen_folder) == False:
+                reasons.append("output missing")
+
+            if len(reasons) == 0:
+                skipped.append(scenario)
+                print(f"Skipping scenario {scenario} (inputs unchanged).")
+                continue
+
+            print(f"Regenerating scenario {scenario} ({', '.join(reasons)}).")
+
+            # forget the scenario before touching its output, so a rebuild that crashes
+            # partway is regenerated next time instead of skipped
+            outputs.pop(str(scenario), None)
+            write_manifest(manifest_path, manifest)
+
+            remove_sink_output(emme_scen_folder)
+
+            with make_sink(self.output_mode, emme_scen_folder) as sink:
+                self.write_ln_files(year, sink)
+                self.write_linkshape_file(year, sink)
+
+            # record after each scenario so an interrupted run keeps its progress
+            outputs[str(scenario)] = current_inputs
+            write_manifest(manifest_path, manifest)
+
+        write_manifest(manifest_path, manifest)
+
+        if len(skipped) > 0:
+            skipped_string = ", ".join([str(scenario) for scenario in skipped])
+            print(f"Skipped scenarios with unchanged inputs: {skipped_string}")
 
         print("Highway files generated.\n")
 
     # HELPER METHODS ------------------------------------------------------------------------------
 
+    # helper method that hashes the exporter configuration
+    # (the mode table + the code that writes the files - this script, the output sinks,
+    # the storage backends + the directional link records - so that changes force a rebuild)
+    def get_config_hash(self):
+
+        modules_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules")
+
+        config = {
+            "hwymode_dict": self.hwymode_dict,
+            "output_mode": self.output_mode,
+            "source": hash_file(os.path.abspath(__file__)),
+            "modules": {module_file: hash_file(os.path.join(modules_folder, module_file))
+                        for module_file in ["output_sinks.py", "storage.py", "util_functions.py"]}
+        }
+
+        return hash_config(config)
+
     # helper method that writes highway link and node files
-    def write_ln_files(self, year, folder_path):
+    def write_ln_files(self, year, sink):
 
         scenario = self.years_dict[year]
 
         print(f"Writing link and node files for scenario {scenario}...")
 
         hwynode_fc = "hwynode_all"
-        node_fields = [f.name for f in arcpy.ListFields(hwynode_fc) if (f.type!="Geometry")]
+        node_fields = self.storage.field_names(hwynode_fc)
         node_fields += ["SHAPE@X", "SHAPE@Y"]
-        hwynode_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(hwynode_fc, node_fields)], 
-            columns = node_fields)
+        hwynode_df = self.storage.read_table(hwynode_fc, node_fields)
         
         max_zone_set = set(hwynode_df.zone17.to_list())
         max_zone_set.remove(9999)
@@ -98,7 +180,8 @@ class EmmeHighwayNetwork:
 
         hwylink_fc = f"HWYLINK_{year}"
         hwylink_records = create_directional_hwy_records(hwylink_fc, 
-                                                         where_clause = "NEW_BASELINK = '1'")
+                                                         where_clause = "NEW_BASELINK = '1'",
+                                                         storage = self.storage)
         
         hwylink_df = pd.DataFrame(hwylink_records).sort_values(["INODE", "JNODE"])
         hwylink_df = hwylink_df[hwylink_df.MODES != "400"] # 400 is only for transit networks
@@ -127,13 +210,11 @@ class EmmeHighwayNetwork:
             hwylink_tod_dict = hwylink_tod_df.set_index(["INODE", "JNODE"]).to_dict("index")
             node_set = set(hwylink_tod_df.INODE.to_list()) | set(hwylink_tod_df.JNODE.to_list())
 
-            l1_file_path = os.path.join(folder_path, f"{scenario}0{tod}.l1")
-            l2_file_path = os.path.join(folder_path, f"{scenario}0{tod}.l2")
-            l1_file = open(l1_file_path, "a")
+            l1_file = sink.open(f"{scenario}0{tod}.l1")
             l1_file.write("c a,i-node,j-node,length,modes,type,lanes,vdf\n")
             l1_file.write("t links init\n")
 
-            l2_file = open(l2_file_path, "a")
+            l2_file = sink.open(f"{scenario}0{tod}.l2")
             l2_file.write("c i-node,j-node,@speed,@width,@parkl,@cltl,@toll,@sigic,@rrx,@tipid\n")
 
             for link in hwylink_tod_dict:
@@ -239,13 +320,11 @@ class EmmeHighwayNetwork:
             l2_file.close()
 
             # NODES
-            n1_file_path = os.path.join(folder_path, f"{scenario}0{tod}.n1")
-            n2_file_path = os.path.join(folder_path, f"{scenario}0{tod}.n2")
-            n1_file = open(n1_file_path, "a")
+            n1_file = sink.open(f"{scenario}0{tod}.n1")
             n1_file.write("c a,node,x,y\n")
             n1_file.write("t nodes init\n")
 
-            n2_file = open(n2_file_path, "a")
+            n2_file = sink.open(f"{scenario}0{tod}.n2")
             n2_file.write("c i-node,@zone,@atype,@imarea\n")
 
             for node in node_set:
@@ -273,7 +352,7 @@ class EmmeHighwayNetwork:
             n2_file.close()
 
     # helper method that writes highway linkshape file
-    def write_linkshape_file(self, year, folder_path):
+    def write_linkshape_file(self, year, sink):
 
         scenario = self.years_dict[year]
 
@@ -281,66 +360,77 @@ class EmmeHighwayNetwork:
 
         today = date.today().strftime("%d%b%y").upper()
 
-        linkshape_file_path = os.path.join(folder_path, "highway.linkshape")
-        linkshape_file = open(linkshape_file_path, "a")
+        linkshape_file = sink.open("highway.linkshape")
 
         linkshape_file.write(f"c HIGHWAY LINK SHAPE FILE FOR SCENARIO {scenario}\n")
         linkshape_file.write(f"c {today}\n")
         linkshape_file.write("t linkvertices\n")
 
         hwylink_fc = f"HWYLINK_{year}"
-        fields = ["ANODE", "BNODE", "DIRECTIONS", "SHAPE@"]
+        fields = ["ANODE", "BNODE", "DIRECTIONS"]
 
         where_clause = "NEW_BASELINK = '1'"
-        with arcpy.da.SearchCursor(hwylink_fc, fields, where_clause) as scursor:
-            for row in scursor:
-                
-                anode = row[0]
-                bnode = row[1]
-                dirs = row[2]
+        link_df, vertices, offsets = self.storage.read_geometry(hwylink_fc, fields, where_clause)
 
-                point_list = []
+        link_records = link_df.to_records(index = False).tolist()
+        vertex_list = vertices.tolist()
+        offset_list = offsets.tolist()
 
-                for part in row[3]:
-                    for point in part:
+        for index, row in enumerate(link_records):
+            
+            anode = row[0]
+            bnode = row[1]
+            dirs = row[2]
 
-                        point_list.append((point.X, point.Y))
+            point_list = vertex_list[offset_list[index]: offset_list[index + 1]]
 
-                linkshape_file.write(f"r {anode} {bnode}\n")
-                for i in range(0, len(point_list)):
+            linkshape_file.write(f"r {anode} {bnode}\n")
+            for i in range(0, len(point_list)):
 
-                    point= point_list[i]
-                    x = point[0]
-                    y = point[1]
+                point= point_list[i]
+                x = point[0]
+                y = point[1]
 
-                    point_string = f"a {anode} {bnode} {i + 1} {x} {y}\n"
-                    linkshape_file.write(point_string)
+                point_string = f"a {anode} {bnode} {i + 1} {x} {y}\n"
+                linkshape_file.write(point_string)
 
-                if dirs == "1":
-                    continue
+            if dirs == "1":
+                continue
 
-                linkshape_file.write(f"r {bnode} {anode}\n")
-                for i in range(1, len(point_list) + 1):
+            linkshape_file.write(f"r {bnode} {anode}\n")
+            for i in range(1, len(point_list) + 1):
 
-                    point = point_list[-i]
-                    x = point[0]
-                    y = point[1]
+                point = point_list[-i]
+                x = point[0]
+                y = point[1]
 
-                    point_string = f"a {bnode} {anode} {i} {x} {y}\n"
-                    linkshape_file.write(point_string)
+                point_string = f"a {bnode} {anode} {i} {x} {y}\n"
+                linkshape_file.write(point_string)
 
         linkshape_file.close()
 
-start_time = time.time()
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--full", help="regenerate every scenario, ignoring the manifest",
+                        action="store_true")
+    parser.add_argument("-m", "--output_mode", help="how to write the emme files",
+                        choices=OUTPUT_MODES, default="plain")
+    args = parser.parse_args()
+
+    EHN = EmmeHighwayNetwork(output_mode = args.output_mode)
+    EHN.generate_hwy_files(full = args.full)
 
-EHN = EmmeHighwayNetwork()
-EHN.generate_hwy_files()
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
 
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
+    print(f"{minutes}m {seconds}s to execute.")
 
-print(f"{minutes}m {seconds}s to execute.")
+    print("Done")
 
-print("Done")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
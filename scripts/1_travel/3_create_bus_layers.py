@@ -3,22 +3,38 @@
 ## Author: npeterson
 ## Translated + Updated by ccai (2025)
 
+import io
 import os
 import sys
 import math
 import time
 import shutil
-import arcpy
-import pandas as pd
-import networkx as nx
-
-pd.options.mode.chained_assignment = None
-
+import argparse
+import multiprocessing
+
+from modules.lazy_imports import arcpy, np, pd
+from modules.storage import get_storage, require_arcpy
+from modules.run_clustering import cluster_runs, pack_itineraries
+from modules.itinerary_store import ITIN_COLUMNS, Itinerary, ItineraryStore
+from modules.gap_router import ROUTERS, GapRouter
+from modules.csr_graph import CSRGraph
+from modules.node_index import NodeIndex, ZoneNodeIndex
+from modules.link_store import LinkStore
+from modules.itinerary_writer import ItineraryWriter
+from modules.bus_coding import parse_codes, FutureCoding
+from modules.headways import collapsed_run_headways, mode_headways, replaced_route_headways, future_headways
+from modules.shared_arrays import (SharedArrays, attach_arrays, prefix_arrays, unprefix_arrays,
+                                   table_to_arrays, table_from_arrays)
 from modules.util_functions import create_directional_hwy_records
 
 class BusNetwork:
 
-    def __init__(self):
+    # workers > 1 runs the scenario + TOD units in a pool of processes
+    # shared = spec of the shared inputs (in a worker process - see init_bus_worker)
+    # qa_routes = True also writes a merged route polyline per line for QA maps
+    # compare_hops = True also reports the hop count paths of the gaps (see modules/gap_router.py)
+    def __init__(self, router = "dijkstra", workers = 1, shared = None, qa_routes = False,
+                 compare_hops = False):
 
         # get paths 
         sys_path = sys.argv[0]
@@ -47,22 +63,22 @@ class BusNetwork:
 
         self.tod_dict = {
             1: {"description": "6 PM - 6 AM", # overnight
-                "where_clause": "STARTHOUR >= 18 OR STARTHOUR < 6",
+                "start_hour": 18, "end_hour": 6, # STARTHOUR >= 18 OR STARTHOUR < 6
                 "maxtime": 720,
                 "hwy_tod": 1,
                 "hdwy_mult": 4},
             2: {"description": "6 AM - 9 AM", # AM peak
-                "where_clause": "STARTHOUR >= 6 AND STARTHOUR < 9",
+                "start_hour": 6, "end_hour": 9, # STARTHOUR >= 6 AND STARTHOUR < 9
                 "maxtime": 180,
                 "hwy_tod": 3,
                 "hdwy_mult": 1},
             3: {"description": "9 AM - 4 PM", # midday
-                "where_clause": "STARTHOUR >= 9 AND STARTHOUR < 16", 
+                "start_hour": 9, "end_hour": 16, # STARTHOUR >= 9 AND STARTHOUR < 16
                 "maxtime": 420,
                 "hwy_tod": 5,
                 "hdwy_mult": 3},
             4: {"description": "4 PM - 6 PM", # PM peak
-                "where_clause": "STARTHOUR >= 16 AND STARTHOUR < 18",
+                "start_hour": 16, "end_hour": 18, # STARTHOUR >= 16 AND STARTHOUR < 18
                 "maxtime": 120,
                 "hwy_tod": 7,
                 "hdwy_mult": 1}
@@ -70,8 +86,45 @@ class BusNetwork:
 
         self.default_speed = 30
 
-        self.node_dict = self.build_hwy_node_dict()
-        self.link_dict = self.build_hwy_link_dict()
+        # routes itinerary gaps on the TOD networks (see modules/gap_router.py)
+        self.router = router
+        self.compare_hops = compare_hops
+        self.gap_router = GapRouter(method = router, compare_hops = compare_hops)
+
+        # arcpy only - the bus layers still run arcpy geoprocessing (see modules/storage.py)
+        self.storage = get_storage()
+        require_arcpy(self.storage, "3_create_bus_layers.py")
+
+        self.itin_folder = os.path.join(self.bn_out_folder, "collapsed_itins")
+
+        # collapsed itins + runs already loaded: (which_bus, tod) -> store / df
+        self.rep_itins = {}
+        self.rep_runs = {}
+        self.future_coding = None
+
+        # scenario + TOD units (see create_bus_unit)
+        self.workers = workers
+        self.unit_folder = os.path.join(self.bn_out_folder, "units")
+        self.unit_gdb_folder = None
+        self.scen_network = None
+
+        if shared == None:
+
+            self.node_dict = self.build_hwy_node_dict()
+
+            # nearest node lookups (see modules/node_index.py)
+            self.node_index = NodeIndex(self.node_dict.keys(),
+                                        [value["X"] for value in self.node_dict.values()],
+                                        [value["Y"] for value in self.node_dict.values()])
+
+            self.link_dict = self.build_hwy_link_dict()
+
+        else:
+            self.attach_shared_inputs(shared)
+
+        # bulk itinerary inserts from the link vertex arrays (see modules/itinerary_writer.py)
+        self.itin_writer = ItineraryWriter(self.link_dict, self.storage)
+        self.qa_routes = qa_routes
 
         self.error_file_1 = os.path.join(self.bn_out_folder, "error_file_1.txt")
         self.error_file_2 = os.path.join(self.bn_out_folder, "error_file_2.txt")
@@ -102,50 +155,34 @@ class BusNetwork:
         arcpy.management.CreateFileGDB(bn_out_folder, cr_gdb_name)
         cr_gdb = os.path.join(bn_out_folder, cr_gdb_name)
 
-        # copy fcs into gdb
-        self.copy_bus_fcs("bus_base")
-        self.copy_bus_fcs("bus_current")
+        # copy future fc into gdb
         self.copy_bus_fcs("bus_future")
 
-        itin_fields = ["TRANSIT_LINE", "ITIN_ORDER", "ITIN_A", "ITIN_B", "ABB",
-                       "DWELL_CODE", "LINE_SERV_TIME", "TTF"]
+        # read gtfs runs once - partitioned by TOD in memory
+        base_runs_df = self.read_gtfs_runs("base")
+        current_runs_df = self.read_gtfs_runs("current")
+
+        # input itins have no NOTES
+        itin_columns = [column for column in ITIN_COLUMNS if column != "NOTES"]
         
-        # get dfs + dict for bus base itin
+        # get itin store for bus base itin
         base_itin = os.path.join(mhn_in_gdb, "bus_base_itin")
-        base_itin_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(base_itin, itin_fields)],
-            columns = itin_fields
-        ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
-
-        base_itin_dict = {k: v.to_dict(orient='records') for k, v in base_itin_df.groupby("TRANSIT_LINE")}
-        base_rf_dict = self.reformat_gtfs_feed(base_itin_dict)
+        base_itin_store = ItineraryStore.read(base_itin, itin_columns, storage = self.storage)
+        base_seg_dict, base_num_seg_dict = self.reformat_gtfs_feed(base_itin_store)
 
-        # get dfs + dicts for bus current itin
+        # get itin store for bus current itin
         current_itin = os.path.join(mhn_in_gdb, "bus_current_itin")
-        current_itin_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(current_itin, itin_fields)],
-            columns = itin_fields
-        ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
+        current_itin_store = ItineraryStore.read(current_itin, itin_columns, storage = self.storage)
+        current_seg_dict, current_num_seg_dict = self.reformat_gtfs_feed(current_itin_store)
 
-        current_itin_dict = {k: v.to_dict(orient='records') for k, v in current_itin_df.groupby("TRANSIT_LINE")}
-        current_rf_dict = self.reformat_gtfs_feed(current_itin_dict)
-
-        # get dfs + dicts for bus future itin
+        # get itin store for bus future itin
         future_itin = os.path.join(mhn_in_gdb, "bus_future_itin")
-        future_itin_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(future_itin, itin_fields)],
-            columns = itin_fields
-        ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
-
-        future_itin_dict = {k: v.to_dict(orient='records') for k, v in future_itin_df.groupby("TRANSIT_LINE")}
-
-        # make feature layers
-        base_fc = os.path.join(cr_gdb, "bus_base")
-        arcpy.management.MakeFeatureLayer(base_fc, "base_layer")
-        current_fc = os.path.join(cr_gdb, "bus_current")
-        arcpy.management.MakeFeatureLayer(current_fc, "current_layer")
+        future_itin_store = ItineraryStore.read(future_itin, itin_columns, storage = self.storage)
+
+        # collapsed itins are also kept as .npz so the scenarios don't have to re-read them
+        os.mkdir(self.itin_folder)
+
         future_fc = os.path.join(cr_gdb, "bus_future")
-        arcpy.management.MakeFeatureLayer(future_fc, "future_layer")
 
         error_file= open(self.error_file_1, "a")
 
@@ -156,19 +193,21 @@ class BusNetwork:
             arcpy.management.CreateFeatureDataset(cr_gdb, f"TOD_{tod}", spatial_reference = 26771)
 
             # collapse gtfs routes
-            self.find_rep_runs(tod= tod, which_gtfs="base", rf_dict = base_rf_dict)
-            self.find_rep_runs(tod= tod, which_gtfs="current", rf_dict = current_rf_dict)
+            self.find_rep_runs(tod= tod, which_gtfs="base", runs_df = base_runs_df,
+                               seg_dict = base_seg_dict, num_seg_dict = base_num_seg_dict)
+            self.find_rep_runs(tod= tod, which_gtfs="current", runs_df = current_runs_df,
+                               seg_dict = current_seg_dict, num_seg_dict = current_num_seg_dict)
 
             # find rep itins
             self.find_rep_itins(
-                tod= tod, which_bus = "base", itin_dict = base_itin_dict, error_file = error_file)
+                tod= tod, which_bus = "base", itin_store = base_itin_store, error_file = error_file)
             self.find_rep_itins(
-                tod= tod, which_bus = "current", itin_dict = current_itin_dict, error_file = error_file)
+                tod= tod, which_bus = "current", itin_store = current_itin_store, error_file = error_file)
             
         col_future_fc = os.path.join(cr_gdb, f"col_future_0")
-        arcpy.management.CopyFeatures("future_layer", col_future_fc)
+        arcpy.management.CopyFeatures(future_fc, col_future_fc)
         self.find_rep_itins(
-            tod= 0, which_bus = "future", itin_dict = future_itin_dict, error_file = error_file)
+            tod= 0, which_bus = "future", itin_store = future_itin_store, error_file = error_file)
 
         error_file.close()
 
@@ -198,8 +237,6 @@ class BusNetwork:
 
                     icursor.insertRow(row)
 
-        arcpy.management.Delete(base_fc)
-        arcpy.management.Delete(current_fc)
         arcpy.management.Delete(future_fc)
 
         print("TOD routes collapsed.\n")
@@ -218,8 +255,6 @@ class BusNetwork:
         if os.path.exists(self.error_file_2):
             os.remove(self.error_file_2)
 
-        error_file= open(self.error_file_2, "a")
-
         for scen in scenario_dict:
 
             year = scenario_dict[scen]
@@ -241,22 +276,36 @@ class BusNetwork:
 
             arcpy.management.Delete("input_links_layer")
 
-            scen_nodes = set(node_dict.keys())
+        # each scenario + TOD is a unit with its own error file
+        if os.path.isdir(self.unit_folder):
+            shutil.rmtree(self.unit_folder)
+        os.mkdir(self.unit_folder)
 
-            # for each tod
-            for tod in [1, 2, 3, 4]:
+        units = [(scen, tod) for scen in scenario_dict for tod in [1, 2, 3, 4]]
+
+        if self.workers > 1:
+            unit_nodes = self.run_parallel_units(units)
+        else:
+            unit_nodes = {}
+            for scen, tod in units:
+                with open(self.unit_error_path(scen, tod), "w") as unit_error_file:
+                    unit_nodes[(scen, tod)] = self.create_bus_unit(scen, tod, unit_error_file)
+
+        error_file= open(self.error_file_2, "a")
+
+        for scen in scenario_dict:
 
-                print(f"Creating bus layers for scenario {scen} TOD {tod}...")
+            scen_gdb = os.path.join(bn_out_folder, f"SCENARIO_{scen}.gdb")
 
-                arcpy.management.CreateFeatureDataset(scen_gdb, f"TOD_{tod}", spatial_reference = 26771)
+            scen_nodes = set(node_dict.keys())
+
+            # unit error files in scenario + TOD order
+            for tod in [1, 2, 3, 4]:
 
-                # find highway links
-                G = self.create_tod_hwy_networks(scen, tod)
-                scen_nodes = scen_nodes & set(G.nodes)
+                scen_nodes = scen_nodes & unit_nodes[(scen, tod)]
 
-                # find bus networks
-                reroute_dict = self.create_tod_bus_runs(scen, tod)
-                self.create_tod_bus_itins(scen, tod, reroute_dict, G, error_file)
+                with open(self.unit_error_path(scen, tod), "r") as unit_error_file:
+                    shutil.copyfileobj(unit_error_file, error_file)
 
             # find scenario park n ride nodes
             cr_gdb = os.path.join(bn_out_folder, f"collapsed_routes.gdb")
@@ -273,26 +322,173 @@ class BusNetwork:
             error_file.write(f"Errors in scenario {scen} park and ride nodes:\n")
             error_file.write(f"------------------------------------\n")
 
-            with arcpy.da.UpdateCursor(output_nodes, ["NODE", "FACILITY", "SHAPE@"]) as ucursor:
+            # one index per zone over the nodes in every TOD network of the scenario
+            zone_index = ZoneNodeIndex(scen_nodes,
+                                       [node_dict[node]["X"] for node in scen_nodes],
+                                       [node_dict[node]["Y"] for node in scen_nodes],
+                                       [node_dict[node]["ZONE"] for node in scen_nodes])
+
+            with arcpy.da.UpdateCursor(output_nodes, ["NODE", "FACILITY", "SHAPE@", "SCENARIO"]) as ucursor:
                 for row in ucursor:
 
                     facility = row[1]
 
-                    if row[0] not in scen_nodes:
+                    # LIKE also matches other scenarios containing the code (1 in "10")
+                    if scen not in parse_codes(row[3], list(scenario_dict)):
+                        ucursor.deleteRow()
+
+                    elif row[0] not in scen_nodes:
                         
-                        replace_node = self.find_nearest_node(row[0], scen_nodes.copy(), zone = True)
+                        replace_node, replace_dist = self.find_nearest_zone_node(row[0], zone_index)
                         if replace_node == None:
 
-                            error_file.write(f"Node for {facility} could not be found/replaced. Removing facility.")
+                            error_file.write(f"Node for {facility} could not be found/replaced. Removing facility.\n")
                             ucursor.deleteRow()
 
                         else:
 
+                            error_file.write(f"Node {row[0]} for {facility} not in scenario. " +
+                                             f"Moved to node {replace_node} ({replace_dist:.0f} ft away).\n")
+
                             replace_geom = node_dict[replace_node]["GEOM"]
-                            ucursor.updateRow([replace_node, facility, replace_geom])
+                            ucursor.updateRow([replace_node, facility, replace_geom, row[3]])
+
+        # gap routing + link geometry stats
+        error_file.write("\n")
+        for line in self.gap_router.report() + self.link_dict.report():
+            print(line)
+            error_file.write(line + "\n")
 
         error_file.close()
 
+        shutil.rmtree(self.unit_folder)
+
+    # method that creates the bus layers of one scenario + TOD (a unit) into TOD_<tod>
+    # of the unit gdb - returns the nodes of the TOD highway network
+    def create_bus_unit(self, scen, tod, error_file):
+
+        print(f"Creating bus layers for scenario {scen} TOD {tod}...")
+
+        unit_gdb = self.unit_gdb(scen, tod)
+        arcpy.management.CreateFeatureDataset(unit_gdb, f"TOD_{tod}", spatial_reference = 26771)
+
+        # one network per scenario - the TODs are edge masks on it
+        if self.scen_network == None or self.scen_network[0] != scen:
+            self.scen_network = (scen,) + self.build_scen_hwy_network(scen)
+
+        scen, hwylink_df, scen_graph = self.scen_network
+
+        # find highway links
+        G = self.create_tod_hwy_networks(scen, tod, hwylink_df, scen_graph)
+        reach_index = self.gap_router.set_network(scen, tod, G)
+
+        error_file.write(f"\nScenario {scen} TOD {tod} network:\n")
+        for line in reach_index.report():
+            error_file.write(line + "\n")
+
+        # find bus networks
+        reroute_dict = self.create_tod_bus_runs(scen, tod)
+        self.create_tod_bus_itins(scen, tod, reroute_dict, G, error_file)
+
+        return set(G.nodes())
+
+    # PARALLEL UNITS ------------------------------------------------------------------------------
+
+    # method that runs the units in a pool of worker processes
+    # every worker writes its units into its own gdb (file gdbs don't take concurrent
+    # schema changes), which are copied into the scenario gdbs afterwards in unit order
+    def run_parallel_units(self, units):
+
+        print(f"Running {len(units)} scenario + TOD units on {self.workers} workers...")
+
+        shared = self.share_inputs(units)
+
+        try:
+            # spawn - arcpy can't be forked
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(self.workers, initializer = init_bus_worker,
+                              initargs = (self.router, shared.spec, self.unit_folder,
+                                          self.qa_routes, self.compare_hops)) as pool:
+                results = pool.map(run_bus_unit, units, chunksize = 1)
+        finally:
+            shared.close()
+
+        unit_nodes = {}
+
+        for scen, tod, nodes, router_stats, link_stats in results:
+
+            unit_nodes[(scen, tod)] = nodes
+            self.gap_router.merge_stats(router_stats)
+            self.link_dict.merge_stats(link_stats)
+
+            scen_gdb = os.path.join(self.bn_out_folder, f"SCENARIO_{scen}.gdb")
+            unit_gdb = os.path.join(self.unit_folder, f"SCENARIO_{scen}_TOD_{tod}.gdb")
+
+            arcpy.management.Copy(os.path.join(unit_gdb, f"TOD_{tod}"), os.path.join(scen_gdb, f"TOD_{tod}"))
+            arcpy.management.Delete(unit_gdb)
+
+        return unit_nodes
+
+    # method that puts the heavy inputs of the units into shared memory:
+    # node coordinates, the link store + the collapsed runs + itins
+    # (runs are shared with their geometry as vertex arrays - see modules/shared_arrays.py)
+    def share_inputs(self, units):
+
+        node_ids = list(self.node_dict.keys())
+
+        arrays = {"node_ids": np.array(node_ids, dtype = np.int64),
+                  "node_x": np.array([self.node_dict[node]["X"] for node in node_ids], dtype = np.float64),
+                  "node_y": np.array([self.node_dict[node]["Y"] for node in node_ids], dtype = np.float64)}
+
+        arrays.update(prefix_arrays("links", self.link_dict.to_arrays()))
+
+        itin_keys = [("future", 0)]
+        for scen, tod in units:
+            which_gtfs = "base" if scen == 1 else "current"
+            if (which_gtfs, tod) not in itin_keys:
+                itin_keys.append((which_gtfs, tod))
+
+        for which_bus, tod in itin_keys:
+            itin_store = self.load_rep_itins(which_bus, tod)
+            arrays.update(prefix_arrays(f"itin_{which_bus}_{tod}", itin_store.to_arrays()))
+
+            col_fc, fields = self.rep_runs_table(which_bus, tod)
+            attr_df, vertices, offsets = self.storage.read_geometry(col_fc, fields[1:])
+            arrays.update(prefix_arrays(f"runs_{which_bus}_{tod}", table_to_arrays(attr_df, vertices, offsets)))
+
+        return SharedArrays(arrays)
+
+    # method that sets up a worker from the shared inputs
+    # (workers have no node dict - node geometry is only used by the parent)
+    def attach_shared_inputs(self, spec):
+
+        self.shm, arrays = attach_arrays(spec)
+
+        self.node_dict = None
+        self.node_index = NodeIndex(arrays["node_ids"], arrays["node_x"], arrays["node_y"])
+
+        self.link_dict = LinkStore.from_arrays(unprefix_arrays("links", arrays), self.storage.make_polyline)
+
+        for name in set(name.split("/")[0] for name in arrays if name.startswith("itin_")):
+            which_bus, tod = name.split("_")[1:]
+            self.rep_itins[(which_bus, int(tod))] = ItineraryStore.from_arrays(unprefix_arrays(name, arrays))
+
+        for name in set(name.split("/")[0] for name in arrays if name.startswith("runs_")):
+            which_bus, tod = name.split("_")[1:]
+            self.rep_runs[(which_bus, int(tod))] = table_from_arrays(unprefix_arrays(name, arrays),
+                                                                     self.storage.make_polyline)
+
+    # gdb the TOD_<tod> dataset of a unit is written to
+    def unit_gdb(self, scen, tod):
+
+        if self.unit_gdb_folder == None:
+            return os.path.join(self.bn_out_folder, f"SCENARIO_{scen}.gdb")
+
+        return os.path.join(self.unit_gdb_folder, f"SCENARIO_{scen}_TOD_{tod}.gdb")
+
+    def unit_error_path(self, scen, tod):
+        return os.path.join(self.unit_folder, f"error_file_2_{scen}_{tod}.txt")
+
     # HELPER METHODS ------------------------------------------------------------------------------
 
     # helper method that builds highway node geometry dict
@@ -316,55 +512,21 @@ class BusNetwork:
                 geom = arcpy.PointGeometry(point, spatial_reference = 26771)
                 zone = row[3]
 
-                node_dict[node] = {"GEOM": geom, "ZONE": zone}
+                node_dict[node] = {"GEOM": geom, "ZONE": zone, "X": row[1], "Y": row[2]}
 
         print("Node dictionary built.")
 
         return node_dict
     
-    # helper method that builds highway link geometry dict
+    # helper method that builds the highway link store (geometry is made on demand)
     def build_hwy_link_dict(self):
 
-        print("Building dictionary of all highway links...")
-
-        mhn_in_gdb = self.mhn_in_gdb
-
-        link_fields = ["ANODE", "BNODE", "ABB", "DIRECTIONS"]
-
-        hwylink_fc = os.path.join(mhn_in_gdb, "hwynet", "hwynet_arc")
-        hwylink_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(hwylink_fc, link_fields)], 
-            columns = link_fields)
-        
-        hwylink_rev_df = pd.merge(hwylink_df, hwylink_df.copy(), 
-                                  left_on = ["ANODE", "BNODE"], right_on = ["BNODE", "ANODE"])
-        hwylink_rev_set = set(hwylink_rev_df.ABB_x.to_list())
-
-        link_fields = ["SHAPE@", "ANODE", "BNODE", "ABB", "MILES"]
-
-        link_dict = {}
+        print("Building store of all highway links...")
 
-        with arcpy.da.SearchCursor(hwylink_fc, link_fields) as scursor:
-            for row in scursor:
-
-                geom = row[0]
-                anode = row[1]
-                bnode = row[2]
-                abb = row[3]
-                miles = row[4]
-
-                multi_array = arcpy.Array()
-                for part in geom:
-                    part_array = arcpy.Array([point for point in part])
-                    multi_array.append(part_array)
-                    
-                polyline = arcpy.Polyline(multi_array, spatial_reference = 26771)
-
-                link_dict[(anode, bnode)] = {"ABB": abb, "GEOM": polyline, "MILES": miles}
-                if abb not in hwylink_rev_set:
-                    link_dict[(bnode, anode)] = {"ABB": abb, "GEOM": polyline, "MILES": miles}
+        hwylink_fc = os.path.join(self.mhn_in_gdb, "hwynet", "hwynet_arc")
+        link_dict = LinkStore.read(hwylink_fc, self.storage)
 
-        print("Link dictionary built.\n")
+        print("Link store built.\n")
 
         return link_dict
 
@@ -390,180 +552,107 @@ class BusNetwork:
                 for row in scursor:
                     icursor.insertRow(row)
 
-        if fc_name == "bus_future":
-            return
-        
-        # fix issue with starting after midnight
-        fields = ["START", "STARTHOUR"]
+    # helper method that reads the gtfs runs (with geometry) in one pass
+    # + fixes start times after midnight, adds MODERTE and the TOD of each run
+    def read_gtfs_runs(self, which_gtfs):
 
-        with arcpy.da.UpdateCursor(output_fc, fields) as ucursor:
-            for row in ucursor:
+        input_fc = os.path.join(self.mhn_in_gdb, "hwynet", f"bus_{which_gtfs}")
 
-                if row[0] >= 86400:
-                    row[0] = row[0] - 86400
+        fields = self.storage.field_names(input_fc)
+        runs_df = self.storage.read_table(input_fc, fields + ["SHAPE@"])
 
-                if row[1] >= 24:
-                    row[1] = row[1] - 24
-
-                ucursor.updateRow(row)
+        # fix issue with starting after midnight
+        runs_df.loc[runs_df.START >= 86400, "START"] -= 86400
+        runs_df.loc[runs_df.STARTHOUR >= 24, "STARTHOUR"] -= 24
 
-        arcpy.management.CalculateField(
-            in_table = output_fc,
-            field = "MODERTE",
-            expression='!MODE! + "-" + !ROUTE_ID!', 
-            expression_type="PYTHON3", 
-            code_block="", 
-            field_type="TEXT", 
-            enforce_domains="NO_ENFORCE_DOMAINS"
-        )
+        runs_df["MODERTE"] = runs_df["MODE"] + "-" + runs_df["ROUTE_ID"]
 
-        arcpy.management.AddField(output_fc, "BUS_GROUP", "SHORT")
-        arcpy.management.AddField(output_fc, "AVG_HEADWAY", "FLOAT")
+        runs_df["TOD"] = 0
+        for tod in self.tod_dict:
 
-    # helper method to reformat feed
-    def reformat_gtfs_feed(self, itin_dict):
+            start_hour = self.tod_dict[tod]["start_hour"]
+            end_hour = self.tod_dict[tod]["end_hour"]
 
-        reformat_dict = {}
+            if start_hour < end_hour:
+                in_tod = (runs_df.STARTHOUR >= start_hour) & (runs_df.STARTHOUR < end_hour)
+            else:
+                in_tod = (runs_df.STARTHOUR >= start_hour) | (runs_df.STARTHOUR < end_hour)
 
-        for tr_line in itin_dict:
-            tr_itin = itin_dict[tr_line]
-            tr_path = []
+            runs_df.loc[in_tod, "TOD"] = tod
 
-            for record in tr_itin:
-                
-                itin_a = record["ITIN_A"]
-                itin_b = record["ITIN_B"]
-                dw_code = record["DWELL_CODE"]
+        return runs_df
 
-                record_string = f"{itin_a}-{itin_b}-{dw_code}"
-                tr_path.append(record_string)
+    # helper method to reformat feed
+    # segments are packed into int64s (ITIN_A | ITIN_B | DWELL_CODE) and each run is kept
+    # as a sorted array of its unique segments
+    def reformat_gtfs_feed(self, itin_store):
 
-            reformat_dict[tr_line] = tr_path
+        seg_dict, num_seg_dict = pack_itineraries(itin_store)
 
-        return reformat_dict
+        return seg_dict, num_seg_dict
     
     # helper method that finds representative runs
-    def find_rep_runs(self, tod, which_gtfs, rf_dict):
+    # + writes them (with group + average headway) to col_<gtfs>_<tod>
+    def find_rep_runs(self, tod, which_gtfs, runs_df, seg_dict, num_seg_dict):
 
-        where_clause = self.tod_dict[tod]["where_clause"]
         maxtime = self.tod_dict[tod]["maxtime"]
 
-        bus_layer = f"{which_gtfs}_layer"
-
-        arcpy.management.SelectLayerByAttribute(
-            bus_layer, "NEW_SELECTION", where_clause)
-        
-        tod_fd = os.path.join(self.bn_out_folder, "collapsed_routes.gdb", f"TOD_{tod}")
-        all_tod_fc = os.path.join(tod_fd, f"all_{which_gtfs}_{tod}")
-
-        arcpy.management.CopyFeatures(bus_layer, all_tod_fc)
-
-        # get lines and group by MODE- ROUTE_ID (MODERTE)
-        lines_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(all_tod_fc, ["MODERTE", "TRANSIT_LINE"])], 
-            columns = ["MODERTE", "TRANSIT_LINE"])
-
         # make sure it's the same order every time
-        lines_df = lines_df.sort_values("TRANSIT_LINE")
-        
-        lines_dict = lines_df.groupby('MODERTE')['TRANSIT_LINE'].apply(list).to_dict()
+        lines_df = runs_df[runs_df.TOD == tod].drop(columns = ["SHAPE@"]).sort_values("TRANSIT_LINE")
 
-        group = 0
-        groups = {}
+        # group by MODE- ROUTE_ID (MODERTE)
+        lines_dict = lines_df.groupby('MODERTE')['TRANSIT_LINE'].apply(list).to_dict()
 
         # find routes similar enough to be collapsed
-        for moderte in lines_dict:
-
-            mr_lines = lines_dict[moderte]
-
-            while True:
-
-                group += 1
-                base_run = mr_lines.pop(0)
-                groups[base_run] = group
-
-                # compare all other runs against base run
-                for comp_run in mr_lines[:]: # make a copy to iterate safely
-
-                    base_run_path = rf_dict[base_run]
-                    comp_run_path = rf_dict[comp_run]
-
-                    base_run_set = set(base_run_path)
-                    comp_run_set = set(comp_run_path)
-                    common_set = base_run_set & comp_run_set
-
-                    base_run_num = len(base_run_set)
-                    common_num = len(common_set)
-
-                    if common_num/ base_run_num >= self.threshold:
-                        groups[comp_run] = group
-                        mr_lines.remove(comp_run)
-                
-                if len(mr_lines) == 0:
-                    break
-
-        with arcpy.da.UpdateCursor(all_tod_fc, ["TRANSIT_LINE", "BUS_GROUP"]) as ucursor:
-            for row in ucursor:
-
-                tr_line = row[0]
-                row[1] = groups[tr_line]
-
-                ucursor.updateRow(row)
+        groups = cluster_runs(lines_dict, seg_dict, self.threshold)
+        lines_df["BUS_GROUP"] = lines_df["TRANSIT_LINE"].map(groups)
 
         # find representative routes
-        # get number of segments 
-        num_seg_dict = {k: len(v) for k, v in rf_dict.items()}
-
-        # get line df 
-        lines_fields = ["BUS_GROUP", "TRANSIT_LINE", "START"]
-        
-        lines_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(all_tod_fc, lines_fields)], 
-            columns = lines_fields)
-        
-        lines_df["NUM_SEGS"] = lines_df["TRANSIT_LINE"].apply(lambda x: num_seg_dict[x])
+        lines_df["NUM_SEGS"] = lines_df["TRANSIT_LINE"].map(num_seg_dict)
         
         # comes earliest in that time period (adjusts for TOD 1)
-        lines_df["START"] = lines_df["START"].apply(lambda x: x + 86400 if x < 21600 else x)
-
-        # calculate headway
-        lines_df = lines_df.sort_values(["BUS_GROUP", "START"])
-        lines_df["PREV_START"] = lines_df.groupby("BUS_GROUP")["START"].shift()
-        subtract_df = lines_df[lines_df.PREV_START.notnull()]
-        subtract_df["HEADWAY"] = (subtract_df["START"] - subtract_df["PREV_START"]) /60
+        lines_df["ADJ_START"] = lines_df["START"].apply(lambda x: x + 86400 if x < 21600 else x)
 
-        headway_dict = subtract_df.groupby("BUS_GROUP")["HEADWAY"].mean().to_dict()
+        # calculate headway (see modules/headways.py)
+        lines_df = lines_df.sort_values(["BUS_GROUP", "ADJ_START"])
+        group_hdwys = collapsed_run_headways(lines_df, maxtime)
 
         # longest, then starts earliest
-        lines_df = lines_df.sort_values(["BUS_GROUP", "NUM_SEGS", "START"], 
+        lines_df = lines_df.sort_values(["BUS_GROUP", "NUM_SEGS", "ADJ_START"], 
                                         ascending = [True, False, True])
-        col_routes = lines_df.groupby("BUS_GROUP").first()["TRANSIT_LINE"].to_list()
+        col_df = lines_df.drop_duplicates("BUS_GROUP")
 
-        col_tod_fc = os.path.join(tod_fd, f"col_{which_gtfs}_{tod}")
-        arcpy.management.CopyFeatures(all_tod_fc, col_tod_fc)
+        col_df["AVG_HEADWAY"] = col_df["BUS_GROUP"].map(group_hdwys)
 
-        fields = ["TRANSIT_LINE", "BUS_GROUP", "AVG_HEADWAY"]
+        # write only the collapsed runs
+        tod_fd = os.path.join(self.bn_out_folder, "collapsed_routes.gdb", f"TOD_{tod}")
+        col_tod_fc_name = f"col_{which_gtfs}_{tod}"
+        col_tod_fc = os.path.join(tod_fd, col_tod_fc_name)
 
-        with arcpy.da.UpdateCursor(col_tod_fc, fields) as ucursor:
-            for row in ucursor:
+        input_fc = os.path.join(self.mhn_in_gdb, "hwynet", f"bus_{which_gtfs}")
+        arcpy.management.CreateFeatureclass(tod_fd, col_tod_fc_name, template = input_fc, 
+                                            spatial_reference = 26771)
 
-                if row[0] not in col_routes:
-                    ucursor.deleteRow()
+        fields = [field for field in runs_df.columns if field not in ["SHAPE@", "TOD"]]
+        input_fields = self.storage.field_names(input_fc)
 
-                else:
-                    bus_group = row[1]
-                    
-                    if bus_group in headway_dict:
-                        row[2] = round(headway_dict[bus_group], 1)
-                    else:
-                        row[2] = maxtime
+        add_fields = [["BUS_GROUP", "SHORT"], ["AVG_HEADWAY", "FLOAT"]]
+        if "MODERTE" not in input_fields:
+            add_fields = [["MODERTE", "TEXT"]] + add_fields
 
-                    ucursor.updateRow(row)
+        arcpy.management.AddFields(col_tod_fc, add_fields)
 
-    # helper method that finds representative itineraries
-    def find_rep_itins(self, tod, which_bus, itin_dict, error_file):
+        # geometry of the collapsed runs only
+        col_df["SHAPE@"] = runs_df.loc[col_df.index, "SHAPE@"]
 
-        link_dict = self.link_dict
+        fields = fields + ["BUS_GROUP", "AVG_HEADWAY", "SHAPE@"]
+
+        with arcpy.da.InsertCursor(col_tod_fc, fields) as icursor:
+            for row in self.df_rows(col_df[fields]):
+                icursor.insertRow(row)
+
+    # helper method that finds representative itineraries
+    def find_rep_itins(self, tod, which_bus, itin_store, error_file):
 
         error_file.write("\n")
 
@@ -606,73 +695,199 @@ class BusNetwork:
         else:
             rep_fc = os.path.join(cr_gdb, f"col_{which_bus}_{tod}")
 
-        rep_routes = [row[0] for row in arcpy.da.SearchCursor(rep_fc, ["TRANSIT_LINE"])]
+        rep_routes = set(row[0] for row in arcpy.da.SearchCursor(rep_fc, ["TRANSIT_LINE"]))
 
-        # get rep itins
-        fields = ["SHAPE@", "TRANSIT_LINE", "ITIN_ORDER", 
-                  "ITIN_A", "ITIN_B", "ABB", 
-                  "DWELL_CODE", "LINE_SERV_TIME", "TTF", "NOTES"]
-        with arcpy.da.InsertCursor(itin_fc, fields) as icursor:
-            for tr_line in itin_dict:
+        # get rep itins - checked + gaps added for all lines at once
+        rep_store, records = self.check_rep_itins(itin_store, rep_routes)
 
-                if tr_line not in rep_routes:
-                    continue
+        lengths = np.diff(rep_store.offsets)
 
-                itin = itin_dict[tr_line]
+        tr_lines = np.repeat(np.array(rep_store.lines, dtype = object), lengths).tolist()
+        itin_columns = {column: rep_store.columns[column].tolist() for column in ITIN_COLUMNS}
 
-                itin_order = 0
-                for i in range(0, len(itin)):
+        # false links + gaps in itinerary order
+        for i in np.flatnonzero(rep_store.columns["NOTES"] != None).tolist():
 
-                    record = itin[i]
-                    itin_order += 1
+            problem = "false link" if itin_columns["NOTES"][i] == "False Link" else "itinerary gap"
+            error_file.write(f"{tr_lines[i]} - {problem} between {itin_columns['ITIN_A'][i]}, {itin_columns['ITIN_B'][i]}\n")
 
-                    itin_a = record["ITIN_A"]
-                    itin_b = record["ITIN_B"]
-                    abb = record["ABB"]
-                    dwc = record["DWELL_CODE"]
-                    lst = record["LINE_SERV_TIME"]
-                    ttf = record["TTF"]
+        # one bulk insert
+        self.itin_writer.write(itin_fc, rep_store, records)
 
-                    if (itin_a, itin_b) in link_dict:
-                        geom = link_dict[(itin_a, itin_b)]["GEOM"]
-                        notes = None
-                    else:
-                        geom = None
-                        notes = "False Link"
-                        error_file.write(f"{tr_line} - false link between {itin_a}, {itin_b}\n")
-                    
-                    row = [geom, tr_line, itin_order, itin_a, itin_b,
-                           abb, dwc, lst, ttf, notes]
-                    icursor.insertRow(row)
+        if self.qa_routes == True:
+            self.itin_writer.write_routes(os.path.dirname(itin_fc), f"route_{which_bus}_{tod}", rep_store, records)
 
-                    if i == len(itin) - 1:
-                        continue
+        rep_store.save(os.path.join(self.itin_folder, f"{itin_fc_name}.npz"))
 
-                    # check for itinerary gaps
-                    next_record = itin[i+1]
-                    next_a = next_record["ITIN_A"]
+    # helper method that checks the itins of the rep lines against the link store
+    # (hashed join on the directional link keys) + adds a gap segment wherever ITIN_B is not
+    # the next ITIN_A of the line (shifted comparison) - all as arrays over every line
+    # returns (rep store with NOTES, link record of each segment - -1 for false links + gaps)
+    def check_rep_itins(self, itin_store, rep_routes):
 
-                    if itin_b != next_a:
+        lengths = np.diff(itin_store.offsets)
+        is_rep = np.array([line in rep_routes for line in itin_store.lines], dtype = bool)
 
-                        itin_order+= 1
-                        row = [None, tr_line, itin_order, itin_b, next_a,
-                               # abb, dwc, lst, ttf, notes
-                               None, "1", 0, "1", "Itin Gap"] 
-                        
-                        error_file.write(f"{tr_line} - itinerary gap between {itin_b}, {next_a}\n")
-                        icursor.insertRow(row)
+        rep_lines = [line for line, rep in zip(itin_store.lines, is_rep) if rep]
+        rep_lengths = lengths[is_rep]
+
+        segments = np.flatnonzero(np.repeat(is_rep, lengths))
+        columns = {column: itin_store.columns[column][segments] for column in itin_store.columns}
+
+        itin_a = columns["ITIN_A"]
+        itin_b = columns["ITIN_B"]
+
+        records = self.link_dict.find_records(itin_a, itin_b)
+
+        # gap after a segment - not the last one of its line + doesn't meet the next
+        is_last = np.zeros(len(segments), dtype = bool)
+        is_last[np.cumsum(rep_lengths)[rep_lengths > 0] - 1] = True
+
+        has_gap = np.zeros(len(segments), dtype = bool)
+        has_gap[:-1] = (itin_b[:-1] != itin_a[1:])
+        has_gap = has_gap & ~is_last
+
+        # output position of each segment (gaps shift the rest of the line)
+        num_gaps = np.cumsum(has_gap)
+        seg_pos = np.arange(len(segments)) + num_gaps - has_gap
+        gap_pos = seg_pos[has_gap] + 1
+
+        num_rows = len(segments) + int(has_gap.sum())
+
+        # line starts move by the gaps of the lines before
+        line_bounds = np.r_[0, np.cumsum(rep_lengths)].astype(np.int64)
+        rep_offsets = line_bounds + np.r_[0, num_gaps][line_bounds]
+
+        # segment columns with the gap rows (abb, dwc, lst, ttf, notes)
+        gap_values = {"ITIN_A": itin_b[has_gap], "ITIN_B": itin_a[1:][has_gap[:-1]],
+                      "ABB": None, "DWELL_CODE": "1", "LINE_SERV_TIME": 0, "TTF": "1", "NOTES": "Itin Gap"}
+
+        notes = np.empty(len(segments), dtype = object)
+        notes[records == -1] = "False Link"
+        columns["NOTES"] = notes
+
+        rep_columns = {}
+        for column in ITIN_COLUMNS:
+
+            array = columns[column]
+
+            rep_array = np.empty(num_rows, dtype = array.dtype)
+            rep_array[seg_pos] = array
+            rep_array[gap_pos] = gap_values[column]
+
+            rep_columns[column] = rep_array
+
+        rep_records = np.full(num_rows, -1, dtype = np.int64)
+        rep_records[seg_pos] = records
 
+        return ItineraryStore(rep_lines, rep_offsets, rep_columns), rep_records
 
+    # helper method that turns a df into cursor rows (missing values as None)
+    def df_rows(self, df):
+
+        df = df.astype(object)
+        df = df.where(df.notnull(), None)
+
+        return df.itertuples(index = False)
+
+    # helper method that adds a row (ITIN_A ... NOTES) to an itin of lists
+    def append_itin_row(self, itin, row):
+
+        for column, value in zip(ITIN_COLUMNS, row):
+            itin[column].append(value)
+
+    # helper method that loads collapsed itins (saved by find_rep_itins, else read from the gdb)
+    # once per run - the scenarios share them (read-only, lines are copied before changes)
+    def load_rep_itins(self, which_bus, tod):
+
+        # already loaded / shared with a worker
+        if (which_bus, tod) in self.rep_itins:
+            return self.rep_itins[(which_bus, tod)]
+
+        itin_fc_name = f"itin_{which_bus}_{tod}"
+        itin_path = os.path.join(self.itin_folder, f"{itin_fc_name}.npz")
+
+        if os.path.exists(itin_path):
+            itin_store = ItineraryStore.load(itin_path)
+
+        else:
+            cr_gdb = os.path.join(self.bn_out_folder, "collapsed_routes.gdb")
+
+            if which_bus in ["base", "current"]:
+                itin_fc = os.path.join(cr_gdb, f"TOD_{tod}", itin_fc_name)
+            else:
+                itin_fc = os.path.join(cr_gdb, itin_fc_name)
+
+            itin_store = ItineraryStore.read(itin_fc, storage = self.storage)
+
+        self.rep_itins[(which_bus, tod)] = itin_store
+
+        return itin_store
+
+    # helper method that loads the collapsed runs (col_<which_bus>_<tod>, with geometry)
+    # once per run (shared with the workers) - the scenarios share them
+    def load_rep_runs(self, which_bus, tod):
+
+        if (which_bus, tod) in self.rep_runs:
+            return self.rep_runs[(which_bus, tod)]
+
+        col_fc, fields = self.rep_runs_table(which_bus, tod)
+        runs_df = self.storage.read_table(col_fc, fields)
+
+        self.rep_runs[(which_bus, tod)] = runs_df
+
+        return runs_df
+
+    # helper method that finds the collapsed runs feature class + the fields the units use
+    def rep_runs_table(self, which_bus, tod):
+
+        cr_gdb = os.path.join(self.bn_out_folder, "collapsed_routes.gdb")
+
+        if which_bus in ["base", "current"]:
+            col_fc = os.path.join(cr_gdb, f"TOD_{tod}", f"col_{which_bus}_{tod}")
+            fields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "MODE",
+                      "VEHICLE_TYPE", "AVG_HEADWAY", "SPEED", "MODERTE"]
+        else:
+            col_fc = os.path.join(cr_gdb, f"col_{which_bus}_{tod}")
+            fields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "MODE",
+                      "VEHICLE_TYPE", "HEADWAY", "SPEED",
+                      "REPLACE", "REROUTE", "SCENARIO", "TOD"]
+
+        return col_fc, fields
+
+    # helper method that parses the scenario / TOD / REPLACE / REROUTE coding of the
+    # future runs once per run (per worker process)
+    def load_future_coding(self):
+
+        if self.future_coding == None:
+            self.future_coding = FutureCoding(self.load_rep_runs("future", 0),
+                                              list(self.scenario_dict), list(self.tod_dict))
+
+        return self.future_coding
+
+    # helper method which reads the scenario highway links (both directions)
+    # + builds the CSR network all TODs share
+    def build_scen_hwy_network(self, scen):
+
+        year = self.scenario_dict[scen]
+        scen_gdb = os.path.join(self.bn_out_folder, f"SCENARIO_{scen}.gdb")
+        hwylink_fc = os.path.join(scen_gdb, f"HWYLINK_{year}")
+
+        hwylink_records = create_directional_hwy_records(hwylink_fc, 
+                                                         where_clause = "NEW_BASELINK = '1'",
+                                                         storage = self.storage)
+        hwylink_df = pd.DataFrame(hwylink_records)
+
+        scen_graph = CSRGraph(hwylink_df["INODE"], hwylink_df["JNODE"], hwylink_df["MILES"])
+
+        return hwylink_df, scen_graph
 
     # helper method which makes tod highway networks 
-    def create_tod_hwy_networks(self, scen, tod):
+    def create_tod_hwy_networks(self, scen, tod, hwylink_df, scen_graph):
 
-        bn_out_folder = self.bn_out_folder
         link_dict = self.link_dict
 
-        scen_gdb = os.path.join(bn_out_folder, f"SCENARIO_{scen}.gdb")
-
-        tod_fd = os.path.join(scen_gdb, f"TOD_{tod}")
+        tod_fd = os.path.join(self.unit_gdb(scen, tod), f"TOD_{tod}")
         arcpy.management.CreateFeatureclass(tod_fd, f"HWYLINK_{tod}", "POLYLINE")
         hwylink_tod_fc = os.path.join(tod_fd, f"HWYLINK_{tod}")
 
@@ -686,13 +901,6 @@ class BusNetwork:
 
         fields = ["SHAPE@", "ANODE", "BNODE", "ABB", 
                   "MILES", "THRULANES", "TYPE"]
-        
-        year = self.scenario_dict[scen]
-        hwylink_fc = os.path.join(scen_gdb, f"HWYLINK_{year}")
-
-        hwylink_records = create_directional_hwy_records(hwylink_fc, 
-                                                         where_clause = "NEW_BASELINK = '1'")
-        hwylink_df = pd.DataFrame(hwylink_records)
 
         # The highway TOD that the bus TOD corresponds to
         hwy_tod = self.tod_dict[tod]["hwy_tod"]
@@ -707,11 +915,10 @@ class BusNetwork:
         elif hwy_tod == 7:
             ampm_links += ["1", "3", "5"]
 
-        hwylink_tod_df = hwylink_df[(hwylink_df.AMPM.isin(ampm_links)) &
-                                    (hwylink_df.TYPE != "6")] # no centroids allowed
-        hwylink_tod_dict = hwylink_tod_df.set_index(["INODE", "JNODE"]).to_dict("index")
+        tod_mask = (hwylink_df.AMPM.isin(ampm_links)) & (hwylink_df.TYPE != "6") # no centroids allowed
 
-        G = nx.DiGraph()
+        hwylink_tod_df = hwylink_df[tod_mask]
+        hwylink_tod_dict = hwylink_tod_df.set_index(["INODE", "JNODE"]).to_dict("index")
 
         with arcpy.da.InsertCursor(hwylink_tod_fc, fields) as icursor:
             for link in hwylink_tod_dict:
@@ -719,14 +926,12 @@ class BusNetwork:
                 anode = link[0]
                 bnode = link[1]
 
-                abb = link_dict[(anode, bnode)]["ABB"]
-                geom = link_dict[(anode, bnode)]["GEOM"]
+                abb = link_dict.abb(anode, bnode)
+                geom = link_dict.geometry(anode, bnode, cache = False)
 
                 # miles
                 miles = hwylink_tod_dict[link]["MILES"]
 
-                G.add_edge(anode, bnode, weight = miles)
-
                 # calculate # of lanes
                 lanes = hwylink_tod_dict[link]["THRULANES"]
                 parklanes = hwylink_tod_dict[link]["PARKLANES"]
@@ -742,15 +947,14 @@ class BusNetwork:
                 row = [geom, anode, bnode, abb, miles, lanes, vdf]
                 icursor.insertRow(row)
 
+        G = scen_graph.tod_graph(tod_mask.to_numpy())
+
         return G
     
     # helper method which makes tod bus runs
     def create_tod_bus_runs(self, scen, tod):
 
-        bn_out_folder = self.bn_out_folder
-
-        cr_gdb = os.path.join(bn_out_folder, f"collapsed_routes.gdb")
-        scen_gdb = os.path.join(bn_out_folder, f"SCENARIO_{scen}.gdb")
+        scen_gdb = self.unit_gdb(scen, tod)
 
         maxtime = self.tod_dict[tod]["maxtime"]
         hdwy_mult = self.tod_dict[tod]["hdwy_mult"]
@@ -759,22 +963,14 @@ class BusNetwork:
         if scen > 1:
             which_gtfs = "current"
 
-        in_fc = os.path.join(cr_gdb, f"TOD_{tod}", f"col_{which_gtfs}_{tod}")
-        # REP GTFS FC
-        rep_gtfs_fc = os.path.join(scen_gdb, f"TOD_{tod}", f"col_{which_gtfs}_{tod}") 
-        arcpy.management.CopyFeatures(in_fc, rep_gtfs_fc)
-
-        # REP FUTURE FC
-        in_fc = os.path.join(cr_gdb, "col_future_0")
-        where_clause = f"SCENARIO LIKE '%{scen}%'"
-        arcpy.management.MakeFeatureLayer(in_fc, "in_layer", where_clause)
-        where_clause = f"TOD = '0' Or TOD LIKE '%{tod}%'"
-        arcpy.management.SelectLayerByAttribute("in_layer", "SUBSET_SELECTION", where_clause)
-
-        rep_future_fc = os.path.join(scen_gdb, f"TOD_{tod}", f"col_future_{tod}")
+        # collapsed runs are read once + shared by the scenarios
+        gtfs_df = self.load_rep_runs(which_gtfs, tod)
 
-        arcpy.management.CopyFeatures("in_layer", rep_future_fc)
-        arcpy.management.Delete("in_layer")
+        # future runs of the scenario + TOD, with their REPLACE + REROUTE coding
+        # (parsed once - see modules/bus_coding.py)
+        future_df = self.load_rep_runs("future", 0)
+        selected, add_list, replace_dict, reroute_dict = self.load_future_coding().select(scen, tod)
+        rep_future_df = future_df[selected]
 
         # process project coding
         tod_fd = os.path.join(scen_gdb, f"TOD_{tod}")
@@ -789,152 +985,40 @@ class BusNetwork:
 
         arcpy.management.AddFields(rep_scen_fc, add_fields)
 
-        fields = ["TRANSIT_LINE", "REPLACE", "REROUTE"]
-        rep_future_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(rep_future_fc, fields)], 
-            columns = fields
-        )
-
-        # find added runs
-        add_df = rep_future_df[~(rep_future_df.REPLACE.str.contains("-")) &
-                               ~(rep_future_df.REROUTE.str.contains("-"))]
-        add_list = add_df.TRANSIT_LINE.to_list()
-
-        # find replaced runs
-        replace_df = rep_future_df[(rep_future_df.REPLACE.str.contains("-"))]
-        replace_dict = replace_df.set_index("TRANSIT_LINE")["REPLACE"].to_dict()
-        replace_dict = {k: v.split(":") for k, v in replace_dict.items()}
-
-        replace_modertes = []
+        # replaced runs
+        replace_modertes = set()
         for moderte_list in replace_dict.values():
-            replace_modertes += moderte_list
-
-        replace_modertes = set(replace_modertes)
-
-        # find rerouted runs
-        reroute_df = rep_future_df[(rep_future_df.REROUTE.str.contains("-"))]
-        inv_reroute_dict = reroute_df.set_index("TRANSIT_LINE")["REROUTE"].to_dict()
-        inv_reroute_dict = {k: v.split(":") for k, v in inv_reroute_dict.items()}
-
-        reroute_dict = {}
+            replace_modertes.update(moderte_list)
 
-        for tr_line in inv_reroute_dict:
-            for moderte in inv_reroute_dict[tr_line]:
-
-                if moderte not in reroute_dict:
-                    reroute_dict[moderte] = []
-
-                reroute_dict[moderte].append(tr_line)
-
-        # transfer existing runs over
+        # transfer existing runs over (if not replaced)
         sfields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "MODE",
                    "VEHICLE_TYPE", "AVG_HEADWAY", "SPEED", "MODERTE"]
         ifields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "MODE",
                    "VEHICLE_TYPE", "HEADWAY", "SPEED", "MODERTE"]
-        
-        mode_hdwys = {}
-        replace_hdwys = []
-
-        with arcpy.da.SearchCursor(rep_gtfs_fc, sfields) as scursor:
-            with arcpy.da.InsertCursor(rep_scen_fc, ifields) as icursor:
-
-                for row in scursor:
-
-                    tr_line = row[1]
-                    desc = row[2]
-                    mode = row[3]
-                    veh_type = row[4]
-                    hdwy = row[5]
-                    speed = row[6]
-                    moderte = row[7]
-
-                    # if replaced, don't transfer
-                    if moderte in replace_modertes:
-                        replace_hdwys.append((moderte, hdwy))
-                        continue
 
-                    if mode not in mode_hdwys:
-                        mode_hdwys[mode] = []
+        is_replaced = gtfs_df.MODERTE.isin(replace_modertes)
 
-                    mode_hdwys[mode].append(hdwy)
+        kept_df = gtfs_df[~is_replaced]
+        self.storage.write_rows(rep_scen_fc, ifields, self.df_rows(kept_df[sfields]))
 
-                    icursor.insertRow(
-                        [row[0], tr_line, desc, mode, veh_type, hdwy, speed, moderte]
-                    )
-
-        mode_hdwys = {k: sum(v)/len(v) for k, v in mode_hdwys.items()}
+        # headways of the future runs (see modules/headways.py)
+        mode_hdwys = mode_headways(kept_df)
+        replaced_hdwys = replaced_route_headways(gtfs_df[is_replaced])
 
         # transfer in added + replaced runs
         sfields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "MODE",
                    "VEHICLE_TYPE", "HEADWAY", "SPEED"]
-        
-        with arcpy.da.SearchCursor(rep_future_fc, sfields) as scursor:
-            with arcpy.da.InsertCursor(rep_scen_fc, ifields) as icursor:
-
-                for row in scursor:
-
-                    tr_line = row[1]
-
-                    if tr_line not in add_list and tr_line not in replace_dict:
-                        continue
-
-                    desc = row[2]
-                    mode = row[3]
-                    veh_type = row[4]
-                    hdwy = row[5] # uhhh here we go
-                    speed = row[6]
-
-                    coded_hdwy = hdwy * hdwy_mult
-                    replaced_hdwy = 0
-
-                    if tr_line in replace_dict:
-                        
-                        replace_modertes = replace_dict[tr_line]
-                        replaced_hdwy = self.find_replaced_headway(
-                            replace_modertes, replace_hdwys)
-                        
-                    mode_hdwy = mode_hdwys[mode]
-                    last_hdwy = 90 # last chance headway
-
-                    final_hdwy = 0 # calculate final headway
 
-                    if coded_hdwy != 0:
-                        if replaced_hdwy != 0:
-                            final_hdwy = min(coded_hdwy, replaced_hdwy)
-                        else:
-                            final_hdwy = coded_hdwy
-                    else:
-                        if replaced_hdwy != 0:
-                            final_hdwy = replaced_hdwy
-                        else:
-                            final_hdwy = max(mode_hdwy, last_hdwy)
+        future_df = rep_future_df[rep_future_df.TRANSIT_LINE.isin(add_list + list(replace_dict))][sfields].copy()
 
-                    final_hdwy = min(final_hdwy, maxtime)
+        future_df["HEADWAY"] = future_headways(future_df, replace_dict, mode_hdwys, replaced_hdwys,
+                                               maxtime, hdwy_mult)
+        future_df["MODERTE"] = None
 
-                    icursor.insertRow(
-                        [row[0], tr_line, desc, mode, veh_type, final_hdwy, speed, None]
-                    )
-
-        arcpy.management.Delete(rep_gtfs_fc)
-        arcpy.management.Delete(rep_future_fc)
+        self.storage.write_rows(rep_scen_fc, ifields, self.df_rows(future_df))
 
         return reroute_dict
     
-    # helper method that finds the replaced headway
-    def find_replaced_headway(self, replace_modertes, replace_hdwys):
-
-        headways = []
-
-        for pair in replace_hdwys:
-
-            if pair[0] in replace_modertes:
-                headways.append(pair[1])
-
-        if len(headways) > 0:
-            return min(headways)
-        else:
-            return 0
-        
     # helper method which makes tod bus itineraries
     def create_tod_bus_itins(self, scen, tod, reroute_dict, G, 
                              error_file):
@@ -942,38 +1026,23 @@ class BusNetwork:
         bn_out_folder = self.bn_out_folder
 
         cr_gdb = os.path.join(bn_out_folder, f"collapsed_routes.gdb")
-        scen_gdb = os.path.join(bn_out_folder, f"SCENARIO_{scen}.gdb")
+        scen_gdb = self.unit_gdb(scen, tod)
 
         which_gtfs = "base"
         if scen > 1:
             which_gtfs = "current"
 
-        # get itins as dicts
+        # get itin stores
         tod_fd = os.path.join(cr_gdb, f"TOD_{tod}")
         itin_gtfs_fc = os.path.join(tod_fd, f"itin_{which_gtfs}_{tod}")
-        itin_future_fc = os.path.join(cr_gdb, f"itin_future_0")
 
         error_file.write("\n")
 
         error_file.write(f"Errors in scenario {scen} TOD {tod} transit lines:\n")
         error_file.write(f"------------------------------------\n")
 
-        exclude_fields = ["OBJECTID", "Shape", "Shape_Length"]
-        fields = [f.name for f in arcpy.ListFields(itin_gtfs_fc) if (f.name not in exclude_fields)]
-
-        itin_gtfs_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(itin_gtfs_fc, fields)],
-            columns = fields
-        ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
-
-        itin_gtfs_dict = {k: v.to_dict(orient='records') for k, v in itin_gtfs_df.groupby("TRANSIT_LINE")}
-
-        itin_future_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(itin_future_fc, fields)],
-            columns = fields
-        ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
-
-        itin_future_dict = {k: v.to_dict(orient='records') for k, v in itin_future_df.groupby("TRANSIT_LINE")}
+        itin_gtfs_store = self.load_rep_itins(which_gtfs, tod)
+        itin_future_store = self.load_rep_itins("future", 0)
 
         # all the lines for the scenario
         tod_fd = os.path.join(scen_gdb, f"TOD_{tod}")
@@ -985,254 +1054,289 @@ class BusNetwork:
         arcpy.management.CreateFeatureclass(tod_fd, f"scen_itin_{tod}", "POLYLINE", itin_gtfs_fc)
         rep_itin_fc = os.path.join(tod_fd, f"scen_itin_{tod}")
 
-        fields = ["SHAPE@", "TRANSIT_LINE", "ITIN_ORDER", 
-                  "ITIN_A", "ITIN_B", "ABB", 
-                  "DWELL_CODE", "LINE_SERV_TIME", "TTF", "NOTES"]
-        
-        with arcpy.da.InsertCursor(rep_itin_fc, fields) as icursor:
+        # first pass - reroute + secure the end nodes of every line and collect the gaps
+        # (errors are kept per line so the error file stays in line order)
+        line_itins = []
+        gaps = []
 
-            for transit_line in transit_lines:
+        for transit_line in transit_lines:
 
-                moderte = transit_lines[transit_line]
-                line_itin = None
+            moderte = transit_lines[transit_line]
+            line_itin = None
 
-                if transit_line in itin_gtfs_dict:
-                    line_itin = itin_gtfs_dict[transit_line]
+            if transit_line in itin_gtfs_store:
+                line_itin = itin_gtfs_store.get(transit_line)
 
-                elif transit_line in itin_future_dict:
-                    line_itin = itin_future_dict[transit_line]
+            elif transit_line in itin_future_store:
+                line_itin = itin_future_store.get(transit_line)
 
-                final_itin = self.make_final_line_itin(transit_line, line_itin,
-                                                       moderte, reroute_dict, itin_future_dict, 
-                                                       G, error_file)
-                
-                for record in final_itin:
+            line_errors = io.StringIO()
+            line_itin = self.prepare_line_itin(transit_line, line_itin,
+                                               moderte, reroute_dict, itin_future_store,
+                                               G, line_errors)
 
-                    itin_order = record["ITIN_ORDER"]
-                    itin_a = record["ITIN_A"]
-                    itin_b = record["ITIN_B"]
-                    abb = record["ABB"]
+            records = None
+            gap_spans = None
 
-                    dwc = record["DWELL_CODE"]
-                    lst = record["LINE_SERV_TIME"]
-                    ttf = record["TTF"]
-                    notes = record["NOTES"]
+            if line_itin != None:
 
-                    geom = self.link_dict[(itin_a, itin_b)]["GEOM"]
+                records = list(line_itin.rows(ITIN_COLUMNS))
+                gap_spans = self.find_itin_gaps(records, G)
 
-                    icursor.insertRow(
-                        [geom, transit_line, itin_order, 
-                         itin_a, itin_b, abb, 
-                         dwc, lst, ttf, notes]
-                    )
+                for start, end in gap_spans:
+                    gaps.append((records[start][0], records[end - 1][1]))
 
-    # helper method that makes final line itin
-    def make_final_line_itin(self, transit_line, line_itin, moderte, 
-                             reroute_dict, itin_future_dict, G, error_file):
+            line_itins.append((transit_line, records, gap_spans, line_errors.getvalue()))
 
-        # first- reroute
-        anodes = [record["ITIN_A"] for record in line_itin]
-        bnodes = [record["ITIN_B"] for record in line_itin]
+        # route all gaps of the TOD at once (one search per origin)
+        self.gap_router.route_many(gaps)
 
-        # attempt to reroute
-        if moderte in reroute_dict:
+        # second pass - final itins, written in one bulk insert
+        final_itins = []
+
+        for transit_line, records, gap_spans, line_errors in line_itins:
+
+            error_file.write(line_errors)
 
-            reroute = 0
-            reroute_lines = reroute_dict[moderte]
+            if records == None:
+                continue
 
-            for reroute_line in reroute_lines:
+            final_itin = self.make_final_line_itin(transit_line, records, gap_spans, error_file)
+            final_itins.append((transit_line, final_itin))
 
-                reroute_itin = itin_future_dict[reroute_line]
-                start_node = reroute_itin[0]["ITIN_A"]
-                end_node = reroute_itin[-1]["ITIN_B"]
+        final_store = ItineraryStore.from_itineraries(final_itins)
+        records = self.itin_writer.write(rep_itin_fc, final_store)
 
-                if start_node in anodes and end_node in bnodes:
+        if self.qa_routes == True:
+            self.itin_writer.write_routes(tod_fd, f"scen_route_{tod}", final_store, records)
 
-                    start_index = anodes.index(start_node)
-                    end_index = bnodes.index(end_node)
+    # helper method that reroutes a line + makes sure its first + last node are in the network
+    # returns the itin (a copy) or None if the line has to be removed
+    def prepare_line_itin(self, transit_line, line_itin, moderte, 
+                          reroute_dict, itin_future_store, G, error_file):
 
-                    if start_index <= end_index:
+        # first- reroute
+        spliced = False
+
+        # attempt to reroute
+        if moderte in reroute_dict:
 
-                        first_part = line_itin[: start_index]
-                        reroute_part = reroute_itin
-                        last_part = line_itin[end_index + 1:]
+            # all reroutes are spliced into the original itin at once - no overlaps
+            splices, overlapping = line_itin.place_reroutes(
+                [(reroute_line, itin_future_store.get(reroute_line)) for reroute_line in reroute_dict[moderte]])
 
-                        line_itin = first_part + reroute_part + last_part
-                        reroute = 1
+            for reroute_line in overlapping:
+                error_file.write(f"WARNING: Reroute {reroute_line} overlaps another reroute of {transit_line} ({moderte})\n")
 
-            if reroute == 0:
+            if len(splices) == 0:
                 error_file.write(f"WARNING: Could not reroute {transit_line} ({moderte})\n")
+            else:
+                line_itin = line_itin.splice_many(splices)
+                spliced = True
+
+        # line itin may still be a view into the store
+        if spliced == False:
+            line_itin = line_itin.copy()
 
         # make sure first + last node are secured 
-        available_nodes = set(G.nodes())
-        first_node = anodes[0]
+        first_node = int(line_itin["ITIN_A"][0])
 
-        if first_node not in available_nodes:
+        if first_node not in G:
 
-            replace_node = self.find_nearest_node(first_node, available_nodes)
+            replace_node = self.find_nearest_node(first_node, G)
             if replace_node == None:
                 error_file.write(f"ERROR: First node of {transit_line} could not be found/replaced. Removing line.\n")
-                return []
+                return None
             
             else:
-                line_itin[0]["ITIN_A"] = replace_node
+                line_itin["ITIN_A"][0] = replace_node
 
-        last_node = bnodes[-1]
-        if last_node not in available_nodes:
+        last_node = int(line_itin["ITIN_B"][-1])
+        if last_node not in G:
 
-            replace_node = self.find_nearest_node(last_node, available_nodes)
+            replace_node = self.find_nearest_node(last_node, G)
 
             if replace_node == None:
                 error_file.write(f"ERROR: Last node of {transit_line} could not be found/replaced. Removing line.\n")
-                return []
+                return None
             
             else:
-                line_itin[-1]["ITIN_B"] = replace_node
+                line_itin["ITIN_B"][-1] = replace_node
 
-        # make final itinerary
-        final_itin = []
+        return line_itin
 
-        i = 0 # counter that loops through original itin
-        itin_order = 0
+    # helper method that finds the gaps of an itin - spans (start, end) of consecutive
+    # segments that are not in the network
+    def find_itin_gaps(self, records, G):
+
+        gap_spans = []
+        start = None
+
+        for i, record in enumerate(records):
+
+            if G.has_edge(record[0], record[1]):
+                if start != None:
+                    gap_spans.append((start, i))
+                    start = None
+
+            elif start == None:
+                start = i
+
+        if start != None:
+            gap_spans.append((start, len(records)))
+
+        return gap_spans
 
-        while i < len(line_itin):
+    # helper method that makes final line itin - gaps are replaced by their shortest path
+    def make_final_line_itin(self, transit_line, records, gap_spans, error_file):
 
-            record = line_itin[i]
-            itin_a = record["ITIN_A"]
-            itin_b = record["ITIN_B"]
+        final_itin = {column: [] for column in ITIN_COLUMNS}
+
+        i = 0 # counter that loops through original itin
+        gap_spans = iter(gap_spans)
+        next_gap = next(gap_spans, None)
+
+        while i < len(records):
 
             # segment is in network
-            if G.has_edge(itin_a, itin_b):
-                itin_order += 1
-                record["ITIN_ORDER"] = itin_order
-                final_itin.append(record)
+            if next_gap == None or i < next_gap[0]:
+                self.append_itin_row(final_itin, records[i])
 
                 i+= 1
-            # segment is not in network
+            # consecutive segments that are not in network
             else:
 
-                i += 1
-                dwc = record["DWELL_CODE"]
-                ttf = record["TTF"]
+                start, end = next_gap
+                next_gap = next(gap_spans, None)
+                i = end
 
-                # get consecutive missing segments
-                while i < len(line_itin):
+                itin_a = records[start][0]
+                itin_b = records[end - 1][1]
+                dwc = records[end - 1][3]
+                ttf = records[end - 1][5]
 
-                    recordx = line_itin[i]
-                    itin_ax = recordx["ITIN_A"]
-                    itin_bx = recordx["ITIN_B"]
-                    dwcx = recordx["DWELL_CODE"]
-                    ttfx = recordx["TTF"]
-
-                    if G.has_edge(itin_ax, itin_bx):
-                        break
-
-                    else:
-                        
-                        itin_b = itin_bx
-                        dwc = dwcx
-                        ttf = ttfx
-                        i += 1
+                # find shortest path (on miles, routed in advance by route_many)
+                path = self.gap_router.route(itin_a, itin_b)
 
                 # is there a path
-                if nx.has_path(G, itin_a, itin_b):
-                    
-                    # find shortest path
-                    path = nx.shortest_path(G, itin_a, itin_b)
+                if path != None:
 
                     for j in range(0, len(path) - 1):
 
-                        record = {}
-
-                        itin_order += 1
-                        record["ITIN_ORDER"] = itin_order
-                        record["ITIN_A"] = path[j]
-                        record["ITIN_B"] = path[j+1]
-                        record["ABB"] = self.link_dict[(path[j], path[j+1])]["ABB"]
+                        abb = self.link_dict.abb(path[j], path[j+1])
 
                         # assume stop
-                        dwcj = 0
+                        dwcj = "0"
 
                         # if mode is E or Q - change to non-stop
                         if transit_line[0] in ["e", "q"]:
-                            dwcj = 1
+                            dwcj = "1"
 
                         # if last in segment - use original dwc
                         if j == len(path) - 2:
                             dwcj = dwc
 
-                        record["DWELL_CODE"] = dwcj
-
-                        miles = self.link_dict[(path[j], path[j+1])]["MILES"]
-                        record["LINE_SERV_TIME"] = max(miles * (60/ self.default_speed), 0.1)
+                        miles = self.link_dict.link_miles(path[j], path[j+1])
+                        lst = max(miles * (60/ self.default_speed), 0.1)
 
-                        record["TTF"] = ttf
-                        record["NOTES"] = "Shortest Path"
-
-                        final_itin.append(record)
+                        self.append_itin_row(final_itin, 
+                                             [path[j], path[j+1], abb, dwcj, lst, ttf, "Shortest Path"])
 
                 else:
                     error_file.write(f"ERROR: Shortest path could not be calculated for {transit_line}. Removing line.\n")
-                    return []
+                    return Itinerary.from_lists({column: [] for column in ITIN_COLUMNS})
         
-        if len(final_itin) == 0:
+        if len(final_itin["ITIN_A"]) == 0:
             error_file.write(f"ERROR: Zero segments in {transit_line}. Removing line.")
 
-        return final_itin
+        return Itinerary.from_lists(final_itin)
     
-    # find nearest node
-    def find_nearest_node(self, orig_node, available_nodes, zone = False):
+    # find nearest node - available_nodes is anything that supports "in" (a set, a TOD network)
+    # ties in distance go to the lowest node id
+    def find_nearest_node(self, orig_node, available_nodes):
+
+        # this node straight up does not exist
+        if orig_node not in self.node_index.position:
+            return None
+
+        return self.node_index.nearest_to_node(orig_node, lambda node: node in available_nodes)
+
+    # find nearest node in the same zone (park n ride) - (node, distance) or (None, None)
+    def find_nearest_zone_node(self, orig_node, zone_index):
 
         node_dict = self.node_dict
 
         # this node straight up does not exist
         if orig_node not in node_dict:
-            return None
-        
-        orig_zone = node_dict[orig_node]["ZONE"]
-    
-        # park n ride - requires it to be the same zone
-        if zone == True:
+            return None, None
 
-            for node in available_nodes.copy():
-                if node_dict[node]["ZONE"] != orig_zone:
-                    available_nodes.remove(node)
+        orig_value = node_dict[orig_node]
 
-        if len(available_nodes) == 0:
-            return None
-        
-        orig_node_loc = node_dict[orig_node]["GEOM"]
+        return zone_index.nearest_with_distance(orig_value["X"], orig_value["Y"], orig_value["ZONE"])
+
+# WORKER PROCESSES ----------------------------------------------------------------------------
+
+# bus network of a worker process
+worker_network = None
+
+# function that sets up a worker process (pool initializer)
+def init_bus_worker(router, spec, unit_folder, qa_routes, compare_hops):
+
+    global worker_network
+
+    pd.options.mode.chained_assignment = None
+
+    worker_network = BusNetwork(router = router, shared = spec, qa_routes = qa_routes,
+                                compare_hops = compare_hops)
+    worker_network.unit_folder = unit_folder
+    worker_network.unit_gdb_folder = unit_folder
+
+# function that runs a unit in a worker process
+# returns (scen, tod, nodes of the TOD network, gap router stats, link store stats)
+def run_bus_unit(unit):
 
-        available_nodes = list(available_nodes)
+    scen, tod = unit
+    BN = worker_network
 
-        nearest_node = available_nodes[0]
-        comp_node_loc = node_dict[nearest_node]["GEOM"]
+    BN.gap_router.reset_stats()
+    BN.link_dict.reset_stats()
 
-        nearest_dist = orig_node_loc.distanceTo(comp_node_loc)
+    arcpy.management.CreateFileGDB(BN.unit_gdb_folder, f"SCENARIO_{scen}_TOD_{tod}.gdb")
 
-        for node in available_nodes:
+    with open(BN.unit_error_path(scen, tod), "w") as unit_error_file:
+        nodes = BN.create_bus_unit(scen, tod, unit_error_file)
 
-            comp_node_loc = node_dict[node]["GEOM"]
+    return scen, tod, nodes, BN.gap_router.stats, BN.link_dict.stats
 
-            dist = orig_node_loc.distanceTo(comp_node_loc)
+def main():
 
-            if dist < nearest_dist:
+    start_time = time.time()
 
-                nearest_dist = dist
-                nearest_node = node
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--router", help="how itinerary gaps are routed (ch = contraction hierarchy)",
+                        choices=ROUTERS, default="dijkstra")
+    parser.add_argument("-w", "--workers", help="worker processes for the scenario + TOD units",
+                        type=int, default=1)
+    parser.add_argument("-q", "--qa_routes", help="also write a merged route polyline per line for QA maps",
+                        action="store_true")
+    parser.add_argument("-c", "--compare_hops", help="also route every gap by hop count + report the miles saved (QA)",
+                        action="store_true")
+    args = parser.parse_args()
 
-        return nearest_node
+    pd.options.mode.chained_assignment = None
 
-start_time = time.time()
+    BN = BusNetwork(router = args.router, workers = args.workers, qa_routes = args.qa_routes,
+                    compare_hops = args.compare_hops)
+    BN.create_bn_folder()
+    BN.collapse_bus_routes()
+    BN.create_bus_layers()
 
-BN = BusNetwork()
-BN.create_bn_folder()
-BN.collapse_bus_routes()
-BN.create_bus_layers()
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
 
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
+    print(f"{minutes}m {seconds}s to execute.")
 
-print(f"{minutes}m {seconds}s to execute.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
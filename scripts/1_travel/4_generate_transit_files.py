@@ -6,15 +6,19 @@
 import os
 import sys
 import shutil
-import arcpy
-import pandas as pd
 from datetime import date
 import math
 import time
+import argparse
+
+from modules.lazy_imports import pd
+from modules.storage import get_storage
+from modules.itinerary_store import ItineraryStore
+from modules.output_sinks import OUTPUT_MODES, make_sink, remove_sink_output
 
 class EmmeTransitNetwork:
 
-    def __init__(self):
+    def __init__(self, output_mode = "plain"):
 
         # get paths 
         sys_path = sys.argv[0]
@@ -33,6 +37,12 @@ class EmmeTransitNetwork:
 
         self.cbd_zones = set(range(1, 48))
 
+        # plain, gzip, zstd, tar or zip (see modules/output_sinks.py)
+        self.output_mode = output_mode
+
+        # arcpy or gpkg (see modules/storage.py)
+        self.storage = get_storage()
+
     # MAIN METHOD ---------------------------------------------------------------------------------
 
     def generate_transit_files(self):
@@ -50,14 +60,15 @@ class EmmeTransitNetwork:
         for scen in scenario_dict:
 
             emme_scen_folder = os.path.join(emme_transit_folder, f"{scen}00")
-            os.mkdir(emme_scen_folder)
+            remove_sink_output(emme_scen_folder)
 
-            self.write_bus_files(scen, emme_scen_folder)
+            with make_sink(self.output_mode, emme_scen_folder) as sink:
+                self.write_bus_files(scen, sink)
 
     # HELPER METHODS ------------------------------------------------------------------------------
 
     # helper method that writes the bus-specific files
-    def write_bus_files(self, scen, folder_path):
+    def write_bus_files(self, scen, sink):
 
         print(f"Writing bus files for scenario {scen}00...")
 
@@ -73,24 +84,15 @@ class EmmeTransitNetwork:
             line_fields = ["TRANSIT_LINE", "DESCRIPTION", "MODE", "VEHICLE_TYPE", 
                            "HEADWAY", "SPEED"]
             
-            line_df = pd.DataFrame(
-                data = [row for row in arcpy.da.SearchCursor(line_fc, line_fields)], 
-                columns = line_fields)
+            line_df = self.storage.read_table(line_fc, line_fields)
             
             line_dict = line_df.set_index("TRANSIT_LINE").to_dict("index")
 
-            itin_fields = ["TRANSIT_LINE", "ITIN_ORDER", "ITIN_A", "ITIN_B",
-                           "DWELL_CODE", "LINE_SERV_TIME", "TTF"]
+            itin_columns = ["ITIN_A", "ITIN_B", "DWELL_CODE", "LINE_SERV_TIME", "TTF"]
             
-            itin_df = pd.DataFrame(
-                data = [row for row in arcpy.da.SearchCursor(itin_fc, itin_fields)], 
-                columns = itin_fields
-            ).sort_values(["TRANSIT_LINE", "ITIN_ORDER"])
+            itin_store = ItineraryStore.read(itin_fc, itin_columns, storage = self.storage)
 
-            itin_dict = {k: v.to_dict(orient='records') for k, v in itin_df.groupby("TRANSIT_LINE")}
-
-            bus_itin_file_path = os.path.join(folder_path, f"bus.itinerary_{tod}")
-            bus_itin_file = open(bus_itin_file_path, "a")
+            bus_itin_file = sink.open(f"bus.itinerary_{tod}")
 
             bus_itin_file.write(f"c BUS TRANSIT BATCHIN FILE FOR SCENARIO {scen}00 TOD {tod}\n")
             bus_itin_file.write(f"c {today}\n")
@@ -100,7 +102,7 @@ class EmmeTransitNetwork:
             for line in line_dict:
 
                 # no corresponding itinerary - skip
-                if line not in itin_dict:
+                if line not in itin_store:
 
                     continue
 
@@ -133,20 +135,20 @@ class EmmeTransitNetwork:
                 bus_itin_file.write(header)
                 bus_itin_file.write("    path=no\n")
 
-                itin = itin_dict[line]
+                itin = list(itin_store.get(line).rows(itin_columns))
 
                 for index, record in enumerate(itin):
 
+                    itin_a, itin_b, dwc, lst, ttf = record
+
                     if index == 0:
 
                         bus_itin_file.write(f"    dwt=0.01\n    ")
-                        itin_a = str(record["ITIN_A"])
+                        itin_a = str(itin_a)
                         itin_a = itin_a + ' ' * (5 - len(itin_a))
                         bus_itin_file.write(itin_a)
 
                     # dwell code
-
-                    dwc =  record["DWELL_CODE"]
                     # make sure last stop is stop 
                     if index == len(itin) - 1:
                         dwc = "0"
@@ -159,7 +161,6 @@ class EmmeTransitNetwork:
 
                     # ttf 
 
-                    ttf = record["TTF"]
                     ettf = ""
 
                     if ttf == "0" or ttf == "1":
@@ -169,8 +170,6 @@ class EmmeTransitNetwork:
 
                     # line service time
 
-                    lst = record["LINE_SERV_TIME"]
-
                     lst = round(lst, 1)
                     lst = max(lst, 0.1) # make sure it's at least 0.1 minutes
                     if lst.is_integer():
@@ -184,7 +183,7 @@ class EmmeTransitNetwork:
                     if len(lst) < 3:
                         lst = lst + ' ' * (3 - len(lst))
 
-                    itin_b = str(record["ITIN_B"])
+                    itin_b = str(itin_b)
                     itin_b = itin_b + ' ' * (5 - len(itin_b))
 
                     bus_itin_file.write(f"   dwt={dwt}   ttf={ettf}   us1={lst}    us2=0\n    {itin_b}")
@@ -194,16 +193,26 @@ class EmmeTransitNetwork:
 
             bus_itin_file.close()
 
-start_time = time.time()
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--output_mode", help="how to write the emme files",
+                        choices=OUTPUT_MODES, default="plain")
+    args = parser.parse_args()
+
+    ETN = EmmeTransitNetwork(output_mode = args.output_mode)
+    ETN.generate_transit_files()
 
-ETN = EmmeTransitNetwork()
-ETN.generate_transit_files()
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
 
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
+    print(f"{minutes}m {seconds}s to execute.")
 
-print(f"{minutes}m {seconds}s to execute.")
+    print("Done")
 
-print("Done")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
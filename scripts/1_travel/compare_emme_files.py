@@ -0,0 +1,81 @@
+## compare_emme_files.py
+## structural diff of the emme files written by
+## 2_generate_hwy_files.py and 4_generate_transit_files.py
+## Author: ccai (2026)
+
+import os
+import sys
+import argparse
+import math
+import time
+
+from modules.emme_files import diff_folders, has_differences
+
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old_folder", help="folder of the reference run (e.g. a copy of output/1_travel/highway)")
+    parser.add_argument("new_folder", help="folder of the run to compare")
+    parser.add_argument("-o", "--out_folder", help="write the differences as csvs to this folder")
+    args = parser.parse_args()
+
+    for folder in [args.old_folder, args.new_folder]:
+        if not os.path.isdir(folder):
+            sys.exit(f"{folder} is not a folder.")
+
+    print("Comparing emme files...")
+
+    results = diff_folders(args.old_folder, args.new_folder)
+
+    num_different = 0
+
+    for rel_path in results:
+
+        diff = results[rel_path]
+
+        if not has_differences(diff):
+            continue
+
+        num_different += 1
+
+        if isinstance(diff, str):
+            print(f"{rel_path}: file {diff}")
+            continue
+
+        for table_name in diff:
+
+            added, removed, changed = diff[table_name]
+
+            if len(added) + len(removed) + len(changed) == 0:
+                continue
+
+            print(f"{rel_path} ({table_name}): {len(added)} added, {len(removed)} removed, " +
+                  f"{len(changed)} attribute changes")
+
+            if args.out_folder == None:
+                continue
+
+            os.makedirs(args.out_folder, exist_ok = True)
+            out_name = rel_path.replace(os.sep, "_").replace(".", "_")
+
+            for df, kind in [(added, "added"), (removed, "removed"), (changed, "changed")]:
+                if len(df) > 0:
+                    df.to_csv(os.path.join(args.out_folder, f"{out_name}_{table_name}_{kind}.csv"), index = False)
+
+    print(f"{num_different} of {len(results)} files differ.")
+
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
+
+    print(f"{minutes}m {seconds}s to execute.")
+
+    # non-zero exit code so this can be used as a regression check
+    if num_different > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
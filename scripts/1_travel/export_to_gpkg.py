@@ -0,0 +1,79 @@
+## export_to_gpkg.py
+## copies the feature classes + tables of a file gdb into a geopackage
+## so stages can run with MFHRN_STORAGE=gpkg on machines without arcpy
+## Author: ccai (2026)
+
+import os
+import sys
+import argparse
+import math
+import time
+
+from modules.lazy_imports import arcpy
+from modules.storage import get_storage, transfer
+
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gdb", help="file gdb to export (e.g. output/1_travel/MHN_all.gdb)")
+    parser.add_argument("-o", "--out_folder", help="folder for the geopackage (default: next to the gdb)")
+    args = parser.parse_args()
+
+    gdb = os.path.abspath(args.gdb)
+    if not os.path.isdir(gdb):
+        sys.exit(f"{gdb} does not exist.")
+
+    out_folder = args.out_folder
+    if out_folder == None:
+        out_folder = os.path.dirname(gdb)
+
+    arcpy_storage = get_storage("arcpy")
+    gpkg_storage = get_storage("gpkg")
+
+    gpkg_name = os.path.splitext(os.path.basename(gdb))[0] + ".gpkg"
+    gpkg = os.path.join(out_folder, gpkg_name)
+
+    if gpkg_storage.exists(gpkg):
+        gpkg_storage.delete(gpkg)
+
+    gpkg = gpkg_storage.create_workspace(out_folder, gpkg_name)
+
+    print(f"Exporting {gdb} to {gpkg}...")
+
+    arcpy.env.workspace = gdb
+
+    tables = [(fc, fc) for fc in arcpy.ListFeatureClasses()]
+    for fd in arcpy.ListDatasets(feature_type = "feature"):
+        tables += [(os.path.join(fd, fc), fc) for fc in arcpy.ListFeatureClasses(feature_dataset = fd)]
+    tables += [(table, table) for table in arcpy.ListTables()]
+
+    for table_path, table_name in tables:
+
+        full_path = os.path.join(gdb, table_path)
+        shape_type = getattr(arcpy.Describe(full_path), "shapeType", None)
+
+        geometry_type = None
+        if shape_type == "Point":
+            geometry_type = "POINT"
+        elif shape_type == "Polyline":
+            geometry_type = "POLYLINE"
+        elif shape_type != None:
+            print(f"Skipping {table_path} ({shape_type} geometry is not supported).")
+            continue
+
+        print(f"Exporting {table_path}...")
+        transfer(arcpy_storage, full_path, gpkg_storage, gpkg, table_name, geometry_type)
+
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
+
+    print(f"{minutes}m {seconds}s to execute.")
+
+    print("Done")
+
+if __name__ == "__main__":
+    main()
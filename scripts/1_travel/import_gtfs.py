@@ -0,0 +1,80 @@
+## import_gtfs.py
+## turns a GTFS feed into the bus run + itinerary tables of MHN.gdb
+## (bus_base / bus_current + their _itin tables, see modules/gtfs_ingest.py)
+## the tables are written to output/1_travel/gtfs_<which>.gdb to be checked + loaded into MHN.gdb
+## Author: ccai (2026)
+
+import os
+import sys
+import argparse
+import math
+import time
+
+from modules.lazy_imports import pd
+from modules.storage import get_storage
+from modules.gtfs_ingest import GtfsIngest, CHUNK_SIZE, read_bus_network, write_gtfs_tables
+
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gtfs", help="GTFS feed (zip)")
+    parser.add_argument("which", help="which bus tables to make", choices=["base", "current"])
+    parser.add_argument("-d", "--date", help="service date (YYYYMMDD) - default: every trip in the feed")
+    parser.add_argument("-r", "--routes", help="csv of ROUTE_ID, MODE, VEHICLE_TYPE (default: mode B, vehicle type 1)")
+    parser.add_argument("-c", "--chunk_size", help="rows of stop_times.txt read at once",
+                        type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.gtfs):
+        sys.exit(f"{args.gtfs} does not exist.")
+
+    # get paths
+    abs_path = os.path.abspath(sys.argv[0])
+    mfhrn_path = os.path.dirname(os.path.dirname(os.path.dirname(abs_path)))
+
+    hwynet = os.path.join(mfhrn_path, "input", "1_travel", "MHN.gdb", "hwynet")
+    out_folder = os.path.join(mfhrn_path, "output", "1_travel")
+
+    route_modes = None
+    if args.routes != None:
+        routes_df = pd.read_csv(args.routes, dtype = str)
+        route_modes = dict(zip(routes_df.ROUTE_ID, zip(routes_df.MODE, routes_df.VEHICLE_TYPE)))
+
+    storage = get_storage()
+
+    print("Reading highway network...")
+    link_store, G, node_index = read_bus_network(hwynet, storage)
+
+    gdb_name = f"gtfs_{args.which}.gdb"
+    if storage.exists(os.path.join(out_folder, gdb_name)):
+        storage.delete(os.path.join(out_folder, gdb_name))
+    workspace = storage.create_workspace(out_folder, gdb_name)
+
+    error_path = os.path.join(out_folder, f"gtfs_{args.which}_errors.txt")
+
+    with open(error_path, "w") as error_file:
+
+        ingest = GtfsIngest(link_store, G, node_index, route_modes = route_modes,
+                            chunk_size = args.chunk_size, error_file = error_file)
+
+        print(f"Ingesting {args.gtfs}...")
+        write_gtfs_tables(ingest, args.gtfs, storage, workspace, args.which, args.date)
+
+        error_file.write("\n")
+        for line in ingest.report():
+            error_file.write(line + "\n")
+            print(line)
+
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
+
+    print(f"{minutes}m {seconds}s to execute.")
+
+    print("Done")
+
+if __name__ == "__main__":
+    main()
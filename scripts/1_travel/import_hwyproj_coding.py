@@ -9,22 +9,30 @@ import argparse
 import math
 import time
 
-start_time = time.time()
+def main():
 
-# import highway project coding
-HN = HighwayNetwork()
-HN.create_base_hwy()
-HN.check_hwy_fcs()
-HN.import_hwyproj_coding()
-HN.check_hwyproj_coding_table()
-HN.finalize_hwy_data()
-HN.add_rcs()
+    start_time = time.time()
 
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
+    parser = argparse.ArgumentParser()
+    parser.parse_args()
 
-print(f"{minutes}m {seconds}s to execute.")
+    # import highway project coding
+    HN = HighwayNetwork()
+    HN.create_base_hwy()
+    HN.check_hwy_fcs()
+    HN.import_hwyproj_coding()
+    HN.check_hwyproj_coding_table()
+    HN.finalize_hwy_data()
+    HN.add_rcs()
 
-print("Done")
\ No newline at end of file
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
+
+    print(f"{minutes}m {seconds}s to execute.")
+
+    print("Done")
+
+if __name__ == "__main__":
+    main()
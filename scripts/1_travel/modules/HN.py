@@ -10,9 +10,10 @@
 import os
 import shutil
 import sys
-import arcpy
 import math
-import pandas as pd
+
+from modules.lazy_imports import arcpy, pd
+from modules.storage import get_storage, require_arcpy
 
 class HighwayNetwork:
 
@@ -47,6 +48,10 @@ class HighwayNetwork:
 
         self.current_gdb = self.mhn_in_gdb
 
+        # arcpy only - the highway network still runs arcpy geoprocessing (see modules/storage.py)
+        self.storage = get_storage()
+        require_arcpy(self.storage, os.path.basename(sys.argv[0]))
+
         self.hwylink_df = None
         self.hwynode_df = None
         self.hwyproj_df = None
@@ -1244,26 +1249,18 @@ class HighwayNetwork:
         link_fields, lf_dict, coding_fields, cf_dict = self.get_hwy_fields()
 
         hwylink_fc = os.path.join(self.current_gdb, "hwynet/hwynet_arc")
-        self.hwylink_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(hwylink_fc, link_fields)], 
-            columns = link_fields)
+        self.hwylink_df = self.storage.read_table(hwylink_fc, link_fields)
         
         hwynode_fc = os.path.join(self.current_gdb, "hwynet/hwynet_node")
         hwynode_fields = [f.name for f in arcpy.ListFields(hwynode_fc) if (f.type!="Geometry" and f.name != "OBJECTID")]
-        self.hwynode_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(hwynode_fc, hwynode_fields)], 
-            columns = hwynode_fields)
+        self.hwynode_df = self.storage.read_table(hwynode_fc, hwynode_fields)
         
         hwyproj_fc = os.path.join(self.current_gdb, "hwynet/hwyproj")
         hwyproj_fields = [f.name for f in arcpy.ListFields(hwyproj_fc) if (f.type!="Geometry" and f.name != "OBJECTID")]
-        self.hwyproj_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(hwyproj_fc, hwyproj_fields)],
-            columns = hwyproj_fields)
+        self.hwyproj_df = self.storage.read_table(hwyproj_fc, hwyproj_fields)
         
         coding_table = os.path.join(self.current_gdb, "hwyproj_coding")
-        self.coding_df = pd.DataFrame(
-            data = [row for row in arcpy.da.SearchCursor(coding_table, coding_fields)], 
-            columns = coding_fields)
+        self.coding_df = self.storage.read_table(coding_table, coding_fields)
 
     # helper method to delete relationship classes
     def del_rcs(self):
@@ -0,0 +1,116 @@
+# bus_coding.py
+# scenario / TOD / REPLACE / REROUTE coding of the future bus runs, parsed once per run:
+# - SCENARIO + TOD become bitmasks (one bit per scenario / TOD code), so the runs of a
+#   scenario x TOD are a vectorized bit test (TOD 0 = every TOD)
+# - REPLACE + REROUTE (MODERTEs separated by ":") become (row, TRANSIT_LINE, MODERTE) tables
+# codes are matched as whole tokens between separators, so scenario 1 doesn't match "10" -
+# a token that isn't a code is read digit by digit (concatenated coding like "234567")
+# author: ccai
+
+import re
+
+from modules.lazy_imports import np, pd
+
+ALL_TODS = "0"
+
+# function that finds the codes in a coded field - list of codes (in code order)
+def parse_codes(value, codes):
+
+    if value == None or value != value:
+        return []
+
+    code_strs = {str(code): code for code in codes}
+    found = set()
+
+    for token in re.split(r"[^0-9]+", str(value)):
+
+        if token in code_strs:
+            found.add(code_strs[token])
+        else:
+            found.update(code_strs[digit] for digit in token if digit in code_strs)
+
+    return [code for code in codes if code in found]
+
+# function that turns a coded field into bitmasks - bit i is set if codes[i] is coded
+# (all bits for all_value)
+def code_masks(values, codes, all_value = None):
+
+    if len(codes) > 63:
+        raise ValueError(f"{len(codes)} codes do not fit into a 64 bit mask")
+
+    bits = {code: 1 << i for i, code in enumerate(codes)}
+    all_bits = (1 << len(codes)) - 1
+
+    masks = {}
+    for value in set(values):
+
+        if all_value != None and value != None and str(value).strip() == all_value:
+            masks[value] = all_bits
+        else:
+            masks[value] = sum(bits[code] for code in parse_codes(value, codes))
+
+    return np.array([masks[value] for value in values], dtype = np.int64)
+
+# function that explodes a MODERTE list field (REPLACE / REROUTE) into a relation table
+# fields without a MODERTE ("-") code nothing
+def explode_modertes(lines, values):
+
+    rows = []
+    for row, (line, value) in enumerate(zip(lines, values)):
+
+        if not isinstance(value, str) or "-" not in value:
+            continue
+
+        for moderte in value.split(":"):
+            moderte = moderte.strip()
+            if moderte != "":
+                rows.append((row, line, moderte))
+
+    return pd.DataFrame(rows, columns = ["ROW", "TRANSIT_LINE", "MODERTE"]).astype({"ROW": "int64"})
+
+class FutureCoding:
+
+    # future_df: TRANSIT_LINE, SCENARIO, TOD, REPLACE, REROUTE per future run
+    def __init__(self, future_df, scen_codes, tod_codes):
+
+        self.scen_codes = list(scen_codes)
+        self.tod_codes = list(tod_codes)
+
+        self.lines = future_df.TRANSIT_LINE.to_numpy(dtype = object)
+
+        self.scen_masks = code_masks(future_df.SCENARIO.tolist(), self.scen_codes)
+        self.tod_masks = code_masks(future_df.TOD.tolist(), self.tod_codes, ALL_TODS)
+
+        self.replace_df = explode_modertes(self.lines, future_df.REPLACE.tolist())
+        self.reroute_df = explode_modertes(self.lines, future_df.REROUTE.tolist())
+
+        # added runs neither replace nor reroute anything
+        self.is_added = np.ones(len(self.lines), dtype = bool)
+        self.is_added[self.replace_df.ROW.to_numpy()] = False
+        self.is_added[self.reroute_df.ROW.to_numpy()] = False
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # runs coded for a scenario + TOD (boolean per row)
+    def selected(self, scen, tod):
+
+        scen_bit = 1 << self.scen_codes.index(scen)
+        tod_bit = 1 << self.tod_codes.index(tod)
+
+        return ((self.scen_masks & scen_bit) != 0) & ((self.tod_masks & tod_bit) != 0)
+
+    # coding of a scenario + TOD:
+    # (selected rows, added lines, line -> replaced MODERTEs, MODERTE -> rerouting lines)
+    def select(self, scen, tod):
+
+        selected = self.selected(scen, tod)
+
+        add_list = self.lines[selected & self.is_added].tolist()
+
+        replace_df = self.replace_df[selected[self.replace_df.ROW.to_numpy()]]
+        replace_dict = replace_df.groupby("TRANSIT_LINE", sort = False)["MODERTE"].apply(list).to_dict()
+
+        reroute_df = self.reroute_df[selected[self.reroute_df.ROW.to_numpy()]]
+        reroute_dict = reroute_df.groupby("MODERTE", sort = False)["TRANSIT_LINE"].apply(list).to_dict()
+
+        return selected, add_list, replace_dict, reroute_dict
@@ -0,0 +1,229 @@
+# contraction_hierarchy.py
+# contraction hierarchy of a directed, weighted network for repeated shortest path queries:
+# nodes are contracted one at a time (least important first) and shortcuts are added
+# where a contracted node was on the only shortest path between two of its neighbors -
+# a query is then a bidirectional dijkstra that only goes "up" the hierarchy
+# shortcuts remember the node they skip, so paths are unpacked into network links
+# author: ccai
+
+import heapq
+
+INFINITY = float("inf")
+
+class ContractionHierarchy:
+
+    def __init__(self, G, weight = "weight", witness_limit = 60):
+
+        self.witness_limit = witness_limit
+
+        # remaining (not yet contracted) network: node -> {neighbor: (weight, middle node)}
+        out_edges = {node: {} for node in G.nodes()}
+        in_edges = {node: {} for node in G.nodes()}
+
+        for a, b, data in G.edges(data = True):
+
+            if a == b:
+                continue
+
+            w = data.get(weight, 1)
+            if b not in out_edges[a] or w < out_edges[a][b][0]:
+                out_edges[a][b] = (w, None)
+                in_edges[b][a] = (w, None)
+
+        # edges to higher ranked nodes: up_out[a][b] = edge a -> b, up_in[b][a] = edge a -> b
+        self.up_out = {node: {} for node in G.nodes()}
+        self.up_in = {node: {} for node in G.nodes()}
+        self.rank = {}
+
+        self.num_shortcuts = 0
+
+        self.contract(out_edges, in_edges)
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # shortest path from a to b - (distance, list of nodes) or None if there is no path
+    def shortest_path(self, a, b):
+
+        if a not in self.rank or b not in self.rank:
+            return None
+
+        if a == b:
+            return 0, [a]
+
+        dist = [{a: 0}, {b: 0}]
+        parent = [{a: None}, {b: None}]
+        heaps = [[(0, a)], [(0, b)]]
+        up_edges = [self.up_out, self.up_in]
+
+        best = INFINITY
+        meet = None
+
+        while True:
+
+            # search the direction with the smaller distance (until both pass the best path)
+            tops = [heap[0][0] if len(heap) > 0 else INFINITY for heap in heaps]
+            side = 0 if tops[0] <= tops[1] else 1
+
+            if tops[side] >= best:
+                break
+
+            d, node = heapq.heappop(heaps[side])
+            if d > dist[side][node]:
+                continue
+
+            other_d = dist[1 - side].get(node)
+            if other_d != None and d + other_d < best:
+                best = d + other_d
+                meet = node
+
+            for neighbor, (w, middle) in up_edges[side][node].items():
+
+                new_d = d + w
+                if new_d < dist[side].get(neighbor, INFINITY):
+                    dist[side][neighbor] = new_d
+                    parent[side][neighbor] = (node, middle)
+                    heapq.heappush(heaps[side], (new_d, neighbor))
+
+        if meet == None:
+            return None
+
+        # forward half: a -> meet
+        edges = []
+        node = meet
+        while parent[0][node] != None:
+            prev_node, middle = parent[0][node]
+            edges.append((prev_node, node, middle))
+            node = prev_node
+        edges.reverse()
+
+        # backward half: meet -> b
+        node = meet
+        while parent[1][node] != None:
+            next_node, middle = parent[1][node]
+            edges.append((node, next_node, middle))
+            node = next_node
+
+        path = [a]
+        for edge in edges:
+            path += self.unpack_edge(*edge)[1:]
+
+        return best, path
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that contracts every node
+    def contract(self, out_edges, in_edges):
+
+        contracted_neighbors = {node: 0 for node in out_edges}
+
+        queue = [(self.edge_difference(node, out_edges, in_edges, contracted_neighbors), node)
+                 for node in out_edges]
+        heapq.heapify(queue)
+
+        while len(queue) > 0:
+
+            priority, node = heapq.heappop(queue)
+
+            # lazy update - contract only if still the least important
+            new_priority = self.edge_difference(node, out_edges, in_edges, contracted_neighbors)
+            if len(queue) > 0 and new_priority > queue[0][0]:
+                heapq.heappush(queue, (new_priority, node))
+                continue
+
+            self.rank[node] = len(self.rank)
+
+            for a, b, w in self.find_shortcuts(node, out_edges, in_edges):
+                if b not in out_edges[a] or w < out_edges[a][b][0]:
+                    out_edges[a][b] = (w, node)
+                    in_edges[b][a] = (w, node)
+                    self.num_shortcuts += 1
+
+            # the remaining edges of the node all go to higher ranked nodes
+            self.up_out[node] = out_edges.pop(node)
+            self.up_in[node] = in_edges.pop(node)
+
+            for b in self.up_out[node]:
+                del in_edges[b][node]
+                contracted_neighbors[b] += 1
+            for a in self.up_in[node]:
+                del out_edges[a][node]
+                contracted_neighbors[a] += 1
+
+    # helper method that finds the shortcuts needed to contract a node: (a, b, weight)
+    def find_shortcuts(self, node, out_edges, in_edges):
+
+        shortcuts = []
+
+        for a, (w_in, m_in) in in_edges[node].items():
+
+            targets = {b: w_in + w_out for b, (w_out, m_out) in out_edges[node].items() if b != a}
+            if len(targets) == 0:
+                continue
+
+            witness_dist = self.witness_search(a, node, max(targets.values()), out_edges)
+
+            for b, w in targets.items():
+                if witness_dist.get(b, INFINITY) > w:
+                    shortcuts.append((a, b, w))
+
+        return shortcuts
+
+    # helper method that runs a limited dijkstra from a around the node being contracted
+    def witness_search(self, a, skip_node, max_dist, out_edges):
+
+        dist = {a: 0}
+        heap = [(0, a)]
+        settled = 0
+
+        while len(heap) > 0 and settled < self.witness_limit:
+
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            if d > max_dist:
+                break
+
+            settled += 1
+
+            for neighbor, (w, middle) in out_edges[node].items():
+
+                if neighbor == skip_node:
+                    continue
+
+                new_d = d + w
+                if new_d < dist.get(neighbor, INFINITY):
+                    dist[neighbor] = new_d
+                    heapq.heappush(heap, (new_d, neighbor))
+
+        return dist
+
+    # helper method that estimates how much contracting a node adds to the network
+    def edge_difference(self, node, out_edges, in_edges, contracted_neighbors):
+
+        num_shortcuts = len(self.find_shortcuts(node, out_edges, in_edges))
+        num_edges = len(out_edges[node]) + len(in_edges[node])
+
+        return num_shortcuts - num_edges + contracted_neighbors[node]
+
+    # helper method that unpacks an edge (a -> b, skipping middle) into network nodes
+    def unpack_edge(self, a, b, middle):
+
+        path = [a]
+        stack = [(a, b, middle)]
+
+        while len(stack) > 0:
+
+            a, b, middle = stack.pop()
+
+            if middle == None:
+                path.append(b)
+                continue
+
+            # a -> middle and middle -> b were edges when middle was contracted
+            _, m_first = self.up_in[middle][a]
+            _, m_second = self.up_out[middle][b]
+
+            stack.append((middle, b, m_second))
+            stack.append((a, middle, m_first))
+
+        return path
@@ -0,0 +1,415 @@
+# csr_graph.py
+# compressed sparse row (CSR) highway network:
+# nodes are numbered 0..n-1 (node_ids holds the MHN node of each index), the edges of
+# node i are indptr[i]:indptr[i + 1] in dst / weights (weights = miles)
+# one CSRGraph is built per scenario - a TOD network is the same graph with an edge mask
+# (AMPM + no centroids), so nothing is rebuilt per TOD
+# MaskedGraph runs the graph algorithms (shortest path, hop path, strongly connected
+# components) on the masked edges and also answers the networkx calls used by the
+# bus scripts (nodes, has_edge, successors, edges, ...)
+# author: ccai
+
+import heapq
+
+from modules.lazy_imports import np, nx
+
+INFINITY = float("inf")
+
+# helper function that sorts edges by a node index into CSR arrays
+# returns (indptr, edge order)
+def make_csr(num_nodes, edge_nodes):
+
+    order = np.argsort(edge_nodes, kind = "stable")
+    indptr = np.searchsorted(edge_nodes[order], np.arange(num_nodes + 1))
+
+    return indptr, order
+
+class CSRGraph:
+
+    # edges in record order: anodes[i] -> bnodes[i] with weights[i]
+    def __init__(self, anodes, bnodes, weights):
+
+        anodes = np.asarray(anodes, dtype = np.int64)
+        bnodes = np.asarray(bnodes, dtype = np.int64)
+        weights = np.asarray(weights, dtype = np.float64)
+
+        self.node_ids = np.unique(np.concatenate([anodes, bnodes]))
+        self.num_nodes = len(self.node_ids)
+
+        src = np.searchsorted(self.node_ids, anodes)
+        dst = np.searchsorted(self.node_ids, bnodes)
+
+        # edge order: record index of each CSR edge
+        self.indptr, self.edge_order = make_csr(self.num_nodes, src)
+
+        self.src = src[self.edge_order]
+        self.dst = dst[self.edge_order]
+        self.weights = weights[self.edge_order]
+
+    # TOD network - record_mask is a boolean per edge in record order
+    def tod_graph(self, record_mask):
+
+        edge_mask = np.asarray(record_mask, dtype = bool)[self.edge_order]
+
+        return MaskedGraph(self, edge_mask)
+
+class MaskedGraph:
+
+    def __init__(self, csr, edge_mask):
+
+        self.csr = csr
+        node_ids = csr.node_ids
+
+        src = csr.src[edge_mask]
+        dst = csr.dst[edge_mask]
+        weights = csr.weights[edge_mask]
+
+        self.num_edges = len(src)
+
+        # forward + reverse adjacency of the masked edges
+        # (flat python lists - the searches below are plain python loops)
+        indptr, order = make_csr(csr.num_nodes, src)
+        self.indptr = indptr.tolist()
+        self.dst = dst[order].tolist()
+        self.weights = weights[order].tolist()
+
+        rev_indptr, rev_order = make_csr(csr.num_nodes, dst)
+        self.rev_indptr = rev_indptr.tolist()
+        self.rev_src = src[rev_order].tolist()
+        self.rev_weights = weights[rev_order].tolist()
+
+        # like a networkx graph built edge by edge - only nodes with an edge exist
+        active = np.zeros(csr.num_nodes, dtype = bool)
+        active[src] = True
+        active[dst] = True
+
+        self.active_indices = np.flatnonzero(active).tolist()
+        self.node_ids = node_ids.tolist()
+        self.node_index = {self.node_ids[i]: i for i in self.active_indices}
+
+    # NETWORKX COMPATIBILITY ----------------------------------------------------------------------
+
+    def nodes(self):
+        return [self.node_ids[i] for i in self.active_indices]
+
+    def __contains__(self, node):
+        return node in self.node_index
+
+    def __iter__(self):
+        return iter(self.nodes())
+
+    def __len__(self):
+        return len(self.active_indices)
+
+    def number_of_nodes(self):
+        return len(self.active_indices)
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    def has_node(self, node):
+        return node in self.node_index
+
+    def has_edge(self, a, b):
+
+        i = self.node_index.get(a)
+        j = self.node_index.get(b)
+
+        if i == None or j == None:
+            return False
+
+        return j in self.dst[self.indptr[i]: self.indptr[i + 1]]
+
+    def successors(self, node):
+
+        i = self.node_index[node]
+
+        return [self.node_ids[j] for j in self.dst[self.indptr[i]: self.indptr[i + 1]]]
+
+    def edges(self, data = False):
+
+        node_ids = self.node_ids
+
+        for i in self.active_indices:
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                if data == True:
+                    yield node_ids[i], node_ids[self.dst[k]], {"weight": self.weights[k]}
+                else:
+                    yield node_ids[i], node_ids[self.dst[k]]
+
+    # for anything else networkx can do
+    def to_networkx(self):
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodes())
+        G.add_weighted_edges_from((a, b, data["weight"]) for a, b, data in self.edges(data = True))
+
+        return G
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # shortest path on miles (bidirectional dijkstra) - (miles, list of nodes) or None
+    def shortest_path(self, a, b):
+
+        i = self.node_index.get(a)
+        j = self.node_index.get(b)
+
+        if i == None or j == None:
+            return None
+
+        if i == j:
+            return 0, [a]
+
+        dist = [{i: 0}, {j: 0}]
+        parent = [{i: None}, {j: None}]
+        settled = [set(), set()]
+        heaps = [[(0, i)], [(0, j)]]
+        adjacency = [(self.indptr, self.dst, self.weights),
+                     (self.rev_indptr, self.rev_src, self.rev_weights)]
+
+        best = INFINITY
+        meet = None
+
+        while len(heaps[0]) > 0 and len(heaps[1]) > 0:
+
+            # stop once no shorter path can be found
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+
+            d, node = heapq.heappop(heaps[side])
+            if node in settled[side]:
+                continue
+            settled[side].add(node)
+
+            indptr, neighbors, weights = adjacency[side]
+            other_dist = dist[1 - side]
+
+            for k in range(indptr[node], indptr[node + 1]):
+
+                neighbor = neighbors[k]
+                new_d = d + weights[k]
+
+                if new_d < dist[side].get(neighbor, INFINITY):
+                    dist[side][neighbor] = new_d
+                    parent[side][neighbor] = node
+                    heapq.heappush(heaps[side], (new_d, neighbor))
+
+                if neighbor in other_dist and new_d + other_dist[neighbor] < best:
+                    best = new_d + other_dist[neighbor]
+                    meet = neighbor
+
+        if meet == None:
+            return None
+
+        path = []
+        node = meet
+        while node != None:
+            path.append(node)
+            node = parent[0][node]
+        path.reverse()
+
+        node = parent[1][meet]
+        while node != None:
+            path.append(node)
+            node = parent[1][node]
+
+        return best, [self.node_ids[k] for k in path]
+
+    # shortest paths on miles from a to each target (dijkstra, stops once every target is
+    # settled) - {target: (miles, list of nodes) or None}
+    # a path does not depend on the other targets, so a batch gives the same paths
+    # as one call per target
+    def shortest_paths_from(self, a, targets):
+
+        i = self.node_index.get(a)
+
+        results = {target: None for target in targets}
+        remaining = {}
+        for target in targets:
+            j = self.node_index.get(target)
+            if j != None and i != None:
+                remaining[j] = target
+
+        if len(remaining) == 0:
+            return results
+
+        indptr = self.indptr
+        dst = self.dst
+        weights = self.weights
+
+        dist = {i: 0}
+        parent = {i: None}
+        settled = set()
+        heap = [(0, i)]
+
+        while len(heap) > 0 and len(remaining) > 0:
+
+            d, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+
+            if node in remaining:
+
+                path = []
+                k = node
+                while k != None:
+                    path.append(self.node_ids[k])
+                    k = parent[k]
+                path.reverse()
+
+                results[remaining.pop(node)] = (d, path)
+
+            for k in range(indptr[node], indptr[node + 1]):
+
+                neighbor = dst[k]
+                new_d = d + weights[k]
+
+                if new_d < dist.get(neighbor, INFINITY):
+                    dist[neighbor] = new_d
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (new_d, neighbor))
+
+        return results
+
+    # path with the fewest links (breadth first) - list of nodes or None
+    def hop_path(self, a, b):
+
+        i = self.node_index.get(a)
+        j = self.node_index.get(b)
+
+        if i == None or j == None:
+            return None
+
+        parent = {i: None}
+        frontier = [i]
+
+        while len(frontier) > 0 and j not in parent:
+
+            next_frontier = []
+
+            for node in frontier:
+                for neighbor in self.dst[self.indptr[node]: self.indptr[node + 1]]:
+                    if neighbor not in parent:
+                        parent[neighbor] = node
+                        next_frontier.append(neighbor)
+
+            frontier = next_frontier
+
+        if j not in parent:
+            return None
+
+        path = []
+        node = j
+        while node != None:
+            path.append(self.node_ids[node])
+            node = parent[node]
+        path.reverse()
+
+        return path
+
+    # miles of a path (shortest parallel link)
+    def path_weight(self, path):
+
+        miles = 0
+
+        for a, b in zip(path[:-1], path[1:]):
+
+            i = self.node_index[a]
+            j = self.node_index[b]
+
+            miles += min(self.weights[k] for k in range(self.indptr[i], self.indptr[i + 1])
+                         if self.dst[k] == j)
+
+        return miles
+
+    # strongly connected components (iterative tarjan)
+    # returns (component of each node index - -1 for nodes without edges, number of components)
+    # components are numbered in reverse topological order: an edge between two components
+    # always goes from a higher to a lower number
+    def strongly_connected_components(self):
+
+        indptr = self.indptr
+        dst = self.dst
+
+        num_nodes = len(self.node_ids)
+        index = [-1] * num_nodes
+        low = [0] * num_nodes
+        on_stack = [False] * num_nodes
+        labels = [-1] * num_nodes
+
+        stack = []
+        counter = 0
+        num_comps = 0
+
+        for root in self.active_indices:
+
+            if index[root] != -1:
+                continue
+
+            index[root] = counter
+            low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+
+            work = [[root, indptr[root]]]
+
+            while len(work) > 0:
+
+                frame = work[-1]
+                node = frame[0]
+
+                if frame[1] < indptr[node + 1]:
+
+                    neighbor = dst[frame[1]]
+                    frame[1] += 1
+
+                    if index[neighbor] == -1:
+                        index[neighbor] = counter
+                        low[neighbor] = counter
+                        counter += 1
+                        stack.append(neighbor)
+                        on_stack[neighbor] = True
+                        work.append([neighbor, indptr[neighbor]])
+
+                    elif on_stack[neighbor]:
+                        low[node] = min(low[node], index[neighbor])
+
+                    continue
+
+                work.pop()
+
+                if len(work) > 0:
+                    parent_node = work[-1][0]
+                    low[parent_node] = min(low[parent_node], low[node])
+
+                if low[node] == index[node]:
+
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        labels[member] = num_comps
+                        if member == node:
+                            break
+
+                    num_comps += 1
+
+        return labels, num_comps
+
+    # edges between components (component pairs, no duplicates)
+    def component_edges(self, labels):
+
+        comp_edges = set()
+
+        for i in self.active_indices:
+
+            comp = labels[i]
+
+            for neighbor in self.dst[self.indptr[i]: self.indptr[i + 1]]:
+                if labels[neighbor] != comp:
+                    comp_edges.add((comp, labels[neighbor]))
+
+        return comp_edges
@@ -0,0 +1,446 @@
+# emme_files.py
+# parsers for the emme batchin files written by 2_generate_hwy_files.py and
+# 4_generate_transit_files.py + keyed diffs between two sets of them
+# author: ccai
+
+import io
+import os
+import re
+import gzip
+import tarfile
+import zipfile
+
+from modules.lazy_imports import np, pd
+
+# columns of each batchin file (key columns first)
+L1_COLUMNS = ["INODE", "JNODE", "LENGTH", "MODES", "TYPE", "LANES", "VDF"]
+L2_COLUMNS = ["INODE", "JNODE", "SPEED", "WIDTH", "PARKL", "CLTL", "TOLL", "SIGIC", "RRX", "TIPID"]
+N1_COLUMNS = ["NODE", "CENTROID", "X", "Y"]
+N2_COLUMNS = ["NODE", "ZONE", "ATYPE", "IMAREA"]
+LINKSHAPE_COLUMNS = ["INODE", "JNODE", "VERTEX", "X", "Y"]
+LINE_COLUMNS = ["TRANSIT_LINE", "MODE", "VEHICLE_TYPE", "HEADWAY", "SPEED", "DESCRIPTION", "LAYOVER"]
+SEGMENT_COLUMNS = ["TRANSIT_LINE", "SEQ", "INODE", "JNODE", "DWT", "TTF", "US1", "US2"]
+
+LINK_KEY = ["INODE", "JNODE"]
+NODE_KEY = ["NODE"]
+LINE_KEY = ["TRANSIT_LINE"]
+SEGMENT_KEY = ["TRANSIT_LINE", "INODE", "JNODE", "OCCURRENCE"]
+
+# archives written by the tar + zip sinks (see output_sinks.py) - their members are compared
+ARCHIVE_SUFFIXES = [".tar", ".zip"]
+
+# bookkeeping files next to the emme files that are not compared
+SKIP_FILES = ["manifest.json"]
+
+HEADER_RE = re.compile(
+    r"^a\s+'(?P<line>[^']*)'\s+(?P<mode>\S+)\s+(?P<veh>\S+)\s+"
+    r"(?P<hdwy>\S+)\s+(?P<speed>\S+)\s+'(?P<desc>[^']*)'")
+
+# PARSERS -------------------------------------------------------------------------------------
+
+# helper function that opens a batchin file, compressed or not (see output_sinks.py)
+# file_path can also be an (archive path, member name) pair for a member of a tar/zip sink
+def open_text(file_path):
+
+    if isinstance(file_path, tuple):
+        return open_member(*file_path)
+
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt")
+
+    if file_path.endswith(".zst"):
+        import zstandard
+        raw_file = open(file_path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw_file, closefd = True))
+
+    return open(file_path, "r")
+
+# helper function that opens a member of a tar/zip archive as text (streamed, not extracted)
+def open_member(archive_path, member_name):
+
+    if archive_path.endswith(".tar"):
+        archive = tarfile.open(archive_path, "r")
+        member_file = archive.extractfile(member_name)
+    else:
+        archive = zipfile.ZipFile(archive_path, "r")
+        member_file = archive.open(member_name, "r")
+
+    return _MemberTextWrapper(member_file, archive)
+
+# text wrapper that also closes the archive of its member
+class _MemberTextWrapper(io.TextIOWrapper):
+
+    def __init__(self, member_file, archive):
+
+        super().__init__(member_file, encoding = "utf-8")
+        self.archive = archive
+
+    def close(self):
+
+        if self.closed:
+            return
+
+        super().close()
+        self.archive.close()
+
+# helper function that lists the file members of a tar/zip archive
+def list_members(archive_path):
+
+    if archive_path.endswith(".tar"):
+        with tarfile.open(archive_path, "r") as archive:
+            return [member.name for member in archive.getmembers() if member.isfile()]
+
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        return [name for name in archive.namelist() if not name.endswith("/")]
+
+# helper function that strips a compression suffix from a file name
+def strip_compression(file_name):
+
+    for suffix in [".gz", ".zst"]:
+        if file_name.endswith(suffix):
+            return file_name[: -len(suffix)]
+
+    return file_name
+
+# helper function that yields the data lines of a batchin file (no comments/transactions)
+def read_data_lines(file_path):
+
+    with open_text(file_path) as f:
+        for line in f:
+
+            line = line.rstrip("\n")
+            stripped = line.strip()
+
+            if stripped == "" or stripped.startswith("c ") or stripped == "c":
+                continue
+            if stripped.startswith("t "):
+                continue
+
+            yield line
+
+# helper function that reads the data lines of a batchin file into a df with the C parser of
+# pandas (the files have a fixed number of whitespace separated fields)
+# comment + transaction lines (and lines starting with skip_tokens) are dropped with one
+# regex over the whole file instead of line by line
+# fields: [(column, dtype), ...] - columns starting with "_" are not kept
+def read_data_table(file_path, fields, skip_tokens = ()):
+
+    skip_re = re.compile(r"^[ \t]*(?:" + "|".join(["c", "t"] + list(skip_tokens)) + r")(?:[ \t].*)?(?:\n|$)",
+                         re.MULTILINE)
+
+    with open_text(file_path) as f:
+        text = skip_re.sub("", f.read())
+
+    columns = [column for column, dtype in fields if not column.startswith("_")]
+    dtypes = {column: dtype for column, dtype in fields if not column.startswith("_")}
+
+    if text.strip() == "":
+        return pd.DataFrame({column: pd.Series(dtype = dtypes[column]) for column in columns})
+
+    return pd.read_csv(io.StringIO(text), sep = r"\s+", header = None,
+                       names = [column for column, dtype in fields], usecols = columns,
+                       dtype = dtypes)[columns]
+
+# parse link file (.l1)
+def parse_l1(file_path):
+
+    # a inode jnode length modes type lanes vdf
+    fields = [("_A", object), ("INODE", "int64"), ("JNODE", "int64"), ("LENGTH", "float64"),
+              ("MODES", object), ("TYPE", object), ("LANES", "float64"), ("VDF", object)]
+
+    return read_data_table(file_path, fields)
+
+# parse extra link attribute file (.l2)
+def parse_l2(file_path):
+
+    fields = [("INODE", "int64"), ("JNODE", "int64")] + \
+             [(column, "float64") for column in L2_COLUMNS[2:9]] + [("TIPID", object)]
+
+    return read_data_table(file_path, fields)
+
+# parse node file (.n1)
+def parse_n1(file_path):
+
+    fields = [("A", object), ("NODE", "int64"), ("X", "float64"), ("Y", "float64")]
+
+    node_df = read_data_table(file_path, fields)
+    node_df.insert(1, "CENTROID", (node_df.A == "a*").astype("int64"))
+
+    return node_df[N1_COLUMNS]
+
+# parse extra node attribute file (.n2)
+def parse_n2(file_path):
+
+    fields = [("NODE", "int64"), ("ZONE", object), ("ATYPE", object), ("IMAREA", object)]
+
+    return read_data_table(file_path, fields)
+
+# parse link shape file (highway.linkshape)
+# "r a b" only starts a new link - the vertices carry the key
+def parse_linkshape(file_path):
+
+    fields = [("_A", object), ("INODE", "int64"), ("JNODE", "int64"), ("VERTEX", "int64"),
+              ("X", "float64"), ("Y", "float64")]
+
+    return read_data_table(file_path, fields, skip_tokens = ["r"])
+
+# parse bus itinerary file (bus.itinerary_N)
+# returns a table of lines + a table of segments
+# segment attributes are the ones coded after the segment's i-node
+def parse_itinerary(file_path):
+
+    line_records = []
+    segment_records = []
+
+    tr_line = None
+    prev_node = None
+    seq = 0
+    attrs = {}
+    pending = {}
+
+    def close_line():
+        if tr_line != None:
+            line_records[-1][-1] = pending.get("lay")
+
+    for line in read_data_lines(file_path):
+
+        match = HEADER_RE.match(line)
+
+        if match != None:
+
+            close_line()
+
+            tr_line = match.group("line")
+            line_records.append([tr_line, match.group("mode"), match.group("veh"),
+                                 float(match.group("hdwy")), float(match.group("speed")),
+                                 match.group("desc").rstrip(), None])
+            prev_node = None
+            seq = 0
+            attrs = {}
+            pending = {}
+            continue
+
+        for token in line.split():
+
+            if "=" in token:
+
+                key, value = token.split("=", 1)
+                pending[key] = value
+                continue
+
+            node = int(token)
+
+            if prev_node != None:
+                seq += 1
+                attrs = attrs | pending
+                segment_records.append([tr_line, seq, prev_node, node,
+                                        attrs.get("dwt"), attrs.get("ttf"),
+                                        attrs.get("us1"), attrs.get("us2")])
+            else:
+                attrs = attrs | pending
+
+            pending = {}
+            prev_node = node
+
+    close_line()
+
+    line_df = pd.DataFrame(line_records, columns = LINE_COLUMNS)
+    segment_df = pd.DataFrame(segment_records, columns = SEGMENT_COLUMNS)
+
+    return line_df, segment_df
+
+# helper function that parses every file in a highway scenario folder by extension
+def parse_hwy_folder(folder_path):
+
+    tables = {}
+
+    for file_name in sorted(os.listdir(folder_path)):
+
+        file_path = os.path.join(folder_path, file_name)
+        file_name = strip_compression(file_name)
+        ext = os.path.splitext(file_name)[1]
+
+        if ext == ".l1":
+            tables[file_name] = parse_l1(file_path)
+        elif ext == ".l2":
+            tables[file_name] = parse_l2(file_path)
+        elif ext == ".n1":
+            tables[file_name] = parse_n1(file_path)
+        elif ext == ".n2":
+            tables[file_name] = parse_n2(file_path)
+        elif file_name == "highway.linkshape":
+            tables[file_name] = parse_linkshape(file_path)
+
+    return tables
+
+# DIFFS ---------------------------------------------------------------------------------------
+
+# helper function that drops the rows found with the same values on both sides
+# (rows are hashed) - most rows of two runs are the same, so only the rest is merged
+def drop_unchanged(old_df, new_df):
+
+    columns = [col for col in new_df.columns if col in old_df.columns]
+
+    old_hashes = pd.util.hash_pandas_object(old_df[columns], index = False).to_numpy()
+    new_hashes = pd.util.hash_pandas_object(new_df[columns], index = False).to_numpy()
+
+    return old_df[~np.isin(old_hashes, new_hashes)], new_df[~np.isin(new_hashes, old_hashes)]
+
+# keyed diff of two tables
+# returns (added df, removed df, changed df) - changed is long format:
+# key columns + ATTRIBUTE, OLD, NEW
+def diff_tables(old_df, new_df, key):
+
+    old_df, new_df = drop_unchanged(old_df, new_df)
+
+    attrs = [col for col in new_df.columns if col not in key and col in old_df.columns]
+
+    merged = pd.merge(old_df, new_df, on = key, how = "outer",
+                      suffixes = ("_OLD", "_NEW"), indicator = True)
+
+    added = merged[merged._merge == "right_only"]
+    added = added[key + [f"{attr}_NEW" for attr in attrs]]
+    added.columns = key + attrs
+
+    removed = merged[merged._merge == "left_only"]
+    removed = removed[key + [f"{attr}_OLD" for attr in attrs]]
+    removed.columns = key + attrs
+
+    both = merged[merged._merge == "both"]
+
+    changed_list = []
+
+    for attr in attrs:
+
+        old_col = both[f"{attr}_OLD"]
+        new_col = both[f"{attr}_NEW"]
+
+        diff_mask = (old_col != new_col) & ~(old_col.isna() & new_col.isna())
+
+        if diff_mask.any():
+            changed_attr = both.loc[diff_mask, key].copy()
+            changed_attr["ATTRIBUTE"] = attr
+            changed_attr["OLD"] = old_col[diff_mask].to_numpy()
+            changed_attr["NEW"] = new_col[diff_mask].to_numpy()
+            changed_list.append(changed_attr)
+
+    if len(changed_list) > 0:
+        changed = pd.concat(changed_list, ignore_index = True)
+    else:
+        changed = pd.DataFrame(columns = key + ["ATTRIBUTE", "OLD", "NEW"])
+
+    return added.reset_index(drop = True), removed.reset_index(drop = True), changed
+
+# helper function that collapses linkshape vertices to one row per link
+def collapse_linkshape(linkshape_df):
+
+    linkshape_df = linkshape_df.sort_values(["INODE", "JNODE", "VERTEX"])
+    linkshape_df["XY"] = list(zip(linkshape_df.X.round(3), linkshape_df.Y.round(3)))
+
+    return linkshape_df.groupby(LINK_KEY)["XY"].apply(tuple).rename("VERTICES").reset_index()
+
+# helper function that adds an occurrence counter so repeated segments within a line stay unique
+def add_occurrence(segment_df):
+
+    segment_df = segment_df.copy()
+    segment_df["OCCURRENCE"] = segment_df.groupby(["TRANSIT_LINE", "INODE", "JNODE"]).cumcount()
+
+    return segment_df
+
+# diff two files of the same kind (paths or (archive path, member name) pairs)
+# returns a dict of table name -> (added, removed, changed) - None if the kind is not known
+def diff_files(old_path, new_path):
+
+    if isinstance(new_path, tuple):
+        file_name = strip_compression(os.path.basename(new_path[1]))
+    else:
+        file_name = strip_compression(os.path.basename(new_path))
+    ext = os.path.splitext(file_name)[1]
+
+    if ext == ".l1":
+        return {"links": diff_tables(parse_l1(old_path), parse_l1(new_path), LINK_KEY)}
+    elif ext == ".l2":
+        return {"links": diff_tables(parse_l2(old_path), parse_l2(new_path), LINK_KEY)}
+    elif ext == ".n1":
+        return {"nodes": diff_tables(parse_n1(old_path), parse_n1(new_path), NODE_KEY)}
+    elif ext == ".n2":
+        return {"nodes": diff_tables(parse_n2(old_path), parse_n2(new_path), NODE_KEY)}
+    elif file_name == "highway.linkshape":
+        old_df = parse_linkshape(old_path)
+        new_df = parse_linkshape(new_path)
+        # only links with a changed vertex are collapsed + compared
+        old_changed, new_changed = drop_unchanged(old_df, new_df)
+        changed_links = pd.concat([old_changed[LINK_KEY], new_changed[LINK_KEY]]).drop_duplicates()
+        old_df = collapse_linkshape(old_df.merge(changed_links, on = LINK_KEY))
+        new_df = collapse_linkshape(new_df.merge(changed_links, on = LINK_KEY))
+        return {"shapes": diff_tables(old_df, new_df, LINK_KEY)}
+    elif file_name.startswith("bus.itinerary"):
+        old_lines, old_segs = parse_itinerary(old_path)
+        new_lines, new_segs = parse_itinerary(new_path)
+        old_segs = add_occurrence(old_segs).drop(columns = ["SEQ"])
+        new_segs = add_occurrence(new_segs).drop(columns = ["SEQ"])
+        return {"lines": diff_tables(old_lines, new_lines, LINE_KEY),
+                "segments": diff_tables(old_segs, new_segs, SEGMENT_KEY)}
+
+    return None
+
+# diff every batchin file found in two output folders
+# (matched by relative path, so compressed, archived and plain outputs can be compared -
+# the members of <scenario>.tar / .zip are <scenario>/<file>, like the plain folder)
+# returns a dict of relative path -> diff_files result
+# files only found on one side are reported with the strings "added"/"removed",
+# files of a kind that can't be compared with "not compared"
+def diff_folders(old_folder, new_folder):
+
+    # relative path (without compression suffix) -> full path / (archive path, member name)
+    def list_files(folder):
+        file_dict = {}
+        for root, dirs, files in os.walk(folder):
+            for file_name in files:
+
+                if file_name in SKIP_FILES:
+                    continue
+
+                file_path = os.path.join(root, file_name)
+                rel_folder = os.path.relpath(root, folder)
+
+                if os.path.splitext(file_name)[1] in ARCHIVE_SUFFIXES:
+                    for member_name in list_members(file_path):
+                        rel_path = os.path.normpath(os.path.join(rel_folder, member_name))
+                        file_dict[strip_compression(rel_path)] = (file_path, member_name)
+                else:
+                    file_dict[strip_compression(os.path.relpath(file_path, folder))] = file_path
+
+        return file_dict
+
+    old_files = list_files(old_folder)
+    new_files = list_files(new_folder)
+
+    results = {}
+
+    for rel_path in sorted(set(old_files) | set(new_files)):
+
+        if rel_path not in new_files:
+            results[rel_path] = "removed"
+        elif rel_path not in old_files:
+            results[rel_path] = "added"
+        else:
+            diff = diff_files(old_files[rel_path], new_files[rel_path])
+            if diff == None:
+                results[rel_path] = "not compared"
+            else:
+                results[rel_path] = diff
+
+    return results
+
+# helper function that checks whether a diff result has any differences
+def has_differences(diff):
+
+    if isinstance(diff, str):
+        return True
+
+    for added, removed, changed in diff.values():
+        if len(added) > 0 or len(removed) > 0 or len(changed) > 0:
+            return True
+
+    return False
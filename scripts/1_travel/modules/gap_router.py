@@ -0,0 +1,217 @@
+# gap_router.py
+# routes itinerary gaps (segments missing from a TOD highway network -
+# a MaskedGraph, see modules/csr_graph.py)
+# dijkstra on miles with an LRU cache keyed by (scen, tod, a, b) since many lines share
+# the same missing segments - the gaps of a TOD can be routed as a batch first
+# (route_many), with one search per origin that stops once all its destinations are found
+# unreachable gaps are rejected through the reachability index of the network
+# without searching
+# optionally the network is preprocessed into a contraction hierarchy (router "ch"),
+# which pays off once a network answers more than ~2000 searches (see run_benchmarks.py)
+# for QA runs (compare_hops = True) the unweighted (hop count) path that was used before
+# is computed alongside so the difference in miles can be reported - this is a second
+# search per gap, so it is off by default
+# author: ccai
+
+from collections import OrderedDict
+
+from modules.reachability import ReachabilityIndex
+from modules.contraction_hierarchy import ContractionHierarchy
+
+ROUTERS = ["dijkstra", "ch"]
+
+class GapRouter:
+
+    def __init__(self, method = "dijkstra", cache_size = 100000, compare_hops = False):
+
+        if method not in ROUTERS:
+            raise ValueError(f"Unknown router {method} - use one of {ROUTERS}")
+
+        self.method = method
+        self.cache_size = cache_size
+        self.compare_hops = compare_hops
+
+        self.cache = OrderedDict()
+
+        self.scen = None
+        self.tod = None
+        self.G = None
+        self.reach_index = None
+        self.ch = None
+
+        self.reset_stats()
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # switch to the network of a scenario + TOD - returns its reachability index
+    def set_network(self, scen, tod, G):
+
+        self.scen = scen
+        self.tod = tod
+        self.G = G
+        self.reach_index = ReachabilityIndex(G)
+
+        if self.method == "ch":
+            self.ch = ContractionHierarchy(G)
+
+        return self.reach_index
+
+    # shortest path (list of nodes) from a to b on miles - None if there is no path
+    def route(self, a, b):
+
+        self.stats["requests"] += 1
+
+        key = (self.scen, self.tod, a, b)
+
+        if key in self.cache:
+            self.stats["hits"] += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.stats["pairs"] += 1
+        path = self.find_path(a, b)
+
+        self.cache_path(a, b, path)
+
+        return path
+
+    def reset_stats(self):
+
+        self.stats = {"requests": 0, "hits": 0, "pairs": 0, "searches": 0, "batched": 0,
+                      "no_path": 0, "rejected": 0,
+                      "compared": 0, "differs": 0,
+                      "weighted_miles": 0.0, "hop_miles": 0.0, "max_miles_saved": 0.0}
+
+    # adds the stats of another router (a worker process)
+    def merge_stats(self, stats):
+
+        for key in self.stats:
+            if key == "max_miles_saved":
+                self.stats[key] = max(self.stats[key], stats[key])
+            else:
+                self.stats[key] += stats[key]
+
+    # routes a batch of gaps [(a, b), ...] into the cache - later route calls are cache hits
+    # gaps are grouped by origin: one dijkstra per origin for all its destinations
+    # (the paths are the same as routing the gaps one by one)
+    def route_many(self, gaps):
+
+        origins = {}
+
+        for a, b in gaps:
+
+            key = (self.scen, self.tod, a, b)
+            if key in self.cache:
+                continue
+
+            if a not in origins:
+                origins[a] = []
+            if b not in origins[a]:
+                origins[a].append(b)
+
+        for a, targets in origins.items():
+
+            # the contraction hierarchy answers single queries
+            if self.method == "ch":
+                for b in targets:
+                    self.stats["pairs"] += 1
+                    self.cache_path(a, b, self.find_path(a, b))
+                continue
+
+            reachable = []
+            for b in targets:
+                if self.reach_index.reachable(a, b):
+                    reachable.append(b)
+                else:
+                    self.stats["pairs"] += 1
+                    self.stats["no_path"] += 1
+                    self.stats["rejected"] += 1
+                    self.cache_path(a, b, None)
+
+            if len(reachable) == 0:
+                continue
+
+            self.stats["searches"] += 1
+            if len(reachable) > 1:
+                self.stats["batched"] += len(reachable)
+
+            results = self.G.shortest_paths_from(a, reachable)
+
+            for b in reachable:
+                self.stats["pairs"] += 1
+                self.cache_path(a, b, self.check_path(a, b, results[b]))
+
+    # summary lines for the error file
+    def report(self):
+
+        stats = self.stats
+
+        requests = stats["requests"]
+        hits = stats["hits"]
+        hit_rate = hits / requests if requests > 0 else 0
+
+        lines = [f"Gap routing: {requests} gaps, {stats['pairs']} different origin-destination pairs, " +
+                 f"{hits} answered from cache ({hit_rate:.1%}), {stats['no_path']} without a path " +
+                 f"({stats['rejected']} rejected by the reachability index)",
+                 f"{stats['searches']} searches ({stats['batched']} pairs routed in searches " +
+                 f"shared by origin)"]
+
+        if stats["compared"] > 0:
+            miles_saved = stats["hop_miles"] - stats["weighted_miles"]
+            lines.append(f"Weighted vs hop count paths: {stats['differs']} of {stats['compared']} differ, " +
+                         f"{stats['weighted_miles']:.2f} vs {stats['hop_miles']:.2f} miles " +
+                         f"({miles_saved:.2f} saved, at most {stats['max_miles_saved']:.2f} on one gap)")
+
+        return lines
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that adds a path to the cache
+    def cache_path(self, a, b, path):
+
+        self.cache[(self.scen, self.tod, a, b)] = path
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+
+    # helper method that searches the current network
+    def find_path(self, a, b):
+
+        if not self.reach_index.reachable(a, b):
+            self.stats["no_path"] += 1
+            self.stats["rejected"] += 1
+            return None
+
+        self.stats["searches"] += 1
+
+        if self.method == "ch":
+            result = self.ch.shortest_path(a, b)
+        else:
+            result = self.G.shortest_paths_from(a, [b])[b]
+
+        return self.check_path(a, b, result)
+
+    # helper method that keeps the stats of a search result - returns the path or None
+    def check_path(self, a, b, result):
+
+        G = self.G
+
+        if result == None:
+            self.stats["no_path"] += 1
+            return None
+
+        miles, path = result
+
+        if self.compare_hops == True:
+
+            hop_path = G.hop_path(a, b)
+            hop_miles = G.path_weight(hop_path)
+
+            self.stats["compared"] += 1
+            self.stats["weighted_miles"] += miles
+            self.stats["hop_miles"] += hop_miles
+
+            if hop_path != path:
+                self.stats["differs"] += 1
+                self.stats["max_miles_saved"] = max(self.stats["max_miles_saved"], hop_miles - miles)
+
+        return path
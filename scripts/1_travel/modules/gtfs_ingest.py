@@ -0,0 +1,530 @@
+# gtfs_ingest.py
+# turns a GTFS feed (zip) into the bus run + itinerary tables the bus scripts read
+# (bus_<base/current> + bus_<base/current>_itin in MHN.gdb/hwynet)
+# stop_times.txt is read in chunks and handled one trip at a time, so memory depends on
+# the chunk size, the size of stops/trips/routes + the number of stop patterns,
+# not on the number of stop times
+# (stop_times has to be grouped by trip_id, like almost every feed is)
+# each stop is snapped to the nearest MHN node, consecutive stops are connected by the
+# shortest path on miles (GapRouter) and the scheduled time between stops is spread over
+# the links by miles - the links of a stop pattern are found once for all its trips
+# stop pairs without a path are kept as a single segment (an itinerary gap,
+# like the ones find_rep_itins reports)
+# author: ccai
+
+import os
+import math
+import zipfile
+from datetime import datetime
+
+from modules.lazy_imports import np, pd
+from modules.gap_router import GapRouter
+from modules.csr_graph import CSRGraph
+from modules.link_store import LinkStore
+from modules.node_index import NodeIndex
+
+# fields of the run feature class + the itinerary table ([name, type] like AddFields)
+RUN_FIELDS = [
+    ["TRANSIT_LINE", "TEXT"], ["DESCRIPTION", "TEXT"],
+    ["MODE", "TEXT"], ["VEHICLE_TYPE", "TEXT"],
+    ["HEADWAY", "FLOAT"], ["SPEED", "SHORT"],
+    ["ROUTE_ID", "TEXT"], ["START", "LONG"], ["STARTHOUR", "SHORT"]
+]
+
+ITIN_FIELDS = [
+    ["TRANSIT_LINE", "TEXT"], ["ITIN_ORDER", "SHORT"],
+    ["ITIN_A", "LONG"], ["ITIN_B", "LONG"],
+    ["ABB", "TEXT"], ["DWELL_CODE", "TEXT"],
+    ["LINE_SERV_TIME", "FLOAT"], ["TTF", "TEXT"]
+]
+
+# GTFS route types that are buses (basic + extended)
+BUS_ROUTE_TYPES = set([3] + list(range(700, 800)))
+
+# mode + vehicle type of routes that are not in the route file
+DEFAULT_MODE = "B"
+DEFAULT_VEHICLE_TYPE = "1"
+
+# stops further than this from any node are dropped (feet)
+MAX_SNAP_FEET = 1320
+
+# rows of stop_times.txt per chunk
+CHUNK_SIZE = 200000
+
+STOP_TIME_COLUMNS = ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]
+
+class GtfsIngest:
+
+    # link_store: LinkStore of the highway links, G: MaskedGraph the buses can use
+    # (no centroid connectors), node_index: NodeIndex over the nodes of G
+    # route_modes: route_id -> (MODE, VEHICLE_TYPE)
+    # project: function (lons, lats) -> (xs, ys) in the MHN spatial reference
+    def __init__(self, link_store, G, node_index, route_modes = None, project = None,
+                 chunk_size = CHUNK_SIZE, max_snap = MAX_SNAP_FEET, error_file = None):
+
+        self.link_store = link_store
+        self.G = G
+        self.node_index = node_index
+
+        self.route_modes = route_modes if route_modes != None else {}
+        self.project = project if project != None else lonlat_to_state_plane
+        self.chunk_size = chunk_size
+        self.max_snap = max_snap
+        self.error_file = error_file
+
+        self.gap_router = GapRouter()
+        self.gap_router.set_network("gtfs", 0, G)
+
+        # stop nodes -> links (see stop_pattern)
+        self.patterns = {}
+
+        self.stats = {"trips": 0, "stop_times": 0, "skipped_trips": 0, "dropped_stops": 0,
+                      "segments": 0, "gaps": 0}
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # runs of a feed, one trip at a time: (run row, itinerary rows)
+    # run row: RUN_FIELDS + vertices of the run, itinerary rows: ITIN_FIELDS
+    # service_date (YYYYMMDD) keeps the trips running that day - None keeps every trip
+    def runs(self, gtfs_zip, service_date = None):
+
+        with zipfile.ZipFile(gtfs_zip) as zf:
+
+            stop_nodes = self.snap_stops(zf)
+            trip_dict = self.read_trips(zf, service_date)
+
+            line_counts = {}
+
+            for trip_id, stop_ids, arrivals, departures in self.read_trips_stop_times(zf, trip_dict):
+
+                route_id, description = trip_dict[trip_id]
+                mode, vehicle_type = self.route_modes.get(route_id, (DEFAULT_MODE, DEFAULT_VEHICLE_TYPE))
+
+                stops = self.trip_stops(trip_id, stop_ids, arrivals, departures, stop_nodes)
+                if stops == None:
+                    self.stats["skipped_trips"] += 1
+                    continue
+
+                # transit line: lower case mode + run number (emme line names have <= 6 characters)
+                line_count = line_counts.get(mode, 0) + 1
+                line_counts[mode] = line_count
+
+                if line_count >= 100000:
+                    raise ValueError(f"More than 99999 runs of mode {mode} - emme line names would be too long")
+
+                transit_line = f"{mode.lower()}{line_count:05d}"
+
+                itin_rows, vertices, miles = self.trip_itin(transit_line, stops)
+
+                start = int(stops[0][2])
+                run_minutes = (stops[-1][1] - stops[0][2]) / 60
+
+                speed = round(miles / (run_minutes / 60)) if run_minutes > 0 else 0
+
+                run_row = [transit_line, description, mode, vehicle_type,
+                           0, speed, route_id, start, start // 3600, vertices]
+
+                self.stats["trips"] += 1
+
+                yield run_row, itin_rows
+
+    # summary lines for the error file
+    def report(self):
+
+        stats = self.stats
+
+        return [f"GTFS ingest: {stats['trips']} runs from {stats['stop_times']} stop times " +
+                f"({stats['skipped_trips']} trips skipped, {stats['dropped_stops']} stops dropped)",
+                f"{stats['segments']} itinerary segments, {stats['gaps']} stop pairs without a path"] + \
+               self.gap_router.report()
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that writes to the error file (if there is one)
+    def write_error(self, message):
+
+        if self.error_file != None:
+            self.error_file.write(message + "\n")
+
+    # helper method that snaps every stop to its nearest node - stop_id -> node or None
+    def snap_stops(self, zf):
+
+        stops_df = read_feed_table(zf, "stops.txt", ["stop_id", "stop_lat", "stop_lon"])
+        stops_df = stops_df[(stops_df.stop_lat != "") & (stops_df.stop_lon != "")]
+
+        xs, ys = self.project(stops_df.stop_lon.astype(float).to_numpy(),
+                              stops_df.stop_lat.astype(float).to_numpy())
+
+        stop_nodes = {}
+
+        for stop_id, x, y in zip(stops_df.stop_id.tolist(), np.asarray(xs).tolist(), np.asarray(ys).tolist()):
+
+            node, distance = self.node_index.nearest_with_distance(x, y)
+
+            if node == None or distance > self.max_snap:
+                self.write_error(f"WARNING: Stop {stop_id} is not within {self.max_snap} feet of a node. Dropping stop.")
+                node = None
+
+            stop_nodes[stop_id] = node
+
+        return stop_nodes
+
+    # helper method that reads the bus trips running on the service date
+    # trip_id -> (route_id, description)
+    def read_trips(self, zf, service_date):
+
+        routes_df = read_feed_table(zf, "routes.txt", ["route_id", "route_short_name",
+                                                       "route_long_name", "route_type"])
+        routes_df = routes_df[pd.to_numeric(routes_df.route_type, errors = "coerce").isin(BUS_ROUTE_TYPES)]
+
+        route_names = dict(zip(routes_df.route_id, routes_df.route_short_name.where(
+            routes_df.route_short_name != "", routes_df.route_long_name)))
+
+        trips_df = read_feed_table(zf, "trips.txt", ["route_id", "service_id", "trip_id", "trip_headsign"])
+        trips_df = trips_df[trips_df.route_id.isin(route_names)]
+
+        if service_date != None:
+            trips_df = trips_df[trips_df.service_id.isin(active_services(zf, service_date))]
+
+        descriptions = (trips_df.route_id.map(route_names) + " " + trips_df.trip_headsign).str.strip()
+
+        return dict(zip(trips_df.trip_id, zip(trips_df.route_id, descriptions)))
+
+    # helper method that streams stop_times.txt - one (trip_id, stop_ids, arrivals, departures)
+    # per trip in the trip dict, ordered by stop_sequence (times in seconds, nan if not coded)
+    def read_trips_stop_times(self, zf, trip_dict):
+
+        done = set()
+        pending = None
+
+        with zf.open("stop_times.txt") as stop_times_file:
+
+            reader = pd.read_csv(stop_times_file, usecols = STOP_TIME_COLUMNS, dtype = str,
+                                 keep_default_na = False, encoding = "utf-8-sig",
+                                 chunksize = self.chunk_size)
+
+            for chunk in reader:
+
+                self.stats["stop_times"] += len(chunk)
+
+                if pending is not None:
+                    chunk = pd.concat([pending, chunk], ignore_index = True)
+
+                # the last trip of a chunk may go on in the next one
+                trip_ids = chunk.trip_id.to_numpy()
+                starts = np.flatnonzero(np.r_[True, trip_ids[1:] != trip_ids[:-1]])
+
+                pending = chunk.iloc[starts[-1]:]
+                chunk = chunk.iloc[: starts[-1]]
+
+                yield from self.chunk_trips(chunk, starts[:-1], trip_dict, done)
+
+            if pending is not None:
+                yield from self.chunk_trips(pending, np.array([0]), trip_dict, done)
+
+    # helper method that splits a chunk into trips (starts = first row of each trip)
+    def chunk_trips(self, chunk, starts, trip_dict, done):
+
+        if len(chunk) == 0:
+            return
+
+        trip_ids = chunk.trip_id.tolist()
+        stop_ids = chunk.stop_id.tolist()
+        sequences = pd.to_numeric(chunk.stop_sequence).to_numpy()
+        arrivals = parse_gtfs_times(chunk.arrival_time)
+        departures = parse_gtfs_times(chunk.departure_time)
+
+        ends = np.r_[starts[1:], len(chunk)]
+
+        for start, end in zip(starts.tolist(), ends.tolist()):
+
+            trip_id = trip_ids[start]
+
+            if trip_id in done:
+                raise ValueError(f"stop_times.txt is not grouped by trip_id (trip {trip_id}) - sort it first")
+            done.add(trip_id)
+
+            if trip_id not in trip_dict:
+                continue
+
+            order = np.argsort(sequences[start: end], kind = "stable") + start
+
+            yield (trip_id, [stop_ids[i] for i in order.tolist()],
+                   arrivals[order], departures[order])
+
+    # helper method that turns the stop times of a trip into stops on nodes:
+    # [(node, arrival, departure), ...] - None if the trip can't be used
+    # times that are not coded are interpolated by stop order, consecutive stops on the same
+    # node are merged
+    def trip_stops(self, trip_id, stop_ids, arrivals, departures, stop_nodes):
+
+        arrivals = np.where(np.isnan(arrivals), departures, arrivals)
+        departures = np.where(np.isnan(departures), arrivals, departures)
+
+        timed = np.flatnonzero(~np.isnan(arrivals))
+        if len(timed) < 2:
+            self.write_error(f"WARNING: Trip {trip_id} has less than two timed stops. Skipping trip.")
+            return None
+
+        positions = np.arange(len(stop_ids))
+        arrivals = np.interp(positions, timed, arrivals[timed])
+        departures = np.interp(positions, timed, departures[timed])
+
+        stops = []
+
+        for stop_id, arrival, departure in zip(stop_ids, arrivals.tolist(), departures.tolist()):
+
+            node = stop_nodes.get(stop_id)
+
+            if node == None:
+                self.stats["dropped_stops"] += 1
+                continue
+
+            if len(stops) > 0 and stops[-1][0] == node:
+                stops[-1] = (node, stops[-1][1], departure)
+            else:
+                stops.append((node, arrival, departure))
+
+        if len(stops) < 2:
+            self.write_error(f"WARNING: Trip {trip_id} has less than two stops on the network. Skipping trip.")
+            return None
+
+        return stops
+
+    # helper method that builds the itinerary of a run between its stops
+    # returns (itinerary rows, vertices of the run, miles)
+    def trip_itin(self, transit_line, stops):
+
+        anodes, bnodes, abbs, dwcs, pairs, shares, vertices, miles, gaps = self.stop_pattern([stop[0] for stop in stops])
+
+        # scheduled minutes between consecutive stops, spread over the links of each pair
+        arrivals = np.array([stop[1] for stop in stops[1:]])
+        departures = np.array([stop[2] for stop in stops[:-1]])
+        pair_minutes = np.maximum(arrivals - departures, 0) / 60
+
+        lsts = np.round(pair_minutes[pairs] * shares, 2).tolist()
+
+        itin_rows = [[transit_line, order, a, b, abb, dwc, lst, "1"] for order, a, b, abb, dwc, lst
+                     in zip(range(1, len(anodes) + 1), anodes, bnodes, abbs, dwcs, lsts)]
+
+        self.stats["segments"] += len(itin_rows)
+        self.stats["gaps"] += gaps
+
+        return itin_rows, vertices, miles
+
+    # helper method that finds the links between a sequence of stop nodes - trips of a route
+    # mostly repeat a few stop patterns, so they are cached
+    # returns (anodes, bnodes, abbs, dwell codes, stop pair of each link, share of the pair
+    # time of each link, vertices, miles, stop pairs without a path)
+    def stop_pattern(self, nodes):
+
+        key = tuple(nodes)
+        if key in self.patterns:
+            return self.patterns[key]
+
+        link_store = self.link_store
+
+        anodes = []
+        bnodes = []
+        abbs = []
+        dwcs = []
+        pairs = []
+        shares = []
+        vertices = []
+        total_miles = 0
+        gaps = 0
+
+        for pair, (a, b) in enumerate(zip(nodes[:-1], nodes[1:])):
+
+            path = self.gap_router.route(a, b)
+
+            if path == None:
+                gaps += 1
+                path = [a, b]
+
+            links = list(zip(path[:-1], path[1:]))
+            miles = [link_store.link_miles(i, j) if (i, j) in link_store else 0 for i, j in links]
+            path_miles = sum(miles)
+
+            for k, (i, j) in enumerate(links):
+
+                anodes.append(i)
+                bnodes.append(j)
+                pairs.append(pair)
+
+                # time spread by miles (evenly if the links have no miles)
+                shares.append(miles[k] / path_miles if path_miles > 0 else 1 / len(links))
+
+                # stop at the end of the last link only
+                dwcs.append("0" if k == len(links) - 1 else "1")
+
+                if (i, j) not in link_store:
+                    abbs.append(None)
+                    continue
+
+                abbs.append(link_store.abb(i, j))
+                link_vertices = link_store.link_vertices(i, j)
+
+                # one-way record used in the other direction
+                if link_store.anodes[link_store.index[(i << 32) | j]] != i:
+                    link_vertices = link_vertices[::-1]
+
+                link_vertices = link_vertices.tolist()
+
+                # links share their end vertex
+                if len(vertices) > 0 and len(link_vertices) > 0 and vertices[-1] == link_vertices[0]:
+                    link_vertices = link_vertices[1:]
+
+                vertices += link_vertices
+
+            total_miles += path_miles
+
+        pattern = (anodes, bnodes, abbs, dwcs, np.array(pairs, dtype = np.int64),
+                   np.array(shares, dtype = np.float64),
+                   np.array(vertices, dtype = np.float64).reshape(-1, 2), total_miles, gaps)
+
+        self.patterns[key] = pattern
+
+        return pattern
+
+# MAIN FUNCTIONS ------------------------------------------------------------------------------
+
+# function that reads what the ingest needs from MHN.gdb/hwynet:
+# (link store, network without centroid connectors, index of its nodes)
+def read_bus_network(hwynet, storage):
+
+    attr_df, vertices, offsets = storage.read_geometry(os.path.join(hwynet, "hwynet_arc"),
+                                                       ["ANODE", "BNODE", "ABB", "MILES", "TYPE1"])
+
+    link_store = LinkStore(attr_df.ANODE.to_numpy(), attr_df.BNODE.to_numpy(), attr_df.ABB.to_list(),
+                           attr_df.MILES.to_numpy(), vertices, offsets, storage.make_polyline)
+
+    # every direction the link store can look up
+    keys = link_store.key_index.to_numpy()
+    records = link_store.key_records
+    no_centroids = attr_df.TYPE1.astype(str).to_numpy()[records] != "6"
+
+    G = CSRGraph(keys >> 32, keys & 0xFFFFFFFF, link_store.miles[records]).tod_graph(no_centroids)
+
+    node_df = storage.read_table(os.path.join(hwynet, "hwynet_node"), ["NODE", "SHAPE@X", "SHAPE@Y"])
+    node_df = node_df[node_df.NODE.isin(G.nodes())]
+
+    node_index = NodeIndex(node_df.NODE.tolist(), node_df["SHAPE@X"].to_numpy(), node_df["SHAPE@Y"].to_numpy())
+
+    return link_store, G, node_index
+
+# function that writes the runs of a feed to bus_<which_gtfs> + bus_<which_gtfs>_itin in a
+# workspace - rows are written in batches of batch_size runs
+def write_gtfs_tables(ingest, gtfs_zip, storage, workspace, which_gtfs, service_date = None,
+                      batch_size = 2000):
+
+    run_fc = storage.create_feature_class(workspace, f"bus_{which_gtfs}", "POLYLINE", RUN_FIELDS)
+    itin_table = storage.create_feature_class(workspace, f"bus_{which_gtfs}_itin", None, ITIN_FIELDS)
+
+    run_fields = [field for field, field_type in RUN_FIELDS] + ["SHAPE@"]
+    itin_fields = [field for field, field_type in ITIN_FIELDS]
+
+    run_rows = []
+    itin_rows = []
+
+    for run_row, run_itin_rows in ingest.runs(gtfs_zip, service_date):
+
+        run_rows.append(run_row)
+        itin_rows += run_itin_rows
+
+        if len(run_rows) >= batch_size:
+            storage.write_rows(run_fc, run_fields, run_rows)
+            storage.write_rows(itin_table, itin_fields, itin_rows)
+            run_rows = []
+            itin_rows = []
+
+    storage.write_rows(run_fc, run_fields, run_rows)
+    storage.write_rows(itin_table, itin_fields, itin_rows)
+
+    return run_fc, itin_table
+
+# HELPER FUNCTIONS ----------------------------------------------------------------------------
+
+# helper function that reads a (small) feed table as text - missing columns are empty
+def read_feed_table(zf, name, columns):
+
+    with zf.open(name) as feed_file:
+        feed_df = pd.read_csv(feed_file, dtype = str, keep_default_na = False, encoding = "utf-8-sig")
+
+    for column in columns:
+        if column not in feed_df.columns:
+            feed_df[column] = ""
+
+    return feed_df[columns]
+
+# helper function that turns GTFS times (H:MM:SS, may be past 24:00:00) into seconds
+# (nan if not coded)
+def parse_gtfs_times(times):
+
+    parts = times.str.split(":", expand = True).reindex(columns = [0, 1, 2])
+    parts = parts.apply(pd.to_numeric, errors = "coerce")
+
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(dtype = np.float64)
+
+# helper function that finds the services running on a date (YYYYMMDD)
+# from calendar.txt + the exceptions in calendar_dates.txt
+def active_services(zf, service_date):
+
+    names = zf.namelist()
+    weekday = datetime.strptime(service_date, "%Y%m%d").strftime("%A").lower()
+
+    services = set()
+
+    if "calendar.txt" in names:
+
+        calendar_df = read_feed_table(zf, "calendar.txt", ["service_id", weekday, "start_date", "end_date"])
+        running = ((calendar_df[weekday] == "1") & (calendar_df.start_date <= service_date) &
+                   (calendar_df.end_date >= service_date))
+
+        services = set(calendar_df.service_id[running])
+
+    if "calendar_dates.txt" in names:
+
+        dates_df = read_feed_table(zf, "calendar_dates.txt", ["service_id", "date", "exception_type"])
+        dates_df = dates_df[dates_df.date == service_date]
+
+        services |= set(dates_df.service_id[dates_df.exception_type == "1"])
+        services -= set(dates_df.service_id[dates_df.exception_type == "2"])
+
+    return services
+
+# function that projects WGS84 lon/lat onto NAD27 Illinois East (EPSG 26771, US feet)
+# transverse mercator on the Clarke 1866 ellipsoid - the datum shift between WGS84 +
+# NAD27 (a few meters in the region) is left out, it is far below the snapping distance
+def lonlat_to_state_plane(lons, lats):
+
+    a = 6378206.4
+    e2 = 0.006768657997291094
+    ep2 = e2 / (1 - e2)
+    k0 = 0.999975
+    lat0 = math.radians(36 + 40 / 60)
+    lon0 = math.radians(-(88 + 20 / 60))
+    false_easting = 500000
+    us_foot = 1200 / 3937
+
+    def meridian_arc(phi):
+        return a * ((1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * phi
+                    - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * np.sin(2 * phi)
+                    + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * phi)
+                    - (35 * e2 ** 3 / 3072) * np.sin(6 * phi))
+
+    phi = np.radians(np.asarray(lats, dtype = np.float64))
+    lam = np.radians(np.asarray(lons, dtype = np.float64))
+
+    n = a / np.sqrt(1 - e2 * np.sin(phi) ** 2)
+    t = np.tan(phi) ** 2
+    c = ep2 * np.cos(phi) ** 2
+    big_a = (lam - lon0) * np.cos(phi)
+
+    x = k0 * n * (big_a + (1 - t + c) * big_a ** 3 / 6
+                  + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * big_a ** 5 / 120)
+    y = k0 * (meridian_arc(phi) - meridian_arc(lat0) + n * np.tan(phi) *
+              (big_a ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * big_a ** 4 / 24
+               + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * big_a ** 6 / 720))
+
+    return x / us_foot + false_easting, y / us_foot
@@ -0,0 +1,56 @@
+# headways.py
+# headway rules for the scenario bus runs:
+# - collapsed runs get the average time between the runs of their group
+#   (maxtime of the TOD if the group has a single run)
+# - future runs: coded headway * hdwy_mult of the TOD, or the lowest headway of the
+#   runs they replace, whichever is lower - if neither is coded, the mode average of the
+#   runs that are kept (at least LAST_CHANCE_HEADWAY) - capped at maxtime
+# everything works on group-bys, so the number of replacements doesn't matter
+# author: ccai
+
+from modules.lazy_imports import pd
+
+# headway (minutes) if nothing else is known
+LAST_CHANCE_HEADWAY = 90
+
+# function that finds the average headway of each bus group (minutes, rounded to 0.1)
+# runs_df needs BUS_GROUP + ADJ_START (seconds) - groups with one run get maxtime
+def collapsed_run_headways(runs_df, maxtime):
+
+    runs_df = runs_df.sort_values(["BUS_GROUP", "ADJ_START"])
+    gaps = runs_df.groupby("BUS_GROUP")["ADJ_START"].diff() / 60
+
+    headways = gaps.groupby(runs_df["BUS_GROUP"]).mean().round(1)
+
+    return headways.fillna(maxtime)
+
+# function that finds the average headway of each mode over runs that are kept
+def mode_headways(runs_df, headway_field = "AVG_HEADWAY"):
+    return runs_df.groupby("MODE")[headway_field].mean()
+
+# function that finds the lowest headway of each replaced route (MODERTE)
+def replaced_route_headways(runs_df, headway_field = "AVG_HEADWAY"):
+    return runs_df.groupby("MODERTE")[headway_field].min()
+
+# function that finds the final headway of future runs
+# future_df needs TRANSIT_LINE, MODE + HEADWAY (coded, 0 = not coded)
+# replace_dict: transit line -> list of replaced routes (MODERTE)
+# returns a series in the order of future_df
+def future_headways(future_df, replace_dict, mode_hdwys, replaced_hdwys, maxtime, hdwy_mult):
+
+    coded = future_df["HEADWAY"].fillna(0) * hdwy_mult
+
+    # lowest headway of all routes a line replaces (0 = none of them run)
+    replaced_routes = pd.Series(replace_dict, dtype = object).explode()
+    line_replaced = replaced_routes.map(replaced_hdwys).groupby(level = 0).min()
+
+    replaced = future_df["TRANSIT_LINE"].map(line_replaced).fillna(0)
+
+    # modes without any kept runs fall back to the last chance headway
+    fallback = future_df["MODE"].map(mode_hdwys).fillna(0).clip(lower = LAST_CHANCE_HEADWAY)
+
+    final = coded.where(coded != 0, replaced)
+    final = final.where((coded == 0) | (replaced == 0), pd.concat([coded, replaced], axis = 1).min(axis = 1))
+    final = final.where(final != 0, fallback)
+
+    return final.clip(upper = maxtime)
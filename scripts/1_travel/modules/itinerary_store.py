@@ -0,0 +1,272 @@
+# itinerary_store.py
+# columnar store for bus itineraries - one array per field for all lines
+# + an offset array, so line i has the segments offsets[i]:offsets[i + 1]
+# (instead of {line: [record dict, ...]} with a dict per segment)
+# segments are kept in order - ITIN_ORDER is not stored, it is position + 1
+# author: ccai
+
+from modules.lazy_imports import np, pd
+from modules.storage import get_storage
+
+ITIN_COLUMNS = ["ITIN_A", "ITIN_B", "ABB", "DWELL_CODE", "LINE_SERV_TIME", "TTF", "NOTES"]
+
+# everything else is kept as python objects (text + None)
+COLUMN_DTYPES = {"ITIN_A": "int64", "ITIN_B": "int64", "LINE_SERV_TIME": "float64"}
+
+# helper function that makes a column array
+def make_column(column, values):
+
+    dtype = COLUMN_DTYPES.get(column, "object")
+
+    if dtype == "object":
+        # pandas turns missing text into nan - keep None like the cursors
+        array = np.empty(len(values), dtype = object)
+        array[:] = [None if (isinstance(value, float) and value != value) else value for value in values]
+        return array
+
+    return np.asarray(values, dtype = dtype)
+
+# itinerary of a single line
+# columns from ItineraryStore.get are views into the store - copy before changing them
+class Itinerary:
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    # itinerary from lists of values per column
+    @classmethod
+    def from_lists(cls, lists):
+        return cls({column: make_column(column, values) for column, values in lists.items()})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def copy(self):
+        return Itinerary({column: array.copy() for column, array in self.columns.items()})
+
+    # segments start:end (views)
+    def slice(self, start, end):
+        return Itinerary({column: array[start: end] for column, array in self.columns.items()})
+
+    # new itinerary with segments start:end replaced by another itinerary
+    def splice(self, start, end, other):
+        return self.splice_many([(start, end, other)])
+
+    # new itinerary with several segment ranges replaced - [(start, end, other), ...]
+    # sorted by start + not overlapping, the columns are copied once
+    def splice_many(self, splices):
+
+        columns = {}
+
+        for column, array in self.columns.items():
+
+            parts = []
+            prev_end = 0
+
+            for start, end, other in splices:
+                parts += [array[prev_end: start], other.columns[column]]
+                prev_end = end
+
+            parts.append(array[prev_end:])
+            columns[column] = np.concatenate(parts)
+
+        return Itinerary(columns)
+
+    # first position of each value in a column (like list.index, for all values at once)
+    def first_positions(self, column):
+
+        positions = {}
+
+        for i, value in enumerate(self.columns[column].tolist()):
+            if value not in positions:
+                positions[value] = i
+
+        return positions
+
+    # places reroutes (future lines) into this itinerary - [(name, reroute itin), ...]
+    # a reroute replaces the segments from the first one starting at its first node to the
+    # first one ending at its last node - positions are all taken from this itinerary, so
+    # splices don't shift each other, + a reroute overlapping one placed before is left out
+    # returns (splices sorted by start for splice_many, names of the overlapping reroutes)
+    def place_reroutes(self, reroutes):
+
+        a_positions = self.first_positions("ITIN_A")
+        b_positions = self.first_positions("ITIN_B")
+
+        splices = []
+        overlapping = []
+
+        for name, reroute_itin in reroutes:
+
+            start_index = a_positions.get(reroute_itin["ITIN_A"][0])
+            end_index = b_positions.get(reroute_itin["ITIN_B"][-1])
+
+            if start_index == None or end_index == None or start_index > end_index:
+                continue
+
+            if any(start_index < other_end and other_start < end_index + 1
+                   for other_start, other_end, other_itin in splices):
+                overlapping.append(name)
+                continue
+
+            splices.append((start_index, end_index + 1, reroute_itin))
+
+        return sorted(splices, key = lambda splice: splice[0]), overlapping
+
+    # segments as tuples of the given columns (python values, for cursors + file writers)
+    def rows(self, columns):
+        return zip(*[self.columns[column].tolist() for column in columns])
+
+class ItineraryStore:
+
+    def __init__(self, lines, offsets, columns):
+
+        self.lines = list(lines)
+        self.offsets = np.asarray(offsets, dtype = np.int64)
+        self.columns = columns
+
+        self.line_index = {line: i for i, line in enumerate(self.lines)}
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # store from an itinerary df (TRANSIT_LINE, ITIN_ORDER + columns)
+    @classmethod
+    def from_df(cls, itin_df, columns = ITIN_COLUMNS):
+
+        itin_df = itin_df.sort_values(["TRANSIT_LINE", "ITIN_ORDER"], kind = "mergesort")
+        tr_lines = itin_df["TRANSIT_LINE"].to_numpy()
+
+        if len(tr_lines) == 0:
+            return cls([], [0], {column: make_column(column, []) for column in columns})
+
+        # rows of a line are consecutive
+        starts = np.flatnonzero(np.r_[True, tr_lines[1:] != tr_lines[:-1]])
+        offsets = np.r_[starts, len(tr_lines)]
+
+        store_columns = {column: make_column(column, itin_df[column].to_numpy()) for column in columns}
+
+        return cls(tr_lines[starts].tolist(), offsets, store_columns)
+
+    # store from an itinerary table / feature class
+    @classmethod
+    def read(cls, table, columns = ITIN_COLUMNS, where_clause = None, storage = None):
+
+        if storage == None:
+            storage = get_storage()
+
+        fields = ["TRANSIT_LINE", "ITIN_ORDER"] + list(columns)
+        itin_df = storage.read_table(table, fields, where_clause)
+
+        return cls.from_df(itin_df, columns)
+
+    # store from (line, Itinerary) pairs
+    @classmethod
+    def from_itineraries(cls, line_itins, columns = ITIN_COLUMNS):
+
+        lines = []
+        lengths = [0]
+        parts = {column: [] for column in columns}
+
+        for line, itin in line_itins:
+
+            lines.append(line)
+            lengths.append(len(itin))
+
+            for column in columns:
+                parts[column].append(itin[column])
+
+        store_columns = {}
+        for column in columns:
+            if len(parts[column]) > 0:
+                store_columns[column] = np.concatenate(parts[column])
+            else:
+                store_columns[column] = make_column(column, [])
+
+        return cls(lines, np.cumsum(lengths), store_columns)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, line):
+        return line in self.line_index
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    @property
+    def num_segments(self):
+        return int(self.offsets[-1])
+
+    # itinerary of a line (views into the store)
+    def get(self, line):
+
+        i = self.line_index[line]
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+
+        return Itinerary({column: array[start: end] for column, array in self.columns.items()})
+
+    # back to a df (TRANSIT_LINE, ITIN_ORDER + columns)
+    def to_df(self):
+
+        lengths = np.diff(self.offsets)
+        line_starts = np.repeat(self.offsets[:-1], lengths)
+
+        data = {"TRANSIT_LINE": np.repeat(np.array(self.lines, dtype = object), lengths),
+                "ITIN_ORDER": np.arange(self.num_segments) - line_starts + 1}
+        data.update(self.columns)
+
+        return pd.DataFrame(data)
+
+    # plain arrays (text columns as strings + a null mask, no python objects)
+    def to_arrays(self):
+
+        arrays = {"lines": np.array(self.lines, dtype = str), "offsets": self.offsets}
+
+        for column, array in self.columns.items():
+
+            if array.dtype == object:
+                is_null = np.array([value == None for value in array], dtype = bool)
+                arrays[f"null_{column}"] = is_null
+                arrays[f"text_{column}"] = np.array(["" if value == None else str(value) for value in array],
+                                                    dtype = str)
+            else:
+                arrays[f"data_{column}"] = array
+
+        return arrays
+
+    # store from to_arrays (numeric columns stay views of the arrays)
+    @classmethod
+    def from_arrays(cls, arrays):
+
+        columns = {}
+
+        for key in arrays:
+
+            if key.startswith("data_"):
+                columns[key[5:]] = arrays[key]
+
+            elif key.startswith("text_"):
+                column = key[5:]
+                array = arrays[key].astype(object)
+                array[arrays[f"null_{column}"]] = None
+                columns[column] = array
+
+        lines = arrays["lines"].tolist()
+        offsets = arrays["offsets"]
+
+        return cls(lines, offsets, columns)
+
+    # persist as a .npz (no pickling)
+    def save(self, path):
+
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+
+        with np.load(path, allow_pickle = False) as npz:
+            return cls.from_arrays({key: npz[key] for key in npz.files})
@@ -0,0 +1,147 @@
+# itinerary_writer.py
+# writes itinerary feature classes in one bulk insert from an ItineraryStore
+# (columnar itinerary arrays) + the vertex arrays of the link store
+# the geometry of a link is made + encoded once per write from its slice of the shared vertex
+# array (storage.encode_polyline) and every segment on that link inserts the same geometry
+# (instead of a polyline per segment, encoded again on every insert)
+# segments without a link record (false links + itinerary gaps) are written without geometry
+# optionally a merged route polyline per line for QA maps - the link vertices of the line
+# in itinerary order, reversed for links used against their record direction,
+# with the vertex where two links meet only once
+# author: ccai
+
+from modules.lazy_imports import np
+from modules.itinerary_store import ITIN_COLUMNS
+
+ITIN_FIELDS = ["SHAPE@", "TRANSIT_LINE", "ITIN_ORDER",
+               "ITIN_A", "ITIN_B", "ABB",
+               "DWELL_CODE", "LINE_SERV_TIME", "TTF", "NOTES"]
+
+ROUTE_FIELDS = [["TRANSIT_LINE", "TEXT"], ["NUM_SEGMENTS", "LONG"], ["NUM_MISSING", "LONG"]]
+
+class ItineraryWriter:
+
+    # link_store: LinkStore (vertices + offsets per record)
+    # storage: backend the feature classes are written with (see modules/storage.py)
+    def __init__(self, link_store, storage):
+
+        self.link_store = link_store
+        self.storage = storage
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # writes every segment of the store into itin_fc (ITIN_FIELDS) in one insert
+    # records = link record of each segment (-1 for none) - looked up from ITIN_A, ITIN_B if None
+    # returns the records
+    def write(self, itin_fc, itin_store, records = None):
+
+        if records is None:
+            records = self.find_records(itin_store)
+
+        lengths = np.diff(itin_store.offsets)
+
+        tr_lines = np.repeat(np.array(itin_store.lines, dtype = object), lengths).tolist()
+        itin_orders = (np.arange(itin_store.num_segments) - np.repeat(itin_store.offsets[:-1], lengths) + 1).tolist()
+        columns = [itin_store.columns[column].tolist() for column in ITIN_COLUMNS]
+
+        self.storage.write_rows(itin_fc, ITIN_FIELDS, zip(self.link_geometries(records), tr_lines, itin_orders, *columns))
+
+        return records
+
+    # writes a merged route polyline per line into a new feature class (ROUTE_FIELDS)
+    # lines with less than two vertices are left out - returns the feature class
+    def write_routes(self, workspace, name, itin_store, records = None):
+
+        if records is None:
+            records = self.find_records(itin_store)
+
+        route_fc = self.storage.create_feature_class(workspace, name, "POLYLINE", ROUTE_FIELDS)
+
+        vertices, vertex_offsets = self.route_vertices(itin_store, records)
+
+        num_missing = np.r_[0, np.cumsum(records == -1)][itin_store.offsets]
+        num_missing = np.diff(num_missing).tolist()
+        num_segments = np.diff(itin_store.offsets).tolist()
+
+        def route_rows():
+            for i, line in enumerate(itin_store.lines):
+
+                start = vertex_offsets[i]
+                end = vertex_offsets[i + 1]
+
+                if end - start >= 2:
+                    yield [self.storage.encode_polyline(vertices[start: end]), line, num_segments[i], num_missing[i]]
+
+        self.storage.write_rows(route_fc, ["SHAPE@"] + [field[0] for field in ROUTE_FIELDS], route_rows())
+
+        return route_fc
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that finds the link record of each segment
+    def find_records(self, itin_store):
+        return self.link_store.find_records(itin_store.columns["ITIN_A"], itin_store.columns["ITIN_B"])
+
+    # helper method that encodes the geometry of every link used once - yields the geometry of each
+    # segment (the same object for segments on the same link, None without a record)
+    # link store stats count the segments + the polylines made like record_geometry does
+    def link_geometries(self, records):
+
+        link_store = self.link_store
+
+        used, inverse = np.unique(records, return_inverse = True)
+
+        geoms = []
+        for record in used.tolist():
+            if record == -1:
+                geoms.append(None)
+            else:
+                geoms.append(self.storage.encode_polyline(link_store.vertices[link_store.offsets[record]: link_store.offsets[record + 1]]))
+
+        num_linked = int((records != -1).sum())
+        num_made = int((used != -1).sum())
+
+        link_store.stats["requests"] += num_linked
+        link_store.stats["hits"] += num_linked - num_made
+
+        return (geoms[i] for i in inverse.tolist())
+
+    # helper method that gathers the route vertices of every line from the link vertex array
+    # returns (vertices (n, 2), offsets (lines + 1))
+    def route_vertices(self, itin_store, records):
+
+        link_store = self.link_store
+
+        has_link = records != -1
+        safe_records = np.where(has_link, records, 0)
+
+        starts = link_store.offsets[safe_records]
+        ends = np.where(has_link, link_store.offsets[safe_records + 1], starts)
+
+        # links looked up against their record direction (one-way records of undirected links)
+        reverse = has_link & (link_store.anodes[safe_records] != itin_store.columns["ITIN_A"])
+
+        # first + last vertex of each segment in travel order
+        first = link_store.vertices[np.where(reverse, ends - 1, starts)]
+        last = link_store.vertices[np.where(reverse, starts, np.maximum(ends - 1, starts))]
+
+        # skip the first vertex where it continues the previous segment of the same line
+        same_line = np.ones(len(records), dtype = bool)
+        same_line[itin_store.offsets[:-1][np.diff(itin_store.offsets) > 0]] = False
+
+        skip = np.zeros(len(records), dtype = bool)
+        skip[1:] = (same_line[1:] & has_link[1:] & has_link[:-1] &
+                    np.all(first[1:] == last[:-1], axis = 1))
+
+        counts = ends - starts - skip
+
+        # position within each segment (in travel order, after the skipped vertex)
+        total = int(counts.sum())
+        seg_offsets = np.r_[0, np.cumsum(counts)]
+        positions = np.arange(total) - np.repeat(seg_offsets[:-1], counts) + np.repeat(skip, counts)
+
+        index = np.where(np.repeat(reverse, counts),
+                         np.repeat(ends - 1, counts) - positions,
+                         np.repeat(starts, counts) + positions)
+
+        return link_store.vertices[index], seg_offsets[itin_store.offsets]
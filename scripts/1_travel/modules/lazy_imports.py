@@ -0,0 +1,48 @@
+# lazy_imports.py
+# heavy modules which are only imported the first time one of their attributes is used
+# (so --help, argument errors and pure-python stages don't pay for arcpy startup)
+# author: ccai
+
+import importlib
+import sys
+
+class LazyModule:
+
+    def __init__(self, module_name):
+
+        self.__dict__["_module_name"] = module_name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+
+        module = self.__dict__["_module"]
+
+        if module == None:
+            module = importlib.import_module(self.__dict__["_module_name"])
+            self.__dict__["_module"] = module
+
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+
+        module_name = self.__dict__["_module_name"]
+
+        if self.__dict__["_module"] == None:
+            return f"<lazy module '{module_name}' (not loaded)>"
+
+        return repr(self.__dict__["_module"])
+
+# helper function that checks whether a lazy module has actually been imported
+def is_loaded(module_name):
+    return module_name in sys.modules
+
+arcpy = LazyModule("arcpy")
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+nx = LazyModule("networkx")
@@ -0,0 +1,150 @@
+# link_store.py
+# highway links (ABB, miles, geometry) by (anode, bnode)
+# geometry is kept as one flat vertex array with offsets (see StorageBackend.read_geometry) -
+# a backend polyline is only made when a link is asked for its geometry,
+# with an LRU cache since the same links are inserted for many bus lines
+# links without a record in the other direction can be looked up both ways
+# (same ABB, miles + geometry, like the link dict this replaces)
+# author: ccai
+
+from collections import OrderedDict
+
+from modules.lazy_imports import np, pd
+
+class LinkStore:
+
+    # anodes, bnodes, abbs, miles per record, vertices (n, 2) + offsets (records + 1)
+    # make_polyline turns a vertex array into a backend geometry (storage.make_polyline)
+    def __init__(self, anodes, bnodes, abbs, miles, vertices, offsets, make_polyline,
+                 cache_size = 20000):
+
+        self.abbs = np.asarray(abbs, dtype = str)
+        self.miles = np.asarray(miles, dtype = np.float64)
+        self.vertices = np.asarray(vertices, dtype = np.float64)
+        self.offsets = np.asarray(offsets, dtype = np.int64)
+
+        self.make_polyline = make_polyline
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+        self.stats = {"requests": 0, "hits": 0}
+
+        self.anodes = np.asarray(anodes, dtype = np.int64)
+        self.bnodes = np.asarray(bnodes, dtype = np.int64)
+
+        anodes = self.anodes
+        bnodes = self.bnodes
+
+        # packed (anode, bnode) -> record
+        keys = (anodes << 32) | bnodes
+        rev_keys = (bnodes << 32) | anodes
+
+        self.index = dict(zip(keys.tolist(), range(len(keys))))
+
+        # one-way records of undirected links - the other direction uses the same record
+        one_way = np.flatnonzero(~np.isin(rev_keys, keys))
+        self.index.update(zip(rev_keys[one_way].tolist(), one_way.tolist()))
+
+        # hashed index of the keys for whole-array lookups
+        self.key_index = pd.Index(np.fromiter(self.index.keys(), dtype = np.int64, count = len(self.index)))
+        self.key_records = np.fromiter(self.index.values(), dtype = np.int64, count = len(self.index))
+
+    # store from a highway link feature class
+    @classmethod
+    def read(cls, table, storage, cache_size = 20000):
+
+        attr_df, vertices, offsets = storage.read_geometry(table, ["ANODE", "BNODE", "ABB", "MILES"])
+
+        return cls(attr_df.ANODE.to_numpy(), attr_df.BNODE.to_numpy(), attr_df.ABB.to_list(),
+                   attr_df.MILES.to_numpy(), vertices, offsets, storage.make_polyline, cache_size)
+
+    # plain arrays of the records (to share with worker processes)
+    def to_arrays(self):
+
+        return {"anodes": self.anodes, "bnodes": self.bnodes, "abbs": self.abbs,
+                "miles": self.miles, "vertices": self.vertices, "offsets": self.offsets}
+
+    # store from to_arrays (the arrays are used as they are, not copied)
+    @classmethod
+    def from_arrays(cls, arrays, make_polyline, cache_size = 20000):
+
+        return cls(arrays["anodes"], arrays["bnodes"], arrays["abbs"], arrays["miles"],
+                   arrays["vertices"], arrays["offsets"], make_polyline, cache_size)
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # (anode, bnode) in link_store
+    def __contains__(self, link):
+        return (link[0] << 32) | link[1] in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def abb(self, anode, bnode):
+        return str(self.abbs[self.index[(anode << 32) | bnode]])
+
+    def link_miles(self, anode, bnode):
+        return float(self.miles[self.index[(anode << 32) | bnode]])
+
+    # vertices of a link (view into the vertex array)
+    def link_vertices(self, anode, bnode):
+
+        i = self.index[(anode << 32) | bnode]
+
+        return self.vertices[self.offsets[i]: self.offsets[i + 1]]
+
+    # record of each (anode, bnode) pair - arrays, -1 where there is no link
+    def find_records(self, anodes, bnodes):
+
+        keys = (np.asarray(anodes, dtype = np.int64) << 32) | np.asarray(bnodes, dtype = np.int64)
+        positions = self.key_index.get_indexer(keys)
+
+        return np.where(positions >= 0, self.key_records[positions], -1)
+
+    # backend geometry of a link
+    # cache = False for one-off writes (whole network) that should not push out the bus links
+    def geometry(self, anode, bnode, cache = True):
+        return self.record_geometry(self.index[(anode << 32) | bnode], cache)
+
+    # backend geometry of a record (None for -1)
+    def record_geometry(self, i, cache = True):
+
+        if i == -1:
+            return None
+
+        if cache == False:
+            return self.make_polyline(self.vertices[self.offsets[i]: self.offsets[i + 1]])
+
+        self.stats["requests"] += 1
+
+        if i in self.cache:
+            self.stats["hits"] += 1
+            self.cache.move_to_end(i)
+            return self.cache[i]
+
+        geom = self.make_polyline(self.vertices[self.offsets[i]: self.offsets[i + 1]])
+
+        self.cache[i] = geom
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+
+        return geom
+
+    # adds the stats of another store (a worker process)
+    def merge_stats(self, stats):
+
+        for key in self.stats:
+            self.stats[key] += stats[key]
+
+    def reset_stats(self):
+        self.stats = {key: 0 for key in self.stats}
+
+    # summary lines for the error file
+    def report(self):
+
+        requests = self.stats["requests"]
+        hits = self.stats["hits"]
+        hit_rate = hits / requests if requests > 0 else 0
+
+        return [f"Link geometry: {len(self.offsets) - 1} links, {requests} geometries inserted, " +
+                f"{requests - hits} polylines made ({hit_rate:.1%} from cache)"]
@@ -0,0 +1,114 @@
+# manifest.py
+# input-hash manifest so that exporters only rebuild outputs whose inputs changed
+# author: ccai
+
+import os
+import json
+import hashlib
+
+from modules.storage import get_storage
+
+MANIFEST_VERSION = 1
+
+# hash of a feature class / table (attributes + optionally geometry)
+# rows are hashed individually and the row hashes are sorted,
+# so the result does not depend on cursor order
+def hash_table(table, where_clause = None, geometry = True, storage = None):
+
+    if storage == None:
+        storage = get_storage()
+
+    fields = sorted(storage.field_names(table))
+
+    if geometry == True:
+        fields += ["SHAPE@WKB"]
+
+    row_hashes = []
+
+    for row in storage.read_rows(table, fields, where_clause):
+
+        row_hash = hashlib.sha1()
+
+        for value in row:
+            if isinstance(value, (bytes, bytearray)):
+                row_hash.update(bytes(value))
+            else:
+                row_hash.update(repr(value).encode("utf-8"))
+            row_hash.update(b"\x1f")
+
+        row_hashes.append(row_hash.digest())
+
+    row_hashes.sort()
+
+    table_hash = hashlib.sha1()
+    table_hash.update(",".join(fields).encode("utf-8"))
+
+    for row_hash in row_hashes:
+        table_hash.update(row_hash)
+
+    return table_hash.hexdigest()
+
+# hash of any json-serializable configuration
+def hash_config(config):
+
+    config_string = json.dumps(config, sort_keys = True, default = str)
+
+    return hashlib.sha1(config_string.encode("utf-8")).hexdigest()
+
+# hash of a file on disk (used for the exporter source code)
+def hash_file(file_path):
+
+    file_hash = hashlib.sha1()
+
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+# read manifest - returns an empty manifest if missing or unreadable
+def read_manifest(manifest_path):
+
+    empty_manifest = {"version": MANIFEST_VERSION, "outputs": {}}
+
+    if not os.path.exists(manifest_path):
+        return empty_manifest
+
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (ValueError, OSError):
+        return empty_manifest
+
+    if manifest.get("version") != MANIFEST_VERSION or "outputs" not in manifest:
+        return empty_manifest
+
+    return manifest
+
+# write manifest (written to a temp file first so a crash never leaves half a manifest)
+def write_manifest(manifest_path, manifest):
+
+    temp_path = manifest_path + ".tmp"
+
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent = 2, sort_keys = True)
+
+    os.replace(temp_path, manifest_path)
+
+# compare the recorded inputs of an output against the current inputs
+# returns a list of reasons the output is stale (empty list = up to date)
+def find_changed_inputs(recorded_inputs, current_inputs):
+
+    if recorded_inputs == None:
+        return ["no previous run recorded"]
+
+    reasons = []
+
+    for key in sorted(current_inputs):
+
+        if key not in recorded_inputs:
+            reasons.append(f"{key} not recorded")
+        elif recorded_inputs[key] != current_inputs[key]:
+            reasons.append(f"{key} changed")
+
+    return reasons
@@ -0,0 +1,163 @@
+# node_index.py
+# KD-tree over the highway node coordinates for nearest node queries
+# nodes that are not allowed (not in the TOD network, wrong zone, ...) are skipped
+# through a filter, so one tree built from all nodes serves every scenario + TOD
+# ties in distance go to the lowest node id
+# ZoneNodeIndex keeps one tree per zone for lookups that have to stay in the same zone
+# author: ccai
+
+from modules.lazy_imports import np
+
+LEAF_SIZE = 16
+
+class NodeIndex:
+
+    def __init__(self, node_ids, xs, ys):
+
+        self.node_ids = list(node_ids)
+        self.xs = np.asarray(xs, dtype = np.float64)
+        self.ys = np.asarray(ys, dtype = np.float64)
+
+        self.coords = np.column_stack([self.xs, self.ys])
+        self.position = {node: i for i, node in enumerate(self.node_ids)}
+
+        # tree nodes: [axis, split, left, right] for splits, [None, indices] for leaves
+        self.tree = []
+        if len(self.node_ids) > 0:
+            self.build(np.arange(len(self.node_ids)))
+
+        self.xs_list = self.xs.tolist()
+        self.ys_list = self.ys.tolist()
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # nearest node to x, y that passes accept (a function node -> bool) - None if no node passes
+    def nearest(self, x, y, accept = None):
+
+        return self.nearest_with_distance(x, y, accept)[0]
+
+    # same as nearest - (node, distance) or (None, None)
+    def nearest_with_distance(self, x, y, accept = None):
+
+        if len(self.tree) == 0:
+            return None, None
+
+        xs = self.xs_list
+        ys = self.ys_list
+        node_ids = self.node_ids
+
+        best_d2 = float("inf")
+        best_node = None
+
+        # (distance to the region squared, tree node)
+        stack = [(0.0, 0)]
+
+        while len(stack) > 0:
+
+            region_d2, tree_node = stack.pop()
+
+            if region_d2 > best_d2:
+                continue
+
+            entry = self.tree[tree_node]
+
+            # leaf
+            if entry[0] == None:
+
+                for i in entry[1]:
+
+                    d2 = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+
+                    if d2 > best_d2:
+                        continue
+
+                    node = node_ids[i]
+
+                    if d2 == best_d2 and node > best_node:
+                        continue
+
+                    if accept != None and not accept(node):
+                        continue
+
+                    best_d2 = d2
+                    best_node = node
+
+                continue
+
+            axis, split, left, right = entry
+            diff = (x if axis == 0 else y) - split
+
+            near, far = (left, right) if diff < 0 else (right, left)
+
+            # far side first on the stack, so the near side is searched first
+            stack.append((diff * diff, far))
+            stack.append((region_d2, near))
+
+        if best_node == None:
+            return None, None
+
+        return best_node, best_d2 ** 0.5
+
+    # nearest node to another node
+    def nearest_to_node(self, node, accept = None):
+
+        i = self.position[node]
+
+        return self.nearest(self.xs_list[i], self.ys_list[i], accept)
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that builds the tree (split on the wider axis at the median)
+    def build(self, root_indices):
+
+        self.tree.append(None)
+        stack = [(0, root_indices)]
+
+        while len(stack) > 0:
+
+            tree_node, indices = stack.pop()
+
+            if len(indices) <= LEAF_SIZE:
+                self.tree[tree_node] = [None, indices.tolist()]
+                continue
+
+            points = self.coords[indices]
+            spread = points.max(axis = 0) - points.min(axis = 0)
+            axis = 0 if spread[0] >= spread[1] else 1
+
+            middle = len(indices) // 2
+            order = np.argpartition(points[:, axis], middle)
+
+            split = points[order[middle], axis]
+            left_indices = indices[order[: middle]]
+            right_indices = indices[order[middle:]]
+
+            left = len(self.tree)
+            right = left + 1
+            self.tree += [None, None]
+
+            self.tree[tree_node] = [axis, split, left, right]
+
+            stack.append((left, left_indices))
+            stack.append((right, right_indices))
+
+class ZoneNodeIndex:
+
+    def __init__(self, node_ids, xs, ys, zones):
+
+        zone_nodes = {}
+        for node, x, y, zone in zip(node_ids, xs, ys, zones):
+            zone_nodes.setdefault(zone, ([], [], []))
+            zone_nodes[zone][0].append(node)
+            zone_nodes[zone][1].append(x)
+            zone_nodes[zone][2].append(y)
+
+        self.indexes = {zone: NodeIndex(*value) for zone, value in zone_nodes.items()}
+
+    # nearest node to x, y in a zone - (node, distance) or (None, None)
+    def nearest_with_distance(self, x, y, zone):
+
+        if zone not in self.indexes:
+            return None, None
+
+        return self.indexes[zone].nearest_with_distance(x, y)
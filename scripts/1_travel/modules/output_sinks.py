@@ -0,0 +1,299 @@
+# output_sinks.py
+# output sinks for the emme file exporters
+# a sink is created per scenario and hands out writable text files by name -
+# either as plain files in a folder, compressed files in a folder,
+# or as members of a single archive per scenario
+# archive members are not streamed into the archive: each one is spooled (memory, then a
+# temp file) and copied in when it is closed - tar headers need the member size up front
+# and a zip takes one member at a time, but the exporters write l1 + l2 side by side
+# author: ccai
+
+import io
+import os
+import gzip
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+
+OUTPUT_MODES = ["plain", "gzip", "zstd", "tar", "zip"]
+
+# write buffer for each output file (fewer, larger writes on network shares)
+BUFFER_SIZE = 1 << 20
+
+# archive members are kept in memory up to this size before spilling to a temp file
+SPOOL_SIZE = 1 << 24
+
+# plain files in a folder
+class DirectorySink:
+
+    suffix = ""
+
+    def __init__(self, folder_path):
+
+        self.folder_path = folder_path
+        self.output_path = folder_path
+        os.makedirs(folder_path, exist_ok = True)
+
+    def open(self, file_name):
+        return open(os.path.join(self.folder_path, file_name), "w", buffering = BUFFER_SIZE)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# gzip-compressed files in a folder
+class GzipSink(DirectorySink):
+
+    suffix = ".gz"
+
+    def open(self, file_name):
+
+        file_path = os.path.join(self.folder_path, file_name + self.suffix)
+        raw_file = open(file_path, "wb", buffering = BUFFER_SIZE)
+        gz_file = gzip.GzipFile(filename = file_name, mode = "wb", fileobj = raw_file, compresslevel = 6)
+
+        return _OwningTextWrapper(gz_file, [raw_file])
+
+# zstd-compressed files in a folder (needs the zstandard package)
+class ZstdSink(DirectorySink):
+
+    suffix = ".zst"
+
+    def __init__(self, folder_path):
+
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("The zstd output mode needs the zstandard package (pip install zstandard).")
+
+        self.compressor = zstandard.ZstdCompressor(level = 3)
+        super().__init__(folder_path)
+
+    def open(self, file_name):
+
+        file_path = os.path.join(self.folder_path, file_name + self.suffix)
+        raw_file = open(file_path, "wb", buffering = BUFFER_SIZE)
+        zst_file = self.compressor.stream_writer(raw_file)
+
+        return _OwningTextWrapper(zst_file, [raw_file])
+
+# base class for one archive per scenario
+# members are spooled (memory up to SPOOL_SIZE, then a temp file) and copied into the
+# archive when closed, so several members can be written at the same time
+# subclasses implement add_member + close
+class _ArchiveSink(ABC):
+
+    suffix = ""
+
+    def __init__(self, folder_path):
+
+        self.folder_path = folder_path
+        self.output_path = folder_path + self.suffix
+        self.folder_name = os.path.basename(folder_path)
+
+    def open(self, file_name):
+        return _ArchiveMember(self, file_name)
+
+    # copy a closed member (size bytes of fileobj) into the archive
+    @abstractmethod
+    def add_member(self, file_name, fileobj, size):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# single tar archive per scenario
+class TarSink(_ArchiveSink):
+
+    suffix = ".tar"
+
+    def __init__(self, folder_path):
+
+        super().__init__(folder_path)
+        self.archive = tarfile.open(self.output_path, "w")
+
+    def add_member(self, file_name, fileobj, size):
+
+        info = tarfile.TarInfo(name = f"{self.folder_name}/{file_name}")
+        info.size = size
+        info.mtime = int(time.time())
+
+        self.archive.addfile(info, fileobj)
+
+    def close(self):
+        self.archive.close()
+
+# single (deflated) zip archive per scenario
+class ZipSink(_ArchiveSink):
+
+    suffix = ".zip"
+
+    def __init__(self, folder_path):
+
+        super().__init__(folder_path)
+        self.archive = zipfile.ZipFile(self.output_path, "w", compression = zipfile.ZIP_DEFLATED)
+
+    def add_member(self, file_name, fileobj, size):
+
+        with self.archive.open(f"{self.folder_name}/{file_name}", "w", force_zip64 = True) as member:
+            shutil.copyfileobj(fileobj, member, BUFFER_SIZE)
+
+    def close(self):
+        self.archive.close()
+
+# text wrapper that also closes the raw files underneath the compressor
+class _OwningTextWrapper(io.TextIOWrapper):
+
+    def __init__(self, binary_file, owned_files):
+
+        super().__init__(binary_file, encoding = "utf-8", newline = "")
+        self.owned_files = owned_files
+
+    def close(self):
+
+        if self.closed:
+            return
+
+        super().close()
+
+        for owned_file in self.owned_files:
+            owned_file.close()
+
+# writable text file spooled until close, then copied into its archive
+class _ArchiveMember(io.TextIOWrapper):
+
+    def __init__(self, sink, file_name):
+
+        self.sink = sink
+        self.file_name = file_name
+        self.spool = tempfile.SpooledTemporaryFile(max_size = SPOOL_SIZE)
+
+        super().__init__(self.spool, encoding = "utf-8", newline = "")
+
+    def close(self):
+
+        if self.closed:
+            return
+
+        self.flush()
+        size = self.spool.tell()
+        self.spool.seek(0)
+        self.sink.add_member(self.file_name, self.spool, size)
+
+        super().close()
+
+SINK_CLASSES = {
+    "plain": DirectorySink,
+    "gzip": GzipSink,
+    "zstd": ZstdSink,
+    "tar": TarSink,
+    "zip": ZipSink
+}
+
+# function that makes the sink for one scenario folder
+def make_sink(output_mode, folder_path):
+
+    if output_mode not in SINK_CLASSES:
+        raise ValueError(f"Unknown output mode {output_mode}. Choose from {', '.join(OUTPUT_MODES)}.")
+
+    return SINK_CLASSES[output_mode](folder_path)
+
+# function that checks whether the output of a scenario folder exists in the given mode
+def sink_output_exists(output_mode, folder_path):
+
+    if output_mode in ["tar", "zip"]:
+        return os.path.isfile(folder_path + SINK_CLASSES[output_mode].suffix)
+
+    return os.path.isdir(folder_path)
+
+# function that removes the output of a scenario folder in every mode
+def remove_sink_output(folder_path):
+
+    if os.path.isdir(folder_path):
+        shutil.rmtree(folder_path)
+
+    for archive_suffix in [TarSink.suffix, ZipSink.suffix]:
+        if os.path.isfile(folder_path + archive_suffix):
+            os.remove(folder_path + archive_suffix)
+
+# BENCHMARK -----------------------------------------------------------------------------------
+
+# function that measures throughput of each sink with emme-like files
+# (num_files files of lines_per_file link records each, like one scenario's TOD files)
+# every file is read back the way compare_emme_files.py reads it (see modules/emme_files.py) -
+# files that don't come back as written are counted as mismatches
+def benchmark_sinks(out_folder, num_files = 36, lines_per_file = 50000, modes = None):
+
+    from modules.emme_files import open_text
+
+    if modes == None:
+        modes = OUTPUT_MODES
+
+    line = "a  12345  12346 0.25 ASHThmlb  1 2  1\n"
+    total_mb = len(line) * lines_per_file * num_files / 1e6
+
+    results = {}
+
+    for output_mode in modes:
+
+        folder_path = os.path.join(out_folder, f"bench_{output_mode}")
+        remove_sink_output(folder_path)
+
+        try:
+            start_time = time.perf_counter()
+
+            with make_sink(output_mode, folder_path) as sink:
+                for i in range(num_files):
+                    out_file = sink.open(f"file_{i}.l1")
+                    for j in range(lines_per_file):
+                        out_file.write(line)
+                    out_file.close()
+
+            elapsed = time.perf_counter() - start_time
+
+        except ImportError as e:
+            print(f"{output_mode}: skipped ({e})")
+            continue
+
+        output_path = folder_path + SINK_CLASSES[output_mode].suffix
+
+        mismatches = 0
+        for i in range(num_files):
+
+            if output_mode in ["tar", "zip"]:
+                source = (output_path, f"{os.path.basename(folder_path)}/file_{i}.l1")
+            else:
+                source = os.path.join(folder_path, f"file_{i}.l1" + SINK_CLASSES[output_mode].suffix)
+
+            with open_text(source) as in_file:
+                if in_file.read() != line * lines_per_file:
+                    mismatches += 1
+
+        if os.path.isdir(folder_path):
+            output_bytes = sum(os.path.getsize(os.path.join(folder_path, f)) for f in os.listdir(folder_path))
+        else:
+            output_bytes = os.path.getsize(output_path)
+
+        results[output_mode] = {"seconds": elapsed,
+                                "mb_per_s": total_mb / elapsed,
+                                "output_mb": output_bytes / 1e6,
+                                "mismatches": mismatches}
+
+        remove_sink_output(folder_path)
+
+    return results
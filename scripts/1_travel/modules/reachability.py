@@ -0,0 +1,119 @@
+# reachability.py
+# reachability index of a directed highway network:
+# the strongly connected components (SCCs) + their condensation DAG,
+# with the components reachable from each component kept as a bitset (python int)
+# so "can a reach b" is a component lookup and a bit test instead of a search
+# the bitsets take O(C^2) bits for C components - above max_bitset_comps components
+# the condensation DAG is searched instead (still much smaller than the network)
+# author: ccai
+
+# 20000 components -> at most 50 MB of bitsets
+MAX_BITSET_COMPS = 20000
+
+class ReachabilityIndex:
+
+    # G is a TOD network (MaskedGraph - see modules/csr_graph.py)
+    def __init__(self, G, max_bitset_comps = MAX_BITSET_COMPS):
+
+        self.num_nodes = G.number_of_nodes()
+
+        labels, num_comps = G.strongly_connected_components()
+
+        # node -> component
+        self.component = {node: labels[i] for node, i in G.node_index.items()}
+
+        self.sizes = [0] * num_comps
+        for i in G.active_indices:
+            self.sizes[labels[i]] += 1
+
+        comp_edges = G.component_edges(labels)
+        self.num_dag_edges = len(comp_edges)
+
+        comp_succs = [[] for comp in range(num_comps)]
+        for comp, succ in comp_edges:
+            comp_succs[comp].append(succ)
+
+        self.comp_succs = comp_succs
+        self.max_bitset_comps = max_bitset_comps
+        self.reach = None
+
+        if num_comps > max_bitset_comps:
+            return
+
+        # components reachable from each component (including itself)
+        # components are numbered in reverse topological order, so successors come first
+        reach = [0] * num_comps
+        for comp in range(num_comps):
+
+            comp_reach = 1 << comp
+            for succ in comp_succs[comp]:
+                comp_reach |= reach[succ]
+
+            reach[comp] = comp_reach
+
+        self.reach = reach
+
+    # MAIN METHODS --------------------------------------------------------------------------------
+
+    # whether there is a path from a to b (False if either node is not in the network)
+    def reachable(self, a, b):
+
+        comp_a = self.component.get(a)
+        comp_b = self.component.get(b)
+
+        if comp_a == None or comp_b == None:
+            return False
+
+        if comp_a == comp_b:
+            return True
+
+        if self.reach == None:
+            return self.search(comp_a, comp_b)
+
+        return (self.reach[comp_a] >> comp_b) & 1 == 1
+
+    # summary lines for the error file
+    def report(self):
+
+        num_comps = len(self.sizes)
+
+        if num_comps == 0:
+            return ["Network is empty."]
+
+        largest = max(self.sizes)
+        singletons = sum(1 for size in self.sizes if size == 1)
+        others = num_comps - singletons - 1 if largest > 1 else num_comps - singletons
+
+        return [f"{self.num_nodes} nodes in {num_comps} strongly connected components " +
+                f"(largest {largest} nodes = {largest / self.num_nodes:.1%}, " +
+                f"{singletons} single nodes, {others} other components), " +
+                f"{self.num_dag_edges} edges between components, " +
+                ("reachability bitsets" if self.reach != None else
+                 f"more than {self.max_bitset_comps} components - reachability by search")]
+
+    # HELPER METHODS ------------------------------------------------------------------------------
+
+    # helper method that searches the condensation DAG for comp_b from comp_a
+    # successors have lower numbers, so components numbered below comp_b are not followed
+    def search(self, comp_a, comp_b):
+
+        if comp_b > comp_a:
+            return False
+
+        visited = {comp_a}
+        stack = [comp_a]
+
+        while len(stack) > 0:
+
+            comp = stack.pop()
+
+            for succ in self.comp_succs[comp]:
+
+                if succ == comp_b:
+                    return True
+
+                if succ > comp_b and succ not in visited:
+                    visited.add(succ)
+                    stack.append(succ)
+
+        return False
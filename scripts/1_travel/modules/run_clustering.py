@@ -0,0 +1,169 @@
+# run_clustering.py
+# groups similar bus runs of a route (MODERTE) so they can be collapsed
+# a run joins the group of a base run if it contains at least threshold of the
+# base run's segments - candidates are found through an inverted segment index
+# (prefix filtering: a run sharing none of the base run's n - k + 1 rarest segments
+# cannot share k of them), then their common segments are counted exactly
+# the groups are the same as comparing every remaining run against the base run
+# segments are packed into int64s: ITIN_A (30 bits) | ITIN_B (30 bits) | dwell code (3 bits)
+# author: ccai
+
+import math
+
+from modules.lazy_imports import np, pd
+
+NODE_BITS = 30
+DWELL_BITS = 3
+
+# function that packs itinerary segments into int64s
+# dwell codes are text, so they are numbered by first appearance - codes are only
+# compared within one feed, so the numbering only has to be consistent within a call
+def pack_segments(itin_a, itin_b, dw_code):
+
+    itin_a = np.asarray(itin_a, dtype = np.int64)
+    itin_b = np.asarray(itin_b, dtype = np.int64)
+
+    dw_nums, dw_codes = pd.factorize(pd.Series(dw_code, dtype = object), use_na_sentinel = False)
+
+    if len(dw_codes) > (1 << DWELL_BITS):
+        raise ValueError(f"Too many distinct dwell codes to pack: {list(dw_codes)}")
+
+    for nodes in [itin_a, itin_b]:
+        if len(nodes) > 0 and (nodes.min() < 0 or nodes.max() >= (1 << NODE_BITS)):
+            raise ValueError(f"Node ids must be between 0 and {(1 << NODE_BITS) - 1} to be packed.")
+
+    return ((itin_a << (NODE_BITS + DWELL_BITS)) | (itin_b << DWELL_BITS) |
+            dw_nums.astype(np.int64))
+
+# function that packs the segments of an itinerary store (see modules/itinerary_store.py)
+# returns transit line -> sorted array of unique segments and transit line -> number of segments
+def pack_itineraries(itin_store):
+
+    segs = pack_segments(itin_store.columns["ITIN_A"], itin_store.columns["ITIN_B"],
+                         itin_store.columns["DWELL_CODE"])
+    offsets = itin_store.offsets.tolist()
+
+    seg_dict = {}
+    num_seg_dict = {}
+
+    for i, tr_line in enumerate(itin_store.lines):
+        start = offsets[i]
+        end = offsets[i + 1]
+        seg_dict[tr_line] = np.unique(segs[start: end])
+        num_seg_dict[tr_line] = end - start
+
+    return seg_dict, num_seg_dict
+
+# helper function that finds the smallest number of common segments k with k / n >= threshold
+# (uses the same float comparison as the verification step)
+def min_common(n, threshold):
+
+    k = max(math.ceil(threshold * n), 0)
+
+    while k > 0 and (k - 1) / n >= threshold:
+        k -= 1
+    while k <= n and k / n < threshold:
+        k += 1
+
+    return k
+
+# helper function that gathers the slices starts[i]:starts[i] + lengths[i] of an array
+def gather_slices(array, starts, lengths):
+
+    offsets = np.cumsum(lengths) - lengths
+    index = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+    return array[index]
+
+# function that clusters runs - identical to comparing every remaining run against the base run
+# lines_dict: moderte -> list of runs (processed in list order)
+# seg_arrays: run -> sorted array of unique segments (see pack_itineraries)
+# returns run -> group number (numbered from start_group + 1 in the order groups are made)
+def cluster_runs(lines_dict, seg_arrays, threshold, start_group = 0):
+
+    group = start_group
+    groups = {}
+
+    for moderte in lines_dict:
+
+        runs = list(lines_dict[moderte])
+
+        if len(runs) == 0:
+            continue
+
+        # segments of the route numbered 0.. - seg_ids holds the runs' segments back to back
+        run_arrays = [seg_arrays[run] for run in runs]
+        run_lengths = np.array([len(segs) for segs in run_arrays], dtype = np.int64)
+        run_starts = np.cumsum(run_lengths) - run_lengths
+
+        seg_ids, seg_counts = np.unique(np.concatenate(run_arrays), return_inverse = True,
+                                        return_counts = True)[1:]
+        seg_runs = np.repeat(np.arange(len(runs)), run_lengths)
+
+        # inverted index: runs of each segment (postings back to back, by segment number)
+        order = np.argsort(seg_ids, kind = "stable")
+        posting_runs = seg_runs[order]
+        posting_starts = np.cumsum(seg_counts) - seg_counts
+
+        # segments of every run from rarest to most common (prefixes are the first ones)
+        rare_ids = seg_ids[np.lexsort((seg_counts[seg_ids], seg_runs))]
+
+        grouped = np.zeros(len(runs), dtype = bool)
+        in_base = np.zeros(len(seg_counts), dtype = bool)
+        is_candidate = np.zeros(len(runs), dtype = bool)
+
+        for base in range(len(runs)):
+
+            if grouped[base] == True:
+                continue
+
+            group += 1
+            grouped[base] = True
+            groups[runs[base]] = group
+
+            base_num = int(run_lengths[base])
+
+            if base_num == 0:
+                continue
+
+            k = min_common(base_num, threshold)
+
+            if k > base_num:
+                continue
+
+            if k == 0:
+                # every run qualifies
+                joined = np.flatnonzero(~grouped)
+                grouped[joined] = True
+
+                for comp in joined.tolist():
+                    groups[runs[comp]] = group
+                continue
+
+            base_start = int(run_starts[base])
+            prefix = rare_ids[base_start: base_start + base_num - k + 1]
+
+            is_candidate[gather_slices(posting_runs, posting_starts[prefix], seg_counts[prefix])] = True
+            is_candidate[grouped] = False
+            candidates = np.flatnonzero(is_candidate)
+            is_candidate[candidates] = False
+
+            if len(candidates) == 0:
+                continue
+
+            # count common segments of all candidates at once (each has at least one segment)
+            base_ids = seg_ids[base_start: base_start + base_num]
+            in_base[base_ids] = True
+            cand_lengths = run_lengths[candidates]
+            is_common = in_base[gather_slices(seg_ids, run_starts[candidates], cand_lengths)]
+            in_base[base_ids] = False
+
+            common_nums = np.add.reduceat(is_common, np.cumsum(cand_lengths) - cand_lengths, dtype = np.int64)
+
+            joined = candidates[common_nums / base_num >= threshold]
+            grouped[joined] = True
+
+            for comp in joined.tolist():
+                groups[runs[comp]] = group
+
+    return groups
@@ -0,0 +1,118 @@
+# shared_arrays.py
+# numpy arrays in one shared memory block, so worker processes can use big read-only
+# inputs (node coordinates, link vertices, collapsed runs + itineraries) without pickling them
+# the parent makes a SharedArrays + passes its spec (block name + array layout) to the
+# workers, which attach to the block and get views of the arrays
+# only plain dtypes can be shared - object arrays (python text) have to be converted first
+# author: ccai
+
+from multiprocessing import shared_memory
+
+from modules.lazy_imports import np, pd
+
+# arrays start on 64 byte boundaries
+ALIGNMENT = 64
+
+class SharedArrays:
+
+    # arrays: {name: array}
+    def __init__(self, arrays):
+
+        layout = {}
+        size = 0
+
+        for name, array in arrays.items():
+
+            array = np.asarray(array)
+            if array.dtype == object:
+                raise ValueError(f"Array {name} has dtype object and cannot be shared")
+
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        self.shm = shared_memory.SharedMemory(create = True, size = max(size, 1))
+
+        for name, array in arrays.items():
+            dtype, shape, offset = layout[name]
+            view = np.ndarray(shape, dtype = dtype, buffer = self.shm.buf, offset = offset)
+            view[...] = array
+
+        self.spec = (self.shm.name, layout)
+
+    # frees the block (after the workers are done)
+    def close(self):
+
+        self.shm.close()
+        self.shm.unlink()
+
+# function that attaches to a shared block from its spec
+# returns (block, {name: array view}) - keep the block around as long as the views are used
+def attach_arrays(spec):
+
+    name, layout = spec
+
+    # the parent owns the block - workers should not unlink it on exit
+    try:
+        shm = shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name = name)
+
+    arrays = {}
+    for array_name, (dtype, shape, offset) in layout.items():
+        arrays[array_name] = np.ndarray(shape, dtype = dtype, buffer = shm.buf, offset = offset)
+
+    return shm, arrays
+
+# helper function that adds a prefix to array names (several stores in one block)
+def prefix_arrays(prefix, arrays):
+    return {f"{prefix}/{name}": array for name, array in arrays.items()}
+
+# helper function that takes the arrays with a prefix back out
+def unprefix_arrays(prefix, arrays):
+
+    start = len(prefix) + 1
+
+    return {name[start:]: array for name, array in arrays.items() if name.startswith(f"{prefix}/")}
+
+# function that makes shareable arrays from a feature class read with read_geometry
+# (attribute df, vertices, offsets - see modules/storage.py): numeric columns are kept as they
+# are, other columns (text) as unicode arrays + a null mask
+def table_to_arrays(attr_df, vertices, offsets):
+
+    arrays = {"fields": np.array(list(attr_df.columns), dtype = str),
+              "vertices": vertices, "offsets": offsets}
+
+    for field in attr_df.columns:
+
+        column = attr_df[field]
+
+        if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            arrays[f"data_{field}"] = column.to_numpy()
+        else:
+            values = column.to_numpy(dtype = object)
+            is_null = pd.isna(column).to_numpy()
+            arrays[f"null_{field}"] = is_null
+            arrays[f"text_{field}"] = np.array(["" if null else str(value) for value, null in zip(values, is_null)],
+                                               dtype = str)
+
+    return arrays
+
+# function that makes the table back into a df like read_table (SHAPE@ first, geometry
+# from make_polyline - all parts of a geometry are one part, as in read_geometry)
+def table_from_arrays(arrays, make_polyline):
+
+    vertices = arrays["vertices"]
+    offsets = arrays["offsets"].tolist()
+
+    columns = {"SHAPE@": [make_polyline(vertices[offsets[i]: offsets[i + 1]]) for i in range(len(offsets) - 1)]}
+
+    for field in arrays["fields"].tolist():
+
+        if f"data_{field}" in arrays:
+            columns[field] = arrays[f"data_{field}"].copy()
+        else:
+            values = arrays[f"text_{field}"].astype(object)
+            values[arrays[f"null_{field}"]] = None
+            columns[field] = values.tolist()
+
+    return pd.DataFrame(columns)
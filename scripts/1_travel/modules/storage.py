@@ -0,0 +1,670 @@
+# storage.py
+# storage backends for table + feature class access
+# ArcpyStorage works against file geodatabases through arcpy,
+# GeoPackageStorage is pure python (sqlite) so stages can run on machines without arcpy
+# gpkg runs 2_generate_hwy_files.py, 4_generate_transit_files.py + import_gtfs.py -
+# the highway network (1_export_future_hwys.py, import_hwyproj_coding.py) + 3_create_bus_layers.py
+# still call arcpy geoprocessing (feature datasets, layers, field calculations) directly
+# and stop early on another backend (require_arcpy)
+# author: ccai
+
+import os
+import sqlite3
+import struct
+from abc import ABC, abstractmethod
+
+from modules.lazy_imports import arcpy, np, pd
+
+SPATIAL_REFERENCE = 26771
+
+# arcpy field type (as used in AddFields) -> sqlite type
+SQLITE_TYPES = {
+    "TEXT": "TEXT",
+    "LONG": "INTEGER",
+    "SHORT": "INTEGER",
+    "FLOAT": "REAL",
+    "DOUBLE": "REAL",
+    "DATE": "DATETIME"
+}
+
+# geometry type -> geopackage geometry type name
+GPKG_GEOMETRY_TYPES = {
+    "POINT": "POINT",
+    "POLYLINE": "LINESTRING"
+}
+
+# fields which are never treated as attributes
+EXCLUDE_FIELDS = ["OBJECTID", "OID", "fid", "Shape", "SHAPE", "geom", "Shape_Length", "Shape_Area"]
+
+# base class - every backend implements the abstract methods
+class StorageBackend(ABC):
+
+    name = None
+
+    # workspace relative table names are resolved against (like arcpy.env.workspace)
+    workspace = None
+
+    # attribute field names of a table (no object id / geometry)
+    @abstractmethod
+    def field_names(self, table):
+        pass
+
+    # rows of a table as tuples
+    # geometry tokens: SHAPE@ (backend geometry), SHAPE@X, SHAPE@Y, SHAPE@WKB
+    @abstractmethod
+    def read_rows(self, table, fields, where_clause = None):
+        pass
+
+    # table as a dataframe
+    def read_table(self, table, fields, where_clause = None):
+        return pd.DataFrame(data = list(self.read_rows(table, fields, where_clause)), columns = fields)
+
+    # attributes + geometry as arrays:
+    # (attribute df, vertex array of shape (n, 2), offsets array of length rows + 1)
+    # all parts of a geometry are concatenated
+    @abstractmethod
+    def read_geometry(self, table, fields, where_clause = None):
+        pass
+
+    # bulk insert - SHAPE@ takes a backend geometry or a list of (x, y) vertices / an (x, y) point
+    @abstractmethod
+    def write_rows(self, table, fields, rows):
+        pass
+
+    # new workspace (file gdb / geopackage) in a folder - returns its path
+    @abstractmethod
+    def create_workspace(self, folder, name):
+        pass
+
+    # new feature class (geometry_type POINT / POLYLINE) or table (geometry_type None)
+    # fields are given like arcpy AddFields: [[name, type], ...]
+    @abstractmethod
+    def create_feature_class(self, workspace, name, geometry_type, fields = None,
+                             spatial_reference = SPATIAL_REFERENCE):
+        pass
+
+    # copy a table/feature class (optionally only the rows matching the where clause)
+    @abstractmethod
+    def copy(self, in_table, out_table, where_clause = None):
+        pass
+
+    @abstractmethod
+    def exists(self, path):
+        pass
+
+    @abstractmethod
+    def delete(self, path):
+        pass
+
+    # backend geometry from vertices / a point
+    @abstractmethod
+    def make_polyline(self, vertices):
+        pass
+
+    @abstractmethod
+    def make_point(self, x, y):
+        pass
+
+    # polyline from vertices that write_rows can insert many times
+    # (backends that encode geometry on insert encode it once here)
+    def encode_polyline(self, vertices):
+        return self.make_polyline(vertices)
+
+# ARCPY ---------------------------------------------------------------------------------------
+
+class ArcpyStorage(StorageBackend):
+
+    name = "arcpy"
+
+    @property
+    def workspace(self):
+        return arcpy.env.workspace
+
+    @workspace.setter
+    def workspace(self, path):
+        arcpy.env.workspace = path
+
+    def field_names(self, table):
+        return [f.name for f in arcpy.ListFields(table)
+                if (f.type not in ["Geometry", "OID"] and f.name not in EXCLUDE_FIELDS)]
+
+    def read_rows(self, table, fields, where_clause = None):
+
+        with arcpy.da.SearchCursor(table, fields, where_clause) as scursor:
+            for row in scursor:
+                yield row
+
+    def read_geometry(self, table, fields, where_clause = None):
+
+        # one record per vertex
+        vertex_array = arcpy.da.FeatureClassToNumPyArray(
+            table, ["OID@", "SHAPE@XY"] + fields, where_clause, explode_to_points = True)
+
+        oids = vertex_array["OID@"]
+        vertices = np.asarray(vertex_array["SHAPE@XY"], dtype = np.float64).reshape(-1, 2)
+
+        # vertices of a feature are consecutive
+        starts = np.flatnonzero(np.r_[True, oids[1:] != oids[:-1]])
+        offsets = np.r_[starts, len(oids)].astype(np.int64)
+
+        attr_df = pd.DataFrame({field: vertex_array[field][starts] for field in fields})
+
+        return attr_df, vertices, offsets
+
+    def write_rows(self, table, fields, rows):
+
+        geom_index = fields.index("SHAPE@") if "SHAPE@" in fields else None
+        geometry_type = None
+
+        if geom_index != None:
+            geometry_type = arcpy.Describe(table).shapeType
+
+        with arcpy.da.InsertCursor(table, fields) as icursor:
+            for row in rows:
+
+                if geom_index != None and isinstance(row[geom_index], (list, tuple, np.ndarray)):
+
+                    row = list(row)
+                    if geometry_type == "Point":
+                        row[geom_index] = self.make_point(*row[geom_index])
+                    else:
+                        row[geom_index] = self.make_polyline(row[geom_index])
+
+                icursor.insertRow(row)
+
+    def create_workspace(self, folder, name):
+
+        if not name.endswith(".gdb"):
+            name += ".gdb"
+
+        arcpy.management.CreateFileGDB(folder, name)
+
+        return os.path.join(folder, name)
+
+    def create_feature_class(self, workspace, name, geometry_type, fields = None,
+                             spatial_reference = SPATIAL_REFERENCE):
+
+        if geometry_type == None:
+            arcpy.management.CreateTable(workspace, name)
+        else:
+            arcpy.management.CreateFeatureclass(workspace, name, geometry_type,
+                                                spatial_reference = spatial_reference)
+
+        out_fc = os.path.join(workspace, name)
+
+        if fields != None and len(fields) > 0:
+            arcpy.management.AddFields(out_fc, fields)
+
+        return out_fc
+
+    def copy(self, in_table, out_table, where_clause = None):
+
+        if where_clause == None:
+            arcpy.management.Copy(in_table, out_table)
+            return
+
+        layer_name = f"copy_layer_{os.path.basename(out_table)}"
+        arcpy.management.MakeFeatureLayer(in_table, layer_name, where_clause)
+        arcpy.management.CopyFeatures(layer_name, out_table)
+        arcpy.management.Delete(layer_name)
+
+    def exists(self, path):
+        return arcpy.Exists(path)
+
+    def delete(self, path):
+        arcpy.management.Delete(path)
+
+    def make_polyline(self, vertices):
+        return arcpy.Polyline(arcpy.Array([arcpy.Point(x, y) for x, y in vertices]),
+                              spatial_reference = SPATIAL_REFERENCE)
+
+    def make_point(self, x, y):
+        return arcpy.PointGeometry(arcpy.Point(x, y), spatial_reference = SPATIAL_REFERENCE)
+
+# GEOPACKAGE ----------------------------------------------------------------------------------
+
+# gdb style paths are mapped onto geopackages:
+# <folder>/MHN.gdb/hwynet/hwynet_arc -> table hwynet_arc in <folder>/MHN.gpkg
+# (feature datasets are dropped - table names have to be unique within a gdb)
+class GeoPackageStorage(StorageBackend):
+
+    name = "gpkg"
+
+    def __init__(self):
+
+        self.workspace = None
+        self.connections = {}
+
+    # helper method that splits a path into (gpkg path, table name)
+    def split_path(self, path):
+
+        parts = path.replace("\\", "/").split("/")
+
+        for i in range(len(parts) - 1, -1, -1):
+
+            if parts[i].endswith(".gdb") or parts[i].endswith(".gpkg"):
+
+                db_path = "/".join(parts[: i + 1])
+                db_path = os.path.splitext(db_path)[0] + ".gpkg"
+                table = parts[-1] if i < len(parts) - 1 else None
+
+                return os.path.normpath(db_path), table
+
+        # relative name - resolve against the workspace
+        if self.workspace == None:
+            raise ValueError(f"Cannot resolve {path} without a workspace.")
+
+        db_path, table = self.split_path(self.workspace)
+
+        return db_path, parts[-1]
+
+    # helper method that returns an open connection to a geopackage
+    def connect(self, db_path):
+
+        if db_path not in self.connections:
+
+            new_db = not os.path.exists(db_path)
+            conn = sqlite3.connect(db_path)
+
+            if new_db:
+                self.init_gpkg(conn)
+
+            self.connections[db_path] = conn
+
+        return self.connections[db_path]
+
+    # helper method that creates the geopackage metadata tables
+    def init_gpkg(self, conn):
+
+        conn.execute("PRAGMA application_id = 1196444487") # 'GPKG'
+        conn.execute("PRAGMA user_version = 10300")
+
+        conn.execute("""CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS gpkg_contents (
+            table_name TEXT PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+            description TEXT DEFAULT '', last_change DATETIME DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+            table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name))""")
+
+        srs_rows = [
+            ["Undefined cartesian SRS", -1, "NONE", -1, "undefined", None],
+            ["Undefined geographic SRS", 0, "NONE", 0, "undefined", None],
+            ["NAD27 / Illinois East", SPATIAL_REFERENCE, "EPSG", SPATIAL_REFERENCE, "undefined", None]
+        ]
+        conn.executemany("INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", srs_rows)
+        conn.commit()
+
+    # helper method that returns the geometry column of a table (None for plain tables)
+    def geometry_column(self, conn, table):
+
+        row = conn.execute("SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?",
+                           [table]).fetchone()
+
+        return row[0] if row != None else None
+
+    def field_names(self, table):
+
+        db_path, table_name = self.split_path(table)
+        conn = self.connect(db_path)
+
+        geom_col = self.geometry_column(conn, table_name)
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+
+        return [col for col in columns if col != geom_col and col not in EXCLUDE_FIELDS]
+
+    def read_rows(self, table, fields, where_clause = None):
+
+        db_path, table_name = self.split_path(table)
+        conn = self.connect(db_path)
+        geom_col = self.geometry_column(conn, table_name)
+
+        select = []
+        for field in fields:
+            if field.startswith("SHAPE@"):
+                select.append(f'"{geom_col}"')
+            else:
+                select.append(f'"{field}"')
+
+        sql = f'SELECT {", ".join(select)} FROM "{table_name}"'
+        if where_clause != None:
+            sql += f" WHERE {where_clause}"
+
+        geom_indexes = [i for i, field in enumerate(fields) if field.startswith("SHAPE@")]
+
+        for row in conn.execute(sql):
+
+            if len(geom_indexes) == 0:
+                yield row
+                continue
+
+            row = list(row)
+
+            for i in geom_indexes:
+
+                if fields[i] == "SHAPE@WKB":
+                    row[i] = gpkg_to_wkb(row[i])
+                    continue
+
+                vertices = decode_gpkg_geometry(row[i])
+
+                if fields[i] == "SHAPE@X":
+                    row[i] = vertices[0][0] if len(vertices) > 0 else None
+                elif fields[i] == "SHAPE@Y":
+                    row[i] = vertices[0][1] if len(vertices) > 0 else None
+                else:
+                    row[i] = vertices
+
+            yield tuple(row)
+
+    def read_geometry(self, table, fields, where_clause = None):
+
+        rows = list(self.read_rows(table, fields + ["SHAPE@"], where_clause))
+
+        attr_df = pd.DataFrame(data = [row[:-1] for row in rows], columns = fields)
+
+        lengths = np.array([len(row[-1]) for row in rows], dtype = np.int64)
+        offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+
+        vertices = np.array([vertex for row in rows for vertex in row[-1]],
+                            dtype = np.float64).reshape(-1, 2)
+
+        return attr_df, vertices, offsets
+
+    def write_rows(self, table, fields, rows):
+
+        db_path, table_name = self.split_path(table)
+        conn = self.connect(db_path)
+        geom_col = self.geometry_column(conn, table_name)
+
+        columns = [f'"{geom_col}"' if field == "SHAPE@" else f'"{field}"' for field in fields]
+        placeholders = ", ".join(["?"] * len(fields))
+        sql = f'INSERT INTO "{table_name}" ({", ".join(columns)}) VALUES ({placeholders})'
+
+        geom_index = fields.index("SHAPE@") if "SHAPE@" in fields else None
+
+        # geometry from encode_polyline is already encoded
+        def encoded_rows():
+            for row in rows:
+                if geom_index != None and not isinstance(row[geom_index], bytes):
+                    row = list(row)
+                    row[geom_index] = encode_gpkg_geometry(row[geom_index])
+                yield row
+
+        conn.executemany(sql, encoded_rows())
+        conn.commit()
+
+    def create_workspace(self, folder, name):
+
+        name = os.path.splitext(name)[0] + ".gpkg"
+        db_path = os.path.join(folder, name)
+
+        self.connect(db_path)
+
+        return db_path
+
+    def create_feature_class(self, workspace, name, geometry_type, fields = None,
+                             spatial_reference = SPATIAL_REFERENCE):
+
+        db_path, _ = self.split_path(workspace)
+        conn = self.connect(db_path)
+
+        columns = ["fid INTEGER PRIMARY KEY AUTOINCREMENT"]
+
+        if geometry_type != None:
+            columns.append("geom BLOB")
+
+        if fields != None:
+            for field in fields:
+                columns.append(f'"{field[0]}" {SQLITE_TYPES.get(field[1].upper(), "TEXT")}')
+
+        conn.execute(f'CREATE TABLE "{name}" ({", ".join(columns)})')
+
+        data_type = "features" if geometry_type != None else "attributes"
+        conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) VALUES (?, ?, ?, ?)",
+                     [name, data_type, name, spatial_reference])
+
+        if geometry_type != None:
+            conn.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)",
+                         [name, GPKG_GEOMETRY_TYPES[geometry_type.upper()], spatial_reference])
+
+        conn.commit()
+
+        return os.path.join(workspace, name)
+
+    def copy(self, in_table, out_table, where_clause = None):
+
+        in_db, in_name = self.split_path(in_table)
+        out_db, out_name = self.split_path(out_table)
+
+        in_conn = self.connect(in_db)
+        geom_col = self.geometry_column(in_conn, in_name)
+
+        # recreate the schema, then copy the rows across (works between geopackages)
+        column_info = [row for row in in_conn.execute(f'PRAGMA table_info("{in_name}")')]
+        fields = [[row[1], row[2]] for row in column_info if row[1] not in ["fid", geom_col]]
+
+        geometry_type = None
+        if geom_col != None:
+            type_name = in_conn.execute("SELECT geometry_type_name FROM gpkg_geometry_columns WHERE table_name = ?",
+                                        [in_name]).fetchone()[0]
+            geometry_type = "POINT" if type_name == "POINT" else "POLYLINE"
+
+        sqlite_to_field = {"INTEGER": "LONG", "REAL": "DOUBLE", "TEXT": "TEXT", "DATETIME": "DATE"}
+        fields = [[name, sqlite_to_field.get(sql_type.upper(), "TEXT")] for name, sql_type in fields]
+
+        self.create_feature_class(os.path.dirname(out_table) if out_name != None else out_db,
+                                  out_name, geometry_type, fields)
+
+        field_names = [field[0] for field in fields]
+        select = [f'"{name}"' for name in field_names]
+        if geom_col != None:
+            select.append(f'"{geom_col}"')
+
+        sql = f'SELECT {", ".join(select)} FROM "{in_name}"'
+        if where_clause != None:
+            sql += f" WHERE {where_clause}"
+
+        out_columns = [f'"{name}"' for name in field_names] + (["geom"] if geom_col != None else [])
+        placeholders = ", ".join(["?"] * len(out_columns))
+
+        out_conn = self.connect(out_db)
+        out_conn.executemany(f'INSERT INTO "{out_name}" ({", ".join(out_columns)}) VALUES ({placeholders})',
+                             in_conn.execute(sql))
+        out_conn.commit()
+
+    def exists(self, path):
+
+        db_path, table_name = self.split_path(path)
+
+        if not os.path.exists(db_path):
+            return False
+        if table_name == None:
+            return True
+
+        conn = self.connect(db_path)
+        row = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+                           [table_name]).fetchone()
+
+        return row != None
+
+    def delete(self, path):
+
+        db_path, table_name = self.split_path(path)
+
+        if table_name == None:
+
+            if db_path in self.connections:
+                self.connections.pop(db_path).close()
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+            return
+
+        conn = self.connect(db_path)
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute("DELETE FROM gpkg_contents WHERE table_name = ?", [table_name])
+        conn.execute("DELETE FROM gpkg_geometry_columns WHERE table_name = ?", [table_name])
+        conn.commit()
+
+    def make_polyline(self, vertices):
+        return [(float(x), float(y)) for x, y in vertices]
+
+    def make_point(self, x, y):
+        return (float(x), float(y))
+
+    def encode_polyline(self, vertices):
+        return encode_gpkg_geometry(vertices)
+
+# GEOPACKAGE GEOMETRY -------------------------------------------------------------------------
+
+# geopackage binary: "GP", version, flags, srs id, (no envelope), little endian WKB
+# points are stored as WKB points, polylines as WKB linestrings
+
+def encode_gpkg_geometry(geometry, srs_id = SPATIAL_REFERENCE):
+
+    if geometry is None:
+        return None
+
+    if hasattr(geometry, "tolist"):
+        geometry = geometry.tolist()
+
+    header = b"GP" + bytes([0, 0b00000001]) + struct.pack("<i", srs_id)
+
+    # point
+    if len(geometry) == 2 and not isinstance(geometry[0], (list, tuple)):
+        return header + struct.pack("<BIdd", 1, 1, geometry[0], geometry[1])
+
+    # linestring
+    wkb = struct.pack("<BII", 1, 2, len(geometry))
+    wkb += b"".join(struct.pack("<dd", x, y) for x, y in geometry)
+
+    return header + wkb
+
+# helper function that returns the offset of the WKB within a geopackage geometry
+def wkb_offset(blob):
+
+    flags = blob[3]
+    envelope_sizes = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+    return 8 + envelope_sizes[(flags >> 1) & 0b111]
+
+def gpkg_to_wkb(blob):
+
+    if blob == None:
+        return None
+
+    return bytes(blob[wkb_offset(blob):])
+
+def decode_gpkg_geometry(blob):
+
+    if blob == None:
+        return []
+
+    vertices, offset = decode_wkb(blob, wkb_offset(blob))
+
+    return vertices
+
+# helper function that decodes WKB (points, linestrings + their multi versions)
+def decode_wkb(blob, offset):
+
+    endian = "<" if blob[offset] == 1 else ">"
+    geom_type = struct.unpack_from(f"{endian}I", blob, offset + 1)[0] % 1000
+    offset += 5
+
+    if geom_type == 1:
+        x, y = struct.unpack_from(f"{endian}dd", blob, offset)
+        return [(x, y)], offset + 16
+
+    if geom_type == 2:
+        num_points = struct.unpack_from(f"{endian}I", blob, offset)[0]
+        offset += 4
+        coords = struct.unpack_from(f"{endian}{2 * num_points}d", blob, offset)
+        vertices = list(zip(coords[0::2], coords[1::2]))
+        return vertices, offset + 16 * num_points
+
+    if geom_type in [4, 5]:
+        num_parts = struct.unpack_from(f"{endian}I", blob, offset)[0]
+        offset += 4
+        vertices = []
+        for i in range(num_parts):
+            part_vertices, offset = decode_wkb(blob, offset)
+            vertices += part_vertices
+        return vertices, offset
+
+    raise ValueError(f"Unsupported WKB geometry type {geom_type}.")
+
+# BACKEND SELECTION ---------------------------------------------------------------------------
+
+BACKENDS = {
+    "arcpy": ArcpyStorage,
+    "gpkg": GeoPackageStorage
+}
+
+# function that returns the storage backend
+# (MFHRN_STORAGE environment variable, arcpy by default)
+def get_storage(name = None):
+
+    if name == None:
+        name = os.environ.get("MFHRN_STORAGE", "arcpy")
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name}. Choose from {', '.join(BACKENDS)}.")
+
+    return BACKENDS[name]()
+
+# function that stops a script that still calls arcpy geoprocessing directly
+# when another backend is selected (instead of failing halfway through a run)
+def require_arcpy(storage, script_name):
+
+    if storage.name != "arcpy":
+        raise ValueError(f"{script_name} needs the arcpy storage backend (MFHRN_STORAGE={storage.name} " +
+                         "only runs 2_generate_hwy_files.py, 4_generate_transit_files.py + import_gtfs.py).")
+
+# function that copies a table/feature class between backends
+# (e.g. arcpy -> gpkg to prepare inputs for a build agent without arcpy)
+def transfer(src_storage, src_table, dst_storage, dst_workspace, dst_name,
+             geometry_type = None, fields = None):
+
+    if fields == None:
+        fields = src_storage.field_names(src_table)
+
+    sample_df = src_storage.read_table(src_table, fields)
+
+    field_types = []
+    for field in fields:
+        kind = sample_df[field].dtype.kind
+        if kind in "iub":
+            field_types.append([field, "LONG"])
+        elif kind == "f":
+            field_types.append([field, "DOUBLE"])
+        else:
+            field_types.append([field, "TEXT"])
+
+    dst_table = dst_storage.create_feature_class(dst_workspace, dst_name, geometry_type, field_types)
+
+    read_fields = fields + (["SHAPE@"] if geometry_type != None else [])
+    rows = src_storage.read_rows(src_table, read_fields)
+
+    if geometry_type != None and src_storage.name == "arcpy":
+        rows = (row[:-1] + (arcpy_to_vertices(row[-1], geometry_type),) for row in rows)
+
+    dst_storage.write_rows(dst_table, read_fields, rows)
+
+    return dst_table
+
+# helper function that converts an arcpy geometry to vertices / a point
+def arcpy_to_vertices(geometry, geometry_type):
+
+    if geometry == None:
+        return None
+
+    if geometry_type.upper() == "POINT":
+        point = geometry.firstPoint
+        return (point.X, point.Y)
+
+    return [(point.X, point.Y) for part in geometry for point in part if point != None]
@@ -0,0 +1,597 @@
+# synthetic_data.py
+# synthetic inputs for run_benchmarks.py + the tests (tests/), sized like the region
+# where it matters, + the straightforward methods the optimized modules are timed and
+# checked against - nothing in here is used by the processing scripts
+# author: ccai
+
+import io
+import os
+import csv
+import random
+import zipfile
+
+from modules.lazy_imports import np, pd
+from modules.csr_graph import CSRGraph
+from modules.link_store import LinkStore
+from modules.node_index import NodeIndex
+from modules.gtfs_ingest import STOP_TIME_COLUMNS
+from modules.itinerary_store import ITIN_COLUMNS, Itinerary, ItineraryStore
+
+# EMME FILES ----------------------------------------------------------------------------------
+
+# function that writes synthetic emme batchin files laid out like the exporters write them:
+# <folder>/highway/<scenario>/<scenario>0<tod>.l1/.l2/.n1/.n2 (TODs 0-8) + highway.linkshape
+# and <folder>/transit/<scenario>/bus.itinerary_<tod> (TODs 1-4)
+# nodes are a grid (centroids 1-num_zones, network nodes from 10001), links connect grid
+# neighbours in both directions
+# changed = True writes a later run of the same inputs: a few links get another length,
+# a few are dropped + a few bus segments get another us1
+# returns the records changed in each file (relative path -> number of records)
+def make_synthetic_batchin(folder, scenarios = (100, 200, 300, 400, 500, 700), num_zones = 3632,
+                           num_nodes = 20000, num_lines = 800, line_segments = 80,
+                           changed = False, seed = 1):
+
+    rng = random.Random(seed)
+
+    # changes are drawn apart, so both runs have the same network + bus lines
+    change_rng = random.Random(seed + 1)
+
+    size = int(num_nodes ** 0.5)
+    nodes = [10001 + i for i in range(size * size)]
+
+    def node_xy(node):
+        row, col = divmod(node - 10001, size)
+        return 1100000 + col * 2640.0, 1850000 + row * 2640.0
+
+    links = []
+    for node in nodes:
+        row, col = divmod(node - 10001, size)
+        if col + 1 < size:
+            links += [(node, node + 1), (node + 1, node)]
+        if row + 1 < size:
+            links += [(node, node + size), (node + size, node)]
+
+    lengths = [round(rng.uniform(0.1, 1.0), 2) for link in links]
+    lanes = [rng.randint(1, 3) for link in links]
+    speeds = [rng.choice([25, 30, 35, 45, 55]) for link in links]
+
+    # a run after small changes to the inputs
+    changed_links = set()
+    dropped_links = set()
+    if changed == True:
+        changed_links = set(change_rng.sample(range(len(links)), len(links) // 100))
+        dropped_links = set(change_rng.sample(sorted(set(range(len(links))) - changed_links), len(links) // 1000))
+        for i in changed_links:
+            lengths[i] = round(lengths[i] + 0.01, 2)
+
+    # bus lines walk the grid
+    bus_lines = []
+    for i in range(num_lines):
+        node = rng.choice(nodes)
+        path = [node]
+        while len(path) <= line_segments:
+            row, col = divmod(node - 10001, size)
+            steps = [step for step, ok in [(1, col + 1 < size), (-1, col > 0),
+                                           (size, row + 1 < size), (-size, row > 0)] if ok]
+            node = node + rng.choice(steps)
+            path.append(node)
+        us1s = [round(rng.uniform(0.2, 3.0), 1) for j in range(line_segments)]
+        bus_lines.append((f"b{i:05d}", path, us1s))
+
+    changed_segments = 0
+    if changed == True:
+        for line, path, us1s in change_rng.sample(bus_lines, num_lines // 10):
+            us1s[0] = round(us1s[0] + 0.1, 1)
+            changed_segments += 1
+
+    kept = [i for i in range(len(links)) if i not in dropped_links]
+
+    l1_text = "c a,i-node,j-node,length,modes,type,lanes,vdf\nt links init\n" + "".join(
+        f"a{' ' * (7 - len(str(links[i][0])))}{links[i][0]}{' ' * (7 - len(str(links[i][1])))}{links[i][1]} " +
+        f"{lengths[i]} ASHThmlb  1 {lanes[i]}  1\n" for i in kept)
+
+    l2_text = "c i-node,j-node,@speed,@width,@parkl,@cltl,@toll,@sigic,@rrx,@tipid\n" + "".join(
+        f"{' ' * (6 - len(str(links[i][0])))}{links[i][0]}{' ' * (7 - len(str(links[i][1])))}{links[i][1]} " +
+        f"{speeds[i]}  12  0  0  0  0  0  0\n" for i in kept)
+
+    n1_text = "c a,node,x,y\nt nodes init\n" + "".join(
+        f"a*{' ' * (6 - len(str(zone)))}{zone} {1100000 + zone * 10.0} {1840000.0}\n"
+        for zone in range(1, num_zones + 1)) + "".join(
+        f"a{' ' * (7 - len(str(node)))}{node} {node_xy(node)[0]} {node_xy(node)[1]}\n" for node in nodes)
+
+    n2_text = "c i-node,@zone,@atype,@imarea\n" + "".join(
+        f"{' ' * (6 - len(str(zone)))}{zone} {zone}  1  1\n" for zone in range(1, num_zones + 1)) + "".join(
+        f"{' ' * (6 - len(str(node)))}{node} {(node - 10001) % num_zones + 1}  2  0\n" for node in nodes)
+
+    # two vertices + a bend per link
+    linkshape_lines = ["c HIGHWAY LINK SHAPE FILE\nc 01JAN26\nt linkvertices\n"]
+    for i in kept:
+        a, b = links[i]
+        (ax, ay), (bx, by) = node_xy(a), node_xy(b)
+        linkshape_lines.append(f"r {a} {b}\na {a} {b} 1 {ax} {ay}\n" +
+                               f"a {a} {b} 2 {(ax + bx) / 2 + 15.5} {(ay + by) / 2 + 15.5}\n" +
+                               f"a {a} {b} 3 {bx} {by}\n")
+    linkshape_text = "".join(linkshape_lines)
+
+    itin_lines = ["c BUS TRANSIT BATCHIN FILE\nc 01JAN26\nt lines\n"]
+    for line, path, us1s in bus_lines:
+        itin_lines.append(f"a  '{line}'   B   1   10   20   'Route {line}        '\n    path=no\n")
+        itin_lines.append(f"    dwt=0.01\n    {path[0]}")
+        for j in range(line_segments):
+            dwt = "0.01" if j % 4 == 3 or j == line_segments - 1 else "#0  "
+            itin_lines.append(f"   dwt={dwt}   ttf=1   us1={us1s[j]}    us2=0\n    {path[j + 1]}")
+        itin_lines.append("   lay=3\n")
+    itin_text = "".join(itin_lines)
+
+    changes = {}
+
+    for scenario in scenarios:
+
+        hwy_folder = os.path.join(folder, "highway", str(scenario))
+        os.makedirs(hwy_folder, exist_ok = True)
+
+        for tod in range(0, 9):
+            for ext, text in [("l1", l1_text), ("l2", l2_text), ("n1", n1_text), ("n2", n2_text)]:
+                with open(os.path.join(hwy_folder, f"{scenario}0{tod}.{ext}"), "w") as f:
+                    f.write(text)
+
+            changes[os.path.join("highway", str(scenario), f"{scenario}0{tod}.l1")] = len(changed_links) + len(dropped_links)
+            changes[os.path.join("highway", str(scenario), f"{scenario}0{tod}.l2")] = len(dropped_links)
+
+        with open(os.path.join(hwy_folder, "highway.linkshape"), "w") as f:
+            f.write(linkshape_text)
+        changes[os.path.join("highway", str(scenario), "highway.linkshape")] = len(dropped_links)
+
+        transit_folder = os.path.join(folder, "transit", str(scenario))
+        os.makedirs(transit_folder, exist_ok = True)
+
+        for tod in [1, 2, 3, 4]:
+            with open(os.path.join(transit_folder, f"bus.itinerary_{tod}"), "w") as f:
+                f.write(itin_text)
+            changes[os.path.join("transit", str(scenario), f"bus.itinerary_{tod}")] = changed_segments
+
+    return changes
+
+# BUS RUNS ------------------------------------------------------------------------------------
+
+# function that makes a synthetic gtfs day:
+# each route has a number of patterns (short turns, branches, detours) and every run
+# follows one pattern with a little noise in the dwell codes
+# returns moderte -> runs and an itinerary df like bus_base_itin
+def make_synthetic_day(num_routes = 300, runs_per_route = 150, patterns_per_route = 25,
+                       segs_per_run = 60, seed = 1):
+
+    rng = random.Random(seed)
+
+    lines_dict = {}
+    itin_records = []
+
+    node = 10000
+
+    for route in range(num_routes):
+
+        trunk = list(range(node, node + segs_per_run + 1))
+        node += segs_per_run + 1
+
+        patterns = []
+
+        for pattern_num in range(patterns_per_route):
+
+            start = rng.randrange(0, segs_per_run // 3)
+            end = rng.randrange(2 * segs_per_run // 3, segs_per_run + 1)
+            pattern = trunk[start: end + 1]
+
+            # detour away from the trunk
+            if rng.random() < 0.5:
+                detour_start = rng.randrange(1, len(pattern) - 2)
+                detour_len = rng.randrange(2, 10)
+                detour = list(range(node, node + detour_len))
+                node += detour_len
+                pattern = pattern[: detour_start] + detour + pattern[detour_start + 1:]
+
+            patterns.append(pattern)
+
+        runs = []
+
+        for run_num in range(runs_per_route):
+
+            run = f"r{route:04d}_{run_num:04d}"
+            pattern = rng.choice(patterns)
+
+            for i in range(len(pattern) - 1):
+                dwc = "1" if rng.random() < 0.05 else "0"
+                itin_records.append([run, i + 1, pattern[i], pattern[i + 1], dwc])
+
+            runs.append(run)
+
+        lines_dict[f"B-{route}"] = sorted(runs)
+
+    itin_df = pd.DataFrame(itin_records,
+                           columns = ["TRANSIT_LINE", "ITIN_ORDER", "ITIN_A", "ITIN_B", "DWELL_CODE"])
+
+    return lines_dict, itin_df
+
+# function that builds the "{a}-{b}-{dwc}" string segment sets of the original
+# find_rep_runs from an itinerary df
+def make_string_sets(itin_df):
+
+    seg_sets = {}
+
+    for tr_line, itin_a, itin_b, dw_code in zip(itin_df["TRANSIT_LINE"], itin_df["ITIN_A"],
+                                               itin_df["ITIN_B"], itin_df["DWELL_CODE"]):
+        seg_sets.setdefault(tr_line, set()).add(f"{itin_a}-{itin_b}-{dw_code}")
+
+    return seg_sets
+
+# function that clusters runs like the original find_rep_runs: every remaining run of the
+# route is compared against the base run (reference for run_clustering.cluster_runs)
+def pairwise_cluster_runs(lines_dict, seg_sets, threshold, start_group = 0):
+
+    group = start_group
+    groups = {}
+
+    for moderte in lines_dict:
+
+        mr_lines = list(lines_dict[moderte])
+
+        while len(mr_lines) > 0:
+
+            group += 1
+            base_run = mr_lines.pop(0)
+            groups[base_run] = group
+
+            base_run_set = seg_sets[base_run]
+
+            if len(base_run_set) == 0:
+                continue
+
+            remaining = []
+
+            for comp_run in mr_lines:
+
+                if len(base_run_set & seg_sets[comp_run]) / len(base_run_set) >= threshold:
+                    groups[comp_run] = group
+                else:
+                    remaining.append(comp_run)
+
+            mr_lines = remaining
+
+    return groups
+
+# HIGHWAY NETWORK -----------------------------------------------------------------------------
+
+# function that makes a synthetic regional highway network (default about as many nodes as
+# the MHN): a grid of arterials with random link lengths, some one-way pairs and missing
+# links, plus faster expressway corridors every few rows/columns
+# returns the network as a TOD network (MaskedGraph - see modules/csr_graph.py)
+def make_synthetic_network(size = 142, seed = 1):
+
+    rng = random.Random(seed)
+
+    anodes = []
+    bnodes = []
+    miles_list = []
+
+    def node_id(row, col):
+        return 10000 + row * size + col
+
+    def add_edge(a, b, miles):
+        anodes.append(a)
+        bnodes.append(b)
+        miles_list.append(miles)
+
+    for row in range(size):
+        for col in range(size):
+
+            for d_row, d_col in [(0, 1), (1, 0)]:
+
+                row2 = row + d_row
+                col2 = col + d_col
+
+                if row2 >= size or col2 >= size:
+                    continue
+
+                # missing link
+                if rng.random() < 0.08:
+                    continue
+
+                miles = rng.uniform(0.3, 1.0)
+
+                # expressway
+                if (d_row == 0 and row % 10 == 0) or (d_col == 0 and col % 10 == 0):
+                    miles = miles * 0.5
+
+                a = node_id(row, col)
+                b = node_id(row2, col2)
+
+                # one-way pair
+                direction = rng.random()
+                if direction < 0.05:
+                    add_edge(a, b, miles)
+                elif direction < 0.1:
+                    add_edge(b, a, miles)
+                else:
+                    add_edge(a, b, miles)
+                    add_edge(b, a, miles)
+
+    csr = CSRGraph(anodes, bnodes, miles_list)
+
+    return csr.tod_graph(np.ones(len(anodes), dtype = bool))
+
+# function that makes the gaps of a synthetic TOD on a network from make_synthetic_network:
+# origins shared by several lines, destinations within a few rows/columns of the origin
+# (gaps of a line are short), some gaps repeated - in random order
+def make_synthetic_gaps(G, size = 142, num_origins = 300, seed = 1):
+
+    rng = random.Random(seed)
+
+    gaps = []
+    for a in rng.sample(G.nodes(), num_origins):
+        for i in range(rng.randint(1, 6)):
+            b = a + rng.randint(-5, 5) * size + rng.randint(-5, 5)
+            if b in G:
+                gaps += [(a, b)] * rng.randint(1, 3)
+    rng.shuffle(gaps)
+
+    return gaps
+
+# HIGHWAY LINKS -------------------------------------------------------------------------------
+
+# function that makes a synthetic highway link table:
+# short links between consecutive node ids with a few vertices each, most of them two-way
+def make_synthetic_links(num_links = 100000, seed = 1):
+
+    rng = random.Random(seed)
+
+    anodes = []
+    bnodes = []
+    abbs = []
+    miles = []
+    lengths = []
+    vertex_list = []
+
+    for i in range(num_links):
+
+        anode = 10000 + i
+        bnode = 10001 + i
+        num_vertices = rng.randint(2, 12)
+
+        records = [(anode, bnode), (bnode, anode)] if rng.random() < 0.3 else [(anode, bnode)]
+
+        x = rng.uniform(0, 1e6)
+        y = rng.uniform(0, 1e6)
+        link_vertices = [(x + 50 * j, y + rng.uniform(-20, 20)) for j in range(num_vertices)]
+
+        for a, b in records:
+            anodes.append(a)
+            bnodes.append(b)
+            abbs.append(f"{a}-{b}-1")
+            miles.append(num_vertices * 50 / 5280)
+            lengths.append(num_vertices)
+            vertex_list += link_vertices
+
+    vertices = np.array(vertex_list, dtype = np.float64).reshape(-1, 2)
+    offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+
+    return anodes, bnodes, abbs, miles, vertices, offsets
+
+# function that makes synthetic itineraries on the synthetic links (see make_synthetic_links):
+# lines along consecutive links, some against their direction, some with a false link
+def make_synthetic_itins(link_store, num_lines = 2000, num_routes = 200, seed = 1):
+
+    rng = random.Random(seed)
+
+    first_node = int(link_store.anodes.min())
+    last_node = int(link_store.bnodes.max())
+
+    # lines of the same route share most of their links
+    routes = []
+    for i in range(num_routes):
+        start = rng.randint(first_node, last_node - 200)
+        routes.append((start, start + rng.randint(20, 150), rng.random() < 0.3))
+
+    line_itins = []
+    for i in range(num_lines):
+
+        start, end, backwards = rng.choice(routes)
+        start += rng.randint(0, 5)
+
+        nodes = list(range(start, end + 1))
+        if backwards == True:
+            nodes.reverse()
+
+        segments = list(zip(nodes[:-1], nodes[1:]))
+
+        # false link
+        if rng.random() < 0.1:
+            j = rng.randrange(len(segments))
+            segments[j] = (segments[j][0], segments[j][0] + 100000)
+
+        lists = {column: [] for column in ITIN_COLUMNS}
+        for a, b in segments:
+            for column, value in zip(ITIN_COLUMNS, [a, b, f"{a}-{b}-1", "0", 0.5, "1", None]):
+                lists[column].append(value)
+
+        line_itins.append((f"b{i:05d}", lists))
+
+    return ItineraryStore.from_itineraries([(line, Itinerary.from_lists(lists)) for line, lists in line_itins])
+
+# function that writes itineraries segment by segment like before ItineraryWriter, with the
+# geometry from the LRU cache of the link store (reference for ItineraryWriter.write)
+def write_itins_by_segment(storage, itin_fc, itin_store, link_store):
+
+    def rows():
+        for line in itin_store:
+            for itin_order, record in enumerate(itin_store.get(line).rows(ITIN_COLUMNS), start = 1):
+                itin_a, itin_b = record[0], record[1]
+                geom = link_store.geometry(itin_a, itin_b) if (itin_a, itin_b) in link_store else None
+                yield [geom, line, itin_order] + list(record)
+
+    storage.write_rows(itin_fc, ["SHAPE@", "TRANSIT_LINE", "ITIN_ORDER"] + ITIN_COLUMNS, rows())
+
+# function that joins the link vertices of each line in python (reference for
+# ItineraryWriter.write_routes): travel order, joints only once
+# returns transit line -> list of (x, y)
+def join_route_vertices(itin_store, link_store):
+
+    routes = {}
+
+    for line in itin_store:
+
+        route = []
+        previous_linked = False
+
+        for itin_a, itin_b in itin_store.get(line).rows(["ITIN_A", "ITIN_B"]):
+
+            if (itin_a, itin_b) not in link_store:
+                previous_linked = False
+                continue
+
+            link_vertices = [tuple(vertex) for vertex in link_store.link_vertices(itin_a, itin_b).tolist()]
+            if link_store.anodes[link_store.index[(itin_a << 32) | itin_b]] != itin_a:
+                link_vertices.reverse()
+
+            if len(route) > 0 and route[-1] == link_vertices[0] and previous_linked == True:
+                link_vertices = link_vertices[1:]
+
+            route += link_vertices
+            previous_linked = True
+
+        routes[line] = route
+
+    return routes
+
+# HIGHWAY NODES -------------------------------------------------------------------------------
+
+# function that makes synthetic highway nodes clustered around a few centers, snapped to
+# a grid so distances tie, each in one of num_zones zones
+# returns node ids, xs, ys and node -> zone
+def make_synthetic_nodes(num_nodes = 20000, num_zones = 50, seed = 1):
+
+    rng = random.Random(seed)
+
+    centers = [(rng.uniform(0, 1e6), rng.uniform(0, 1e6)) for i in range(20)]
+    node_ids = rng.sample(range(1, 10 * num_nodes), num_nodes)
+    xs = []
+    ys = []
+    for i in range(num_nodes):
+        center_x, center_y = rng.choice(centers)
+        xs.append(round(center_x + rng.gauss(0, 3e4), -2))
+        ys.append(round(center_y + rng.gauss(0, 3e4), -2))
+
+    zones = {node: rng.randrange(num_zones) for node in node_ids}
+
+    return node_ids, xs, ys, zones
+
+# function that finds the nearest node by checking every node (reference for node_index.NodeIndex)
+def brute_force_nearest(node_ids, xs, ys, x, y, accept = None):
+
+    best_d2 = float("inf")
+    best_node = None
+
+    for node, node_x, node_y in zip(node_ids, xs, ys):
+
+        if accept != None and not accept(node):
+            continue
+
+        d2 = (node_x - x) ** 2 + (node_y - y) ** 2
+
+        if d2 < best_d2 or (d2 == best_d2 and node < best_node):
+            best_d2 = d2
+            best_node = node
+
+    return best_node
+
+# GTFS ----------------------------------------------------------------------------------------
+
+# function that makes the GtfsIngest inputs for a network from make_synthetic_network with
+# node 10000 + row * size + col at x = col * spacing, y = row * spacing: the link store
+# (straight links), the TOD network + the node index
+def make_synthetic_ingest_inputs(size = 100, spacing = 2640, seed = 1):
+
+    network = make_synthetic_network(size, seed)
+    edges = [(a, b, data["weight"]) for a, b, data in network.edges(data = True)]
+
+    def cell(node):
+        return divmod(node - 10000, size)
+
+    anodes = [a for a, b, w in edges]
+    bnodes = [b for a, b, w in edges]
+    miles = [w for a, b, w in edges]
+    vertices = np.array([[cell(node)[1] * spacing, cell(node)[0] * spacing]
+                         for a, b, w in edges for node in (a, b)], dtype = np.float64)
+    offsets = np.arange(0, 2 * len(edges) + 1, 2)
+
+    link_store = LinkStore(anodes, bnodes, [f"{a}-{b}-1" for a, b in zip(anodes, bnodes)],
+                           miles, vertices, offsets, lambda link_vertices: link_vertices)
+    G = CSRGraph(anodes, bnodes, miles).tod_graph(np.ones(len(edges), dtype = bool))
+
+    nodes = G.nodes()
+    node_index = NodeIndex(nodes, [cell(node)[1] * spacing for node in nodes],
+                           [cell(node)[0] * spacing for node in nodes])
+
+    return link_store, G, node_index
+
+# function that projects the synthetic stops (written in feet: lat = y, lon = x)
+def feet_projection(lons, lats):
+    return lons, lats
+
+# function that writes a synthetic GTFS zip onto a grid network (node 10000 + row * size + col
+# at x = col * spacing, y = row * spacing, see make_synthetic_network):
+# routes along rows + columns in both directions, a stop every few nodes, trips every
+# headway minutes over the day - coordinates are written as lon/lat = x/y (feet)
+def make_synthetic_feed(path, size = 100, spacing = 2640, num_routes = 60, headway = 10, seed = 1):
+
+    rng = random.Random(seed)
+
+    files = {name: io.StringIO() for name in ["routes.txt", "trips.txt", "stops.txt", "stop_times.txt"]}
+    writers = {name: csv.writer(files[name], lineterminator = "\n") for name in files}
+
+    writers["routes.txt"].writerow(["route_id", "route_short_name", "route_long_name", "route_type"])
+    writers["trips.txt"].writerow(["route_id", "service_id", "trip_id", "trip_headsign"])
+    writers["stops.txt"].writerow(["stop_id", "stop_lat", "stop_lon"])
+    writers["stop_times.txt"].writerow(STOP_TIME_COLUMNS)
+
+    stops = set()
+    num_trips = 0
+
+    for route in range(num_routes):
+
+        writers["routes.txt"].writerow([f"R{route}", str(route), f"Route {route}", "3"])
+
+        # along a row or a column, a stop every 2-4 nodes
+        line = rng.randrange(size)
+        cells = [(line, col) if route % 2 == 0 else (col, line) for col in range(size)]
+        stop_cells = cells[:: rng.randint(2, 4)]
+
+        for direction, route_cells in enumerate([stop_cells, stop_cells[::-1]]):
+
+            for start in range(5 * 3600, 24 * 3600, headway * 60):
+
+                trip_id = f"T{num_trips}"
+                num_trips += 1
+
+                writers["trips.txt"].writerow([f"R{route}", "WKDY", trip_id, f"Dir {direction}"])
+
+                for sequence, (row, col) in enumerate(route_cells, start = 1):
+
+                    stop_id = f"S{row}_{col}"
+                    if stop_id not in stops:
+                        stops.add(stop_id)
+                        # a little off the node
+                        writers["stops.txt"].writerow([stop_id, row * spacing + rng.uniform(-50, 50),
+                                                       col * spacing + rng.uniform(-50, 50)])
+
+                    # timepoints every third stop
+                    stop_time = ""
+                    if sequence % 3 == 1 or sequence == len(route_cells):
+                        seconds = start + (sequence - 1) * 90
+                        stop_time = f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+                    writers["stop_times.txt"].writerow([trip_id, stop_time, stop_time, stop_id, sequence])
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in files:
+            zf.writestr(name, files[name].getvalue())
+
+    return num_trips
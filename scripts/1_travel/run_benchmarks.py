@@ -0,0 +1,534 @@
+## run_benchmarks.py
+## throughput benchmarks + regression checks for the processing modules
+## every entry returns a failure message (None = ok) - the exit code is non-zero if any failed
+## Author: ccai (2026)
+
+import os
+import sys
+import argparse
+import random
+import math
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from modules.output_sinks import benchmark_sinks
+from modules.emme_files import diff_folders, has_differences
+from modules.synthetic_data import (make_synthetic_batchin, make_synthetic_day, make_string_sets,
+                                   pairwise_cluster_runs, make_synthetic_network, make_synthetic_gaps,
+                                   make_synthetic_links, make_synthetic_itins, write_itins_by_segment,
+                                   make_synthetic_nodes, brute_force_nearest,
+                                   make_synthetic_ingest_inputs,
+                                   feet_projection, make_synthetic_feed)
+from modules.run_clustering import cluster_runs, pack_itineraries
+from modules.itinerary_store import ItineraryStore
+from modules.contraction_hierarchy import ContractionHierarchy
+from modules.node_index import NodeIndex
+from modules.link_store import LinkStore
+from modules.gap_router import GapRouter
+from modules.itinerary_writer import ItineraryWriter
+from modules.storage import get_storage
+from modules.gtfs_ingest import GtfsIngest
+
+# benchmark of the emme output sinks - every file has to read back as it was written
+def run_output_sinks(args):
+
+    out_folder = args.out_folder
+    if out_folder == None:
+        out_folder = tempfile.mkdtemp()
+
+    print(f"Benchmarking output sinks in {out_folder}...")
+
+    results = benchmark_sinks(out_folder)
+
+    mismatches = 0
+
+    for output_mode in results:
+        result = results[output_mode]
+        print(f"{output_mode:>6}: {result['seconds']:.2f}s, " +
+              f"{result['mb_per_s']:.1f} MB/s, {result['output_mb']:.1f} MB written, " +
+              f"{result['mismatches']} files not read back as written")
+        mismatches += result["mismatches"]
+
+    if mismatches > 0:
+        return "Output sink files do not read back as they were written."
+
+# timing of compare_emme_files.py over every scenario x TOD: two runs of synthetic batchin
+# files sized like the region (6 scenarios, 9 highway TODs of ~80k links + 4 bus TODs of
+# 800 lines) that differ in a few links + segments
+def run_emme_diff(args):
+
+    out_folder = args.out_folder
+    if out_folder == None:
+        out_folder = tempfile.mkdtemp()
+
+    print(f"Timing the emme file diff in {out_folder}...")
+
+    old_folder = os.path.join(out_folder, "emme_old")
+    new_folder = os.path.join(out_folder, "emme_new")
+
+    make_synthetic_batchin(old_folder)
+    make_synthetic_batchin(new_folder, changed = True)
+
+    total_mb = sum(os.path.getsize(os.path.join(root, file_name))
+                   for root, dirs, files in os.walk(old_folder) for file_name in files) / 1e6
+
+    start_time = time.perf_counter()
+    results = diff_folders(old_folder, new_folder)
+    elapsed = time.perf_counter() - start_time
+
+    num_different = sum(1 for diff in results.values() if has_differences(diff))
+
+    print(f"{len(results)} files ({total_mb:.0f} MB per run), {num_different} differ")
+    print(f"diffed in {elapsed:.1f}s ({total_mb / elapsed:.1f} MB/s, {elapsed / len(results):.2f}s per file)")
+
+    shutil.rmtree(old_folder)
+    shutil.rmtree(new_folder)
+
+# benchmark of bus run clustering on synthetic gtfs days (more runs per route, fewer routes):
+# the original pairwise comparison on "{a}-{b}-{dwc}" string sets against the indexed
+# cluster_runs on packed segments - both have to give the same groups
+def run_clustering(args):
+
+    print("Benchmarking bus run clustering...")
+
+    threshold = 0.85
+    failures = 0
+
+    for num_routes, runs_per_route in [(300, 150), (100, 400), (40, 1000)]:
+
+        lines_dict, itin_df = make_synthetic_day(num_routes, runs_per_route)
+
+        start_time = time.perf_counter()
+        seg_sets = make_string_sets(itin_df)
+        string_build_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        seg_arrays, num_seg_dict = pack_itineraries(ItineraryStore.from_df(itin_df, ["ITIN_A", "ITIN_B", "DWELL_CODE"]))
+        packed_build_time = time.perf_counter() - start_time
+
+        # rough size of the segment containers (strings + sets vs arrays)
+        string_mb = sum(sys.getsizeof(segs) + sum(sys.getsizeof(seg) for seg in segs)
+                        for segs in seg_sets.values()) / 1e6
+        packed_mb = sum(sys.getsizeof(segs) for segs in seg_arrays.values()) / 1e6
+
+        # best of 3 (the runs are short)
+        pairwise_time = math.inf
+        packed_time = math.inf
+
+        for i in range(3):
+
+            start_time = time.perf_counter()
+            pairwise_groups = pairwise_cluster_runs(lines_dict, seg_sets, threshold)
+            pairwise_time = min(pairwise_time, time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            packed_groups = cluster_runs(lines_dict, seg_arrays, threshold)
+            packed_time = min(packed_time, time.perf_counter() - start_time)
+
+        identical = pairwise_groups == packed_groups
+        if not identical:
+            failures += 1
+
+        print(f"{num_routes} routes x {runs_per_route} runs -> {len(set(packed_groups.values()))} groups")
+        print(f"    pairwise (string sets): {pairwise_time:.2f}s (+{string_build_time:.2f}s sets, {string_mb:.0f} MB)")
+        print(f"    indexed (packed segments): {packed_time:.2f}s (+{packed_build_time:.2f}s arrays, {packed_mb:.0f} MB)")
+        print(f"    {pairwise_time / packed_time:.1f}x, identical: {identical}")
+
+    if failures > 0:
+        return "Clustering on packed segments does not match pairwise clustering on string sets."
+
+# benchmark of the contraction hierarchy router against the dijkstra of the TOD network
+# (MaskedGraph.shortest_path, what gap_router uses without "ch") on a synthetic network
+# sized like the MHN (random origin-destination pairs) - distances have to agree
+def run_contraction_hierarchy(args):
+
+    print("Benchmarking contraction hierarchy routing...")
+
+    num_queries = 500
+
+    G = make_synthetic_network()
+
+    rng = random.Random(1)
+    nodes = G.nodes()
+    queries = [(rng.choice(nodes), rng.choice(nodes)) for i in range(num_queries)]
+
+    start_time = time.perf_counter()
+    ch = ContractionHierarchy(G)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    ch_results = [ch.shortest_path(a, b) for a, b in queries]
+    ch_time = (time.perf_counter() - start_time) / num_queries
+
+    start_time = time.perf_counter()
+    dijkstra_results = [G.shortest_path(a, b) for a, b in queries]
+    dijkstra_time = (time.perf_counter() - start_time) / num_queries
+
+    mismatches = sum(1 for ch_result, dijkstra_result in zip(ch_results, dijkstra_results)
+                     if (ch_result == None) != (dijkstra_result == None) or
+                     (ch_result != None and abs(ch_result[0] - dijkstra_result[0]) > 1e-9))
+
+    print(f"{G.number_of_nodes()} nodes, {G.number_of_edges()} edges, {ch.num_shortcuts} shortcuts " +
+          f"built in {build_time:.1f}s")
+    print(f"per query: ch {ch_time * 1000:.3f} ms, dijkstra {dijkstra_time * 1000:.3f} ms " +
+          f"({num_queries} queries, {mismatches} distance mismatches)")
+
+    if ch_time >= dijkstra_time:
+        print("contraction hierarchy queries are not faster - no break-even point")
+    else:
+        print(f"break-even after {math.ceil(build_time / (dijkstra_time - ch_time))} queries per network")
+
+    if mismatches > 0:
+        return "Contraction hierarchy distances do not match dijkstra."
+
+# benchmark of the nearest node index against brute force on a synthetic node set the
+# size of the MHN (all nodes, most nodes available, one zone) - see tests/test_node_index.py
+# for the checks
+def run_nearest_node(args):
+
+    print("Benchmarking nearest node index...")
+
+    num_queries = 2000
+
+    node_ids, xs, ys, zones = make_synthetic_nodes()
+
+    start_time = time.perf_counter()
+    index = NodeIndex(node_ids, xs, ys)
+    build_time = time.perf_counter() - start_time
+
+    rng = random.Random(1)
+    queries = []
+    for i in range(num_queries):
+
+        x = rng.uniform(-1e5, 1.1e6)
+        y = rng.uniform(-1e5, 1.1e6)
+
+        kind = i % 3
+        if kind == 0:
+            accept = None
+        elif kind == 1:
+            # available nodes (most of the network)
+            available = set(rng.sample(node_ids, len(node_ids) * 9 // 10))
+            accept = available.__contains__
+        else:
+            # same zone (few nodes)
+            zone = rng.randrange(50)
+            accept = lambda node, zone = zone: zones[node] == zone
+
+        queries.append((x, y, accept))
+
+    start_time = time.perf_counter()
+    for x, y, accept in queries:
+        index.nearest(x, y, accept)
+    index_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for x, y, accept in queries:
+        brute_force_nearest(node_ids, xs, ys, x, y, accept)
+    brute_time = time.perf_counter() - start_time
+
+    print(f"{len(node_ids)} nodes indexed in {build_time:.2f}s")
+    print(f"per query: index {index_time / num_queries * 1000:.3f} ms, " +
+          f"brute force {brute_time / num_queries * 1000:.3f} ms ({num_queries} queries)")
+
+# benchmark of the lazy link store against building every link polyline up front (the old
+# link dict) on a synthetic regional link table: build time + memory held, and the time to
+# fetch the links of a bus day - polylines are lists of vertex tuples (what the geopackage
+# backend makes) - see tests/test_link_store.py for the checks
+def run_link_store(args):
+
+    print("Benchmarking link geometry store...")
+
+    num_inserts = 200000
+    num_used = 8000
+
+    anodes, bnodes, abbs, miles, vertices, offsets = make_synthetic_links()
+
+    def make_polyline(link_vertices):
+        return [(float(x), float(y)) for x, y in link_vertices]
+
+    # eager - polyline + attribute dict per link, stored for both directions of undirected links
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    rev_set = set(zip(anodes, bnodes))
+    link_dict = {}
+    for i in range(len(anodes)):
+        value = {"ABB": abbs[i], "GEOM": make_polyline(vertices[offsets[i]: offsets[i + 1]]),
+                 "MILES": miles[i]}
+        link_dict[(anodes[i], bnodes[i])] = value
+        if (bnodes[i], anodes[i]) not in rev_set:
+            link_dict[(bnodes[i], anodes[i])] = value
+
+    eager_time = time.perf_counter() - start_time
+    eager_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    del link_dict
+
+    # lazy - the arrays are already in memory as they come from read_geometry
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    link_store = LinkStore(anodes, bnodes, abbs, miles, vertices, offsets, make_polyline)
+
+    lazy_time = time.perf_counter() - start_time
+    lazy_mb = (tracemalloc.get_traced_memory()[0] + vertices.nbytes + offsets.nbytes) / 1e6
+    tracemalloc.stop()
+
+    # bus itinerary rows use a small part of the network, many times over
+    rng = random.Random(1)
+    used = rng.sample(range(len(anodes)), num_used)
+    requests = [rng.choice(used) for i in range(num_inserts)]
+
+    start_time = time.perf_counter()
+    for i in requests:
+        link_store.geometry(anodes[i], bnodes[i])
+    fetch_time = time.perf_counter() - start_time
+
+    print(f"{len(anodes)} links")
+    print(f"eager polylines: {eager_time:.2f}s, {eager_mb:.1f} MB")
+    print(f"lazy store: {lazy_time:.2f}s, {lazy_mb:.1f} MB (incl. vertex array)")
+    print(f"{num_inserts} itinerary geometries fetched in {fetch_time:.2f}s " +
+          f"({link_store.stats['hits']} from cache)")
+
+# benchmark of batched gap routing (one search per origin) against routing gap by gap
+# on a synthetic network sized like the MHN - see tests/test_gap_router.py for the checks
+def run_gap_batching(args):
+
+    print("Benchmarking batched gap routing...")
+
+    G = make_synthetic_network()
+    gaps = make_synthetic_gaps(G)
+
+    single = GapRouter()
+    single.set_network("scen", "tod", G)
+
+    start_time = time.perf_counter()
+    for a, b in gaps:
+        single.route(a, b)
+    single_time = time.perf_counter() - start_time
+
+    batch = GapRouter()
+    batch.set_network("scen", "tod", G)
+
+    start_time = time.perf_counter()
+    batch.route_many(gaps)
+    for a, b in gaps:
+        batch.route(a, b)
+    batch_time = time.perf_counter() - start_time
+
+    print(f"{len(gaps)} gaps, {batch.stats['pairs']} origin-destination pairs")
+    print(f"gap by gap: {single.stats['searches']} searches, {single_time:.2f}s")
+    print(f"by origin: {batch.stats['searches']} searches, {batch_time:.2f}s")
+
+# benchmark of the bulk itinerary writer against inserting segment by segment (geometry
+# from the link store cache) on synthetic links + itineraries in a geopackage
+# - see tests/test_itinerary_writer.py for the checks
+def run_itinerary_writer(args):
+
+    out_folder = args.out_folder
+    if out_folder == None:
+        out_folder = tempfile.mkdtemp()
+
+    print(f"Benchmarking itinerary writer in {out_folder}...")
+
+    storage = get_storage("gpkg")
+
+    anodes, bnodes, abbs, miles, vertices, offsets = make_synthetic_links()
+    link_store = LinkStore(anodes, bnodes, abbs, miles, vertices, offsets, storage.make_polyline)
+
+    itin_store = make_synthetic_itins(link_store)
+
+    gpkg_path = os.path.join(out_folder, "itinerary_writer.gpkg")
+    if storage.exists(gpkg_path):
+        storage.delete(gpkg_path)
+
+    workspace = storage.create_workspace(out_folder, "itinerary_writer.gpkg")
+
+    field_types = [["TRANSIT_LINE", "TEXT"], ["ITIN_ORDER", "SHORT"],
+                   ["ITIN_A", "LONG"], ["ITIN_B", "LONG"],
+                   ["ABB", "TEXT"], ["DWELL_CODE", "TEXT"],
+                   ["LINE_SERV_TIME", "FLOAT"], ["TTF", "TEXT"],
+                   ["NOTES", "TEXT"]]
+
+    single_fc = storage.create_feature_class(workspace, "itin_single", "POLYLINE", field_types)
+
+    start_time = time.perf_counter()
+    write_itins_by_segment(storage, single_fc, itin_store, link_store)
+    single_time = time.perf_counter() - start_time
+
+    writer = ItineraryWriter(link_store, storage)
+    bulk_fc = storage.create_feature_class(workspace, "itin_bulk", "POLYLINE", field_types)
+
+    link_store.reset_stats()
+    start_time = time.perf_counter()
+    records = writer.write(bulk_fc, itin_store)
+    bulk_time = time.perf_counter() - start_time
+
+    polylines = link_store.stats["requests"] - link_store.stats["hits"]
+
+    start_time = time.perf_counter()
+    writer.write_routes(workspace, "route_bulk", itin_store, records)
+    route_time = time.perf_counter() - start_time
+
+    print(f"{len(itin_store)} lines, {itin_store.num_segments} segments on {polylines} links")
+    print(f"segment by segment: {single_time:.2f}s, bulk: {bulk_time:.2f}s")
+    print(f"merged route polylines: {route_time:.2f}s")
+
+# benchmark of the GTFS ingest on synthetic feeds (same routes, trips every 10 + 30 minutes)
+# - throughput + peak memory of the ingest (outside of the network + stop index), which
+# should not grow with the number of stop times - see tests/test_gtfs_ingest.py for the checks
+def run_gtfs_ingest(args):
+
+    out_folder = args.out_folder
+    if out_folder == None:
+        out_folder = tempfile.mkdtemp()
+
+    print(f"Benchmarking GTFS ingest in {out_folder}...")
+
+    size = 100
+    link_store, G, node_index = make_synthetic_ingest_inputs(size)
+
+    for headway in [10, 30]:
+
+        feed_path = os.path.join(out_folder, f"synthetic_gtfs_{headway}.zip")
+        make_synthetic_feed(feed_path, size, num_routes = 30, headway = headway)
+
+        ingest = GtfsIngest(link_store, G, node_index, project = feet_projection, chunk_size = 10000)
+
+        tracemalloc.start()
+        start_time = time.perf_counter()
+
+        num_runs = 0
+        num_segments = 0
+
+        for run_row, itin_rows in ingest.runs(feed_path):
+            num_runs += 1
+            num_segments += len(itin_rows)
+
+        seconds = time.perf_counter() - start_time
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        stop_times = ingest.stats["stop_times"]
+        print(f"trips every {headway} min: {num_runs} runs, {stop_times} stop times, " +
+              f"{num_segments} segments in {seconds:.2f}s ({stop_times / seconds:.0f} stop times/s), " +
+              f"peak {peak_mb:.1f} MB, {ingest.stats['gaps']} gaps")
+
+# against the table of expected outcomes (modules/bus_coding.py)
+def run_bus_coding(args):
+
+    print("Checking future bus coding...")
+
+    failures = check_coding_cases()
+
+    print(f"{len(CODING_CASES) + 3} cases, {len(failures)} failures")
+    for case, result in failures:
+        print(f"{case}: got {result}")
+
+    if len(failures) > 0:
+        return "Future bus coding does not match the expected outcomes."
+
+# startup check of the entry scripts: --help has to return within the budget
+# without importing any of the heavy backends
+HEAVY_MODULES = ["arcpy", "pandas", "networkx", "numpy"]
+
+def run_startup(args):
+
+    scripts_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script_paths = []
+
+    for stage_folder in ["1_travel", "2_freight"]:
+        stage_path = os.path.join(scripts_folder, stage_folder)
+        for file_name in sorted(os.listdir(stage_path)):
+            if file_name.endswith(".py"):
+                script_paths.append(os.path.join(stage_path, file_name))
+
+    print(f"Checking startup of {len(script_paths)} scripts (budget {args.budget}s)...")
+
+    failures = 0
+
+    for script_path in script_paths:
+
+        check = (
+            "import runpy, sys, os\n"
+            f"script = {script_path!r}\n"
+            "sys.path.insert(0, os.path.dirname(script))\n"
+            "sys.argv = [script, '--help']\n"
+            "try:\n"
+            "    runpy.run_path(script, run_name = '__main__')\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+            "sys.stderr.write(','.join(loaded))\n"
+        )
+
+        start_time = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", check], capture_output = True, text = True)
+        elapsed = time.perf_counter() - start_time
+
+        script_name = os.path.relpath(script_path, scripts_folder)
+        loaded = [m for m in result.stderr.strip().split("\n")[-1].split(",") if m in HEAVY_MODULES]
+
+        status = "ok"
+        if result.returncode != 0:
+            status = "failed"
+        if elapsed > args.budget:
+            status = "OVER BUDGET"
+        if len(loaded) > 0:
+            status = f"imports {', '.join(loaded)}"
+        if status != "ok":
+            failures += 1
+
+        print(f"{script_name:>40}: {elapsed:.2f}s {status}")
+
+    if failures > 0:
+        return f"{failures} script(s) failed the startup check."
+
+BENCHMARKS = {
+    "output_sinks": run_output_sinks,
+    "emme_diff": run_emme_diff,
+    "clustering": run_clustering,
+    "contraction_hierarchy": run_contraction_hierarchy,
+    "nearest_node": run_nearest_node,
+    "link_store": run_link_store,
+    "gap_batching": run_gap_batching,
+    "itinerary_writer": run_itinerary_writer,
+    "gtfs_ingest": run_gtfs_ingest,
+    "startup": run_startup
+}
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", help="benchmark to run", choices=list(BENCHMARKS) + ["all"])
+    parser.add_argument("-o", "--out_folder", help="folder for benchmark output (default: a temp folder)")
+    parser.add_argument("-b", "--budget", help="startup budget per script in seconds",
+                        type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.out_folder != None and not os.path.isdir(args.out_folder):
+        sys.exit(f"{args.out_folder} is not a folder.")
+
+    names = list(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+
+    # every check runs - the exit code is non-zero if any of them failed
+    failures = []
+
+    for name in names:
+        failure = BENCHMARKS[name](args)
+        if failure != None:
+            print(f"FAILED: {failure}")
+            failures.append(f"{name}: {failure}")
+
+    if len(failures) > 0:
+        sys.exit(f"{len(failures)} of {len(names)} check(s) failed:\n" + "\n".join(failures))
+
+    print("Done")
+
+if __name__ == "__main__":
+    main()
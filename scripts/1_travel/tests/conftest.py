@@ -0,0 +1,9 @@
+# conftest.py
+# the tests import the processing modules like the scripts do (from modules.x import ...),
+# so scripts/1_travel goes on the path
+# author: ccai
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
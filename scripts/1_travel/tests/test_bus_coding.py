@@ -0,0 +1,64 @@
+# test_bus_coding.py
+# tests of the future bus coding parser (modules/bus_coding.py)
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import pd
+from modules.bus_coding import ALL_TODS, parse_codes, code_masks, FutureCoding
+
+# scenario codes 1-7 + 10, TOD codes 1-4
+SCENARIOS = [1, 2, 3, 4, 5, 6, 7, 10]
+TODS = [1, 2, 3, 4]
+
+# expected outcomes of parse_codes - (value, codes, expected codes)
+CODING_CASES = [
+    # concatenated digits
+    ("234567", SCENARIOS, [2, 3, 4, 5, 6, 7]),
+    ("1", SCENARIOS, [1]),
+    # whole tokens - 1 doesn't match 10
+    ("10", SCENARIOS, [10]),
+    ("2:10", SCENARIOS, [2, 10]),
+    ("1, 10", SCENARIOS, [1, 10]),
+    # unknown codes are ignored
+    ("89", SCENARIOS, []),
+    ("", SCENARIOS, []),
+    (None, SCENARIOS, []),
+    ("24", TODS, [2, 4])
+]
+
+@pytest.mark.parametrize("value, codes, expected", CODING_CASES)
+def test_parse_codes(value, codes, expected):
+    assert parse_codes(value, codes) == expected
+
+# TOD 0 = every TOD
+def test_code_masks():
+
+    assert code_masks(["0", "13", None], TODS, ALL_TODS).tolist() == [15, 5, 0]
+
+    with pytest.raises(ValueError):
+        code_masks(["1"], list(range(64)))
+
+@pytest.fixture
+def future_coding():
+
+    future_df = pd.DataFrame({"TRANSIT_LINE": ["f1", "f2", "f3", "f4"],
+                              "SCENARIO": ["1", "10", "12", "7"],
+                              "TOD": ["0", "2", "13", "0"],
+                              "REPLACE": ["B-1:B-2", "0", None, "0"],
+                              "REROUTE": ["0", "P-5", "0", "P-5"]})
+
+    return FutureCoding(future_df, SCENARIOS, TODS)
+
+# (scenario, TOD, selected rows, added lines, replaced MODERTEs, rerouting lines)
+@pytest.mark.parametrize("scen, tod, selected, add_list, replace_dict, reroute_dict", [
+    (1, 3, [True, False, True, False], ["f3"], {"f1": ["B-1", "B-2"]}, {}),
+    (10, 2, [False, True, False, False], [], {}, {"P-5": ["f2"]}),
+    (7, 4, [False, False, False, True], [], {}, {"P-5": ["f4"]}),
+    (2, 1, [False, False, True, False], ["f3"], {}, {})])
+def test_select(future_coding, scen, tod, selected, add_list, replace_dict, reroute_dict):
+
+    result = future_coding.select(scen, tod)
+
+    assert result[0].tolist() == selected
+    assert result[1:] == (add_list, replace_dict, reroute_dict)
@@ -0,0 +1,41 @@
+# test_contraction_hierarchy.py
+# tests of the contraction hierarchy router (modules/contraction_hierarchy.py) against
+# the dijkstra of the TOD network (MaskedGraph.shortest_path)
+# author: ccai
+
+import random
+
+from modules.contraction_hierarchy import ContractionHierarchy
+from modules.synthetic_data import make_synthetic_network
+
+# distances have to agree (paths may differ on ties) + ch paths have to be real paths
+def test_shortest_path_matches_dijkstra():
+
+    G = make_synthetic_network(size = 25)
+    ch = ContractionHierarchy(G)
+
+    rng = random.Random(1)
+    nodes = G.nodes()
+
+    for i in range(300):
+
+        a, b = rng.choice(nodes), rng.choice(nodes)
+        ch_result = ch.shortest_path(a, b)
+        dijkstra_result = G.shortest_path(a, b)
+
+        if dijkstra_result == None:
+            assert ch_result == None
+            continue
+
+        miles, path = ch_result
+        assert abs(miles - dijkstra_result[0]) < 1e-9
+        assert path[0] == a and path[-1] == b
+        assert abs(G.path_weight(path) - miles) < 1e-9
+
+def test_shortest_path_same_node_and_missing_node():
+
+    G = make_synthetic_network(size = 5)
+    ch = ContractionHierarchy(G)
+
+    assert ch.shortest_path(10000, 10000) == (0, [10000])
+    assert ch.shortest_path(10000, -1) == None
@@ -0,0 +1,93 @@
+# test_emme_files.py
+# tests of the batchin parsers + keyed diffs (modules/emme_files.py)
+# author: ccai
+
+import os
+
+from modules.emme_files import parse_l1, parse_l2, parse_n1, parse_linkshape, diff_folders
+from modules.synthetic_data import make_synthetic_batchin
+
+# helper function that writes a batchin file
+def write_file(folder, file_name, text):
+
+    file_path = os.path.join(folder, file_name)
+    with open(file_path, "w") as f:
+        f.write(text)
+
+    return file_path
+
+def test_parse_l1(tmp_path):
+
+    file_path = write_file(tmp_path, "10000.l1", "c a,i-node,j-node,length,modes,type,lanes,vdf\n" +
+                           "t links init\n" +
+                           "a  10001  10002 0.25 ASHThmlb  1 2  1\n" +
+                           "a    123  99999 1.5 ASH       1 3  7\n")
+
+    link_df = parse_l1(file_path)
+
+    assert link_df.to_dict("list") == {"INODE": [10001, 123], "JNODE": [10002, 99999],
+                                       "LENGTH": [0.25, 1.5], "MODES": ["ASHThmlb", "ASH"],
+                                       "TYPE": ["1", "1"], "LANES": [2.0, 3.0], "VDF": ["1", "7"]}
+
+# every attribute of an .l2 record has its own column (RRX + TIPID included)
+def test_parse_l2(tmp_path):
+
+    file_path = write_file(tmp_path, "10000.l2", "c i-node,j-node,@speed,@width,@parkl,@cltl,@toll,@sigic,@rrx,@tipid\n" +
+                           " 10001 10002 30  12  0  0  1.25  1  0  12345\n")
+
+    link_df = parse_l2(file_path)
+
+    assert link_df.iloc[0].tolist() == [10001, 10002, 30.0, 12.0, 0.0, 0.0, 1.25, 1.0, 0.0, "12345"]
+
+def test_parse_n1_centroids(tmp_path):
+
+    file_path = write_file(tmp_path, "10000.n1", "c a,node,x,y\nt nodes init\n" +
+                           "a*     12 1100000.12 1900000.5\n" +
+                           "a   10001 1102640.0 1902640.25\n")
+
+    node_df = parse_n1(file_path)
+
+    assert node_df.NODE.tolist() == [12, 10001]
+    assert node_df.CENTROID.tolist() == [1, 0]
+
+# "r a b" lines only start a link - the vertices are the "a" lines
+def test_parse_linkshape(tmp_path):
+
+    file_path = write_file(tmp_path, "highway.linkshape", "c HIGHWAY LINK SHAPE FILE\nt linkvertices\n" +
+                           "r 1 2\na 1 2 1 10.5 20.25\na 1 2 2 11 21\n" +
+                           "r 2 1\na 2 1 1 11 21\n")
+
+    shape_df = parse_linkshape(file_path)
+
+    assert shape_df[["INODE", "JNODE", "VERTEX"]].values.tolist() == [[1, 2, 1], [1, 2, 2], [2, 1, 1]]
+
+def test_parse_empty_file(tmp_path):
+
+    file_path = write_file(tmp_path, "10000.l1", "c a,i-node,j-node\nt links init\n")
+
+    assert len(parse_l1(file_path)) == 0
+
+# two runs that differ in a few links + bus segments - the diff finds exactly those
+def test_diff_folders_finds_changes(tmp_path):
+
+    old_folder = os.path.join(tmp_path, "old")
+    new_folder = os.path.join(tmp_path, "new")
+
+    make_synthetic_batchin(old_folder, scenarios = [100], num_zones = 20, num_nodes = 400,
+                           num_lines = 20, line_segments = 10)
+    changes = make_synthetic_batchin(new_folder, scenarios = [100], num_zones = 20, num_nodes = 400,
+                                     num_lines = 20, line_segments = 10, changed = True)
+
+    results = diff_folders(old_folder, new_folder)
+
+    assert len(results) == 9 * 4 + 1 + 4
+
+    for rel_path, diff in results.items():
+
+        assert not isinstance(diff, str)
+
+        num_records = 0
+        for added, removed, changed in diff.values():
+            num_records += len(added) + len(removed) + len(changed)
+
+        assert num_records == changes.get(rel_path, 0), rel_path
@@ -0,0 +1,69 @@
+# test_gap_router.py
+# tests of the gap router (modules/gap_router.py): batched routing has to give the same
+# paths as routing gap by gap + shortest paths on miles
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import np
+from modules.csr_graph import CSRGraph
+from modules.gap_router import GapRouter
+from modules.synthetic_data import make_synthetic_network, make_synthetic_gaps
+
+SIZE = 30
+
+@pytest.fixture(scope = "module")
+def network():
+
+    G = make_synthetic_network(size = SIZE)
+
+    return G, make_synthetic_gaps(G, size = SIZE, num_origins = 60)
+
+@pytest.mark.parametrize("method", ["dijkstra", "ch"])
+def test_route_many_matches_route(network, method):
+
+    G, gaps = network
+
+    single = GapRouter(method)
+    single.set_network("scen", "tod", G)
+    single_paths = [single.route(a, b) for a, b in gaps]
+
+    batch = GapRouter(method)
+    batch.set_network("scen", "tod", G)
+    batch.route_many(gaps)
+    batch_paths = [batch.route(a, b) for a, b in gaps]
+
+    assert batch.stats["hits"] == len(gaps)
+    assert method == "ch" or batch_paths == single_paths
+
+    for (a, b), path in zip(gaps, batch_paths):
+
+        result = G.shortest_path(a, b)
+
+        if result == None:
+            assert path == None
+        else:
+            assert path[0] == a and path[-1] == b
+            assert abs(G.path_weight(path) - result[0]) < 1e-9
+
+# unreachable gaps are rejected by the reachability index without a search
+def test_unreachable_gap():
+
+    csr = CSRGraph([1, 2, 4], [2, 3, 3], [1.0, 1.0, 1.0])
+    G = csr.tod_graph(np.ones(3, dtype = bool))
+
+    router = GapRouter()
+    router.set_network("scen", "tod", G)
+
+    assert router.route(1, 3) == [1, 2, 3]
+    assert router.route(1, 4) == None
+    assert router.route(1, 4) == None
+
+    assert router.stats["rejected"] == 1
+    assert router.stats["hits"] == 1
+    assert router.stats["searches"] == 1
+
+def test_unknown_router():
+
+    with pytest.raises(ValueError):
+        GapRouter("astar")
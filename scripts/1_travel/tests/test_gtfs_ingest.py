@@ -0,0 +1,69 @@
+# test_gtfs_ingest.py
+# tests of the streaming GTFS ingest (modules/gtfs_ingest.py) on a synthetic feed
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import np
+from modules.gtfs_ingest import GtfsIngest
+from modules.synthetic_data import make_synthetic_ingest_inputs, feet_projection, make_synthetic_feed
+
+SIZE = 30
+
+@pytest.fixture(scope = "module")
+def synthetic_feed(tmp_path_factory):
+
+    feed_path = str(tmp_path_factory.mktemp("gtfs") / "synthetic_gtfs.zip")
+    num_trips = make_synthetic_feed(feed_path, SIZE, num_routes = 6, headway = 60)
+
+    return make_synthetic_ingest_inputs(SIZE), feed_path, num_trips
+
+# helper function that ingests the feed - returns (ingest, [(run row, itinerary rows), ...])
+def ingest_feed(synthetic_feed, chunk_size):
+
+    (link_store, G, node_index), feed_path, num_trips = synthetic_feed
+
+    ingest = GtfsIngest(link_store, G, node_index, project = feet_projection, chunk_size = chunk_size)
+
+    return ingest, list(ingest.runs(feed_path))
+
+# every trip comes out as a run with a connected itinerary (ITIN_ORDER 1..n, each segment
+# starting where the previous one ended, segments off the links only for the stop pairs
+# without a path) + its scheduled time (90 seconds per stop pair) spread over the segments
+def test_runs_match_trips(synthetic_feed):
+
+    (link_store, G, node_index), feed_path, num_trips = synthetic_feed
+    ingest, runs = ingest_feed(synthetic_feed, 1000)
+
+    assert len(runs) == num_trips
+
+    num_off_links = 0
+
+    for run_row, itin_rows in runs:
+
+        assert [row[1] for row in itin_rows] == list(range(1, len(itin_rows) + 1))
+        assert all(row[3] == next_row[2] for row, next_row in zip(itin_rows[:-1], itin_rows[1:]))
+
+        num_off_links += sum(1 for row in itin_rows if (row[2], row[3]) not in link_store)
+
+        # a stop at the end of every stop pair (dwell code 0)
+        num_pairs = sum(1 for row in itin_rows if row[5] == "0")
+        run_minutes = sum(row[6] for row in itin_rows)
+
+        assert abs(run_minutes - num_pairs * 1.5) <= 0.005 * len(itin_rows) + 1e-6
+
+    assert num_off_links == ingest.stats["gaps"]
+
+# chunks of stop_times.txt end in the middle of trips - the runs don't depend on the chunk size
+def test_chunk_size(synthetic_feed):
+
+    ingest, runs = ingest_feed(synthetic_feed, 1000)
+    small_ingest, small_runs = ingest_feed(synthetic_feed, 7)
+
+    assert len(small_runs) == len(runs)
+    assert small_ingest.stats == ingest.stats
+
+    for (small_run_row, small_itin_rows), (run_row, itin_rows) in zip(small_runs, runs):
+        assert small_run_row[:-1] == run_row[:-1]
+        assert np.array_equal(small_run_row[-1], run_row[-1])
+        assert small_itin_rows == itin_rows
@@ -0,0 +1,68 @@
+# test_headways.py
+# tests of the headway rules (modules/headways.py)
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import pd
+from modules.headways import collapsed_run_headways, future_headways
+
+# expected outcomes of future_headways
+# (coded headway, hdwy_mult, replaced headway, mode average, maxtime, final headway)
+# replaced headway / mode average of 0 = nothing replaced / no kept runs of the mode
+HEADWAY_CASES = [
+    # coded only
+    (10, 1, 0, 15, 180, 10),
+    (10, 4, 0, 15, 720, 40),
+    # coded + replaced - the lower one
+    (10, 1, 8, 15, 180, 8),
+    (10, 3, 45, 15, 420, 30),
+    # replaced only
+    (0, 1, 12, 15, 180, 12),
+    # neither - mode average, but not below the last chance headway
+    (0, 1, 0, 120, 180, 120),
+    (0, 1, 0, 15, 180, 90),
+    (0, 1, 0, 0, 180, 90),
+    # capped at maxtime
+    (200, 1, 0, 15, 180, 180),
+    (60, 4, 0, 15, 120, 120),
+    (0, 1, 0, 15, 60, 60),
+    (0, 1, 500, 15, 420, 420)
+]
+
+@pytest.mark.parametrize("coded, hdwy_mult, replaced, mode_hdwy, maxtime, expected", HEADWAY_CASES)
+def test_future_headways(coded, hdwy_mult, replaced, mode_hdwy, maxtime, expected):
+
+    future_df = pd.DataFrame({"TRANSIT_LINE": ["f1"], "MODE": ["B"], "HEADWAY": [coded]})
+
+    replace_dict = {}
+    replaced_hdwys = pd.Series(dtype = float)
+    if replaced != 0:
+        replace_dict = {"f1": ["B-1"]}
+        replaced_hdwys = pd.Series({"B-1": replaced})
+
+    mode_hdwys = pd.Series({"B": mode_hdwy}) if mode_hdwy != 0 else pd.Series(dtype = float)
+
+    result = future_headways(future_df, replace_dict, mode_hdwys, replaced_hdwys, maxtime, hdwy_mult)
+
+    assert result.iloc[0] == expected
+
+# several replaced routes (one of them not running) - the lowest headway of the ones that run
+def test_future_headways_several_replaced_routes():
+
+    future_df = pd.DataFrame({"TRANSIT_LINE": ["f1", "f2"], "MODE": ["B", "B"], "HEADWAY": [0, 0]})
+    replace_dict = {"f1": ["B-1", "B-2", "B-9"], "f2": ["B-9"]}
+    replaced_hdwys = pd.Series({"B-1": 20, "B-2": 15})
+
+    result = future_headways(future_df, replace_dict, pd.Series({"B": 30}), replaced_hdwys, 180, 1)
+
+    assert result.tolist() == [15, 90]
+
+# average time between the runs of a group - maxtime for a group with one run
+def test_collapsed_run_headways():
+
+    runs_df = pd.DataFrame({"BUS_GROUP": [1, 2, 1, 1], "ADJ_START": [3600, 7200, 5400, 4200]})
+
+    headways = collapsed_run_headways(runs_df, 180)
+
+    assert headways.to_dict() == {1: 15.0, 2: 180}
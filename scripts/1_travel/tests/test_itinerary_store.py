@@ -0,0 +1,117 @@
+# test_itinerary_store.py
+# tests of the columnar itinerary store + reroute splicing (modules/itinerary_store.py)
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import pd
+from modules.itinerary_store import ITIN_COLUMNS, Itinerary, ItineraryStore
+
+# expected outcomes of place_reroutes + splice_many - lines + reroutes as node paths
+# (case, line, [(reroute, path), ...], expected path, expected overlapping reroutes)
+REROUTE_CASES = [
+    ("single reroute", [1, 2, 3, 4, 5], [("r1", [2, 9, 4])],
+     [1, 2, 9, 4, 5], []),
+    ("reroute that doesn't fit", [1, 2, 3, 4, 5], [("r1", [4, 9, 2])],
+     [1, 2, 3, 4, 5], []),
+    # the second reroute is placed on the original line, not behind the longer first one
+    ("two separate reroutes", [1, 2, 3, 4, 5, 6, 7], [("r1", [1, 8, 9, 3]), ("r2", [5, 10, 7])],
+     [1, 8, 9, 3, 4, 5, 10, 7], []),
+    # same reroutes, coded the other way round
+    ("two separate reroutes, last first", [1, 2, 3, 4, 5, 6, 7], [("r2", [5, 10, 7]), ("r1", [1, 8, 9, 3])],
+     [1, 8, 9, 3, 4, 5, 10, 7], []),
+    # several reroutes over the same segments - the first one coded wins
+    ("overlapping reroutes", [1, 2, 3, 4, 5, 6], [("r1", [2, 8, 4]), ("r2", [3, 9, 5])],
+     [1, 2, 8, 4, 5, 6], ["r2"]),
+    ("three reroutes, one overlapping", [1, 2, 3, 4, 5, 6, 7, 8], [("r1", [1, 9, 10, 3]), ("r2", [2, 11, 6]), ("r3", [6, 12, 8])],
+     [1, 9, 10, 3, 4, 5, 6, 12, 8], ["r2"]),
+    # a reroute ending where the next one starts shares no segment
+    ("touching reroutes", [1, 2, 3, 4, 5], [("r1", [1, 8, 3]), ("r2", [3, 9, 10, 5])],
+     [1, 8, 3, 9, 10, 5], [])
+]
+
+# helper function that makes an itinerary along a node path
+def path_itin(path):
+
+    segments = list(zip(path[:-1], path[1:]))
+    lists = {column: [None] * len(segments) for column in ITIN_COLUMNS}
+
+    lists["ITIN_A"] = [a for a, b in segments]
+    lists["ITIN_B"] = [b for a, b in segments]
+    lists["LINE_SERV_TIME"] = [0.0] * len(segments)
+
+    return Itinerary.from_lists(lists)
+
+# helper function that reroutes a line the way prepare_line_itin did before
+# place_reroutes: one splice after another, with positions looked up in the original line
+def reroute_sequential(line_itin, reroutes):
+
+    anodes = line_itin["ITIN_A"].tolist()
+    bnodes = line_itin["ITIN_B"].tolist()
+
+    for name, reroute_itin in reroutes:
+
+        start_node = reroute_itin["ITIN_A"][0]
+        end_node = reroute_itin["ITIN_B"][-1]
+
+        if start_node in anodes and end_node in bnodes:
+
+            start_index = anodes.index(start_node)
+            end_index = bnodes.index(end_node)
+
+            if start_index <= end_index:
+                line_itin = line_itin.splice(start_index, end_index + 1, reroute_itin)
+
+    return line_itin
+
+@pytest.mark.parametrize("case, path, reroute_paths, expected_path, expected_overlapping", REROUTE_CASES,
+                         ids = [case[0] for case in REROUTE_CASES])
+def test_place_reroutes(case, path, reroute_paths, expected_path, expected_overlapping):
+
+    line_itin = path_itin(path)
+    reroutes = [(name, path_itin(reroute_path)) for name, reroute_path in reroute_paths]
+
+    splices, overlapping = line_itin.place_reroutes(reroutes)
+    new_itin = line_itin.splice_many(splices)
+
+    assert list(new_itin.rows(["ITIN_A", "ITIN_B"])) == list(zip(expected_path[:-1], expected_path[1:]))
+    assert overlapping == expected_overlapping
+
+    # a single reroute is spliced like before
+    if len(reroute_paths) == 1:
+        old_itin = reroute_sequential(line_itin, reroutes)
+        assert list(old_itin.rows(["ITIN_A", "ITIN_B"])) == list(new_itin.rows(["ITIN_A", "ITIN_B"]))
+
+    # the line itinerary itself is not changed
+    assert list(line_itin.rows(["ITIN_A", "ITIN_B"])) == list(zip(path[:-1], path[1:]))
+
+# the old splicing took the positions of a second reroute from the original line + placed
+# them on the already rerouted one, which left the itinerary broken
+def test_sequential_reroutes_shift():
+
+    line_itin = path_itin([1, 2, 3, 4, 5, 6, 7])
+    reroutes = [("r1", path_itin([1, 8, 9, 3])), ("r2", path_itin([5, 10, 7]))]
+
+    old_segments = list(reroute_sequential(line_itin, reroutes).rows(["ITIN_A", "ITIN_B"]))
+
+    assert old_segments == [(1, 8), (8, 9), (9, 3), (3, 4), (5, 10), (10, 7), (6, 7)]
+
+def test_store_round_trip(tmp_path):
+
+    itin_df = pd.DataFrame({"TRANSIT_LINE": ["b2", "b1", "b1", "b2"], "ITIN_ORDER": [1, 2, 1, 2],
+                            "ITIN_A": [7, 2, 1, 8], "ITIN_B": [8, 3, 2, 9], "ABB": ["7-8-1", None, "1-2-1", "8-9-1"],
+                            "DWELL_CODE": ["0", "1", "0", "0"], "LINE_SERV_TIME": [1.0, 2.5, 0.5, 1.0],
+                            "TTF": ["1", "1", "1", "1"], "NOTES": [None, None, "x", None]})
+
+    itin_store = ItineraryStore.from_df(itin_df)
+
+    assert itin_store.lines == ["b1", "b2"]
+    assert itin_store.get("b1")["ITIN_A"].tolist() == [1, 2]
+    assert itin_store.get("b1")["ABB"].tolist() == ["1-2-1", None]
+
+    path = str(tmp_path / "itin.npz")
+    itin_store.save(path)
+
+    for store in [ItineraryStore.from_arrays(itin_store.to_arrays()), ItineraryStore.load(path)]:
+        assert store.lines == itin_store.lines
+        assert store.to_df().equals(itin_store.to_df())
@@ -0,0 +1,61 @@
+# test_itinerary_writer.py
+# tests of the bulk itinerary writer (modules/itinerary_writer.py) against inserting
+# segment by segment + joining the route vertices in python, on a geopackage
+# author: ccai
+
+import pytest
+
+from modules.itinerary_writer import ItineraryWriter
+from modules.link_store import LinkStore
+from modules.storage import get_storage
+from modules.synthetic_data import (make_synthetic_links, make_synthetic_itins, write_itins_by_segment,
+                                    join_route_vertices)
+
+FIELD_TYPES = [["TRANSIT_LINE", "TEXT"], ["ITIN_ORDER", "SHORT"],
+               ["ITIN_A", "LONG"], ["ITIN_B", "LONG"],
+               ["ABB", "TEXT"], ["DWELL_CODE", "TEXT"],
+               ["LINE_SERV_TIME", "FLOAT"], ["TTF", "TEXT"],
+               ["NOTES", "TEXT"]]
+
+@pytest.fixture(scope = "module")
+def written(tmp_path_factory):
+
+    storage = get_storage("gpkg")
+
+    anodes, bnodes, abbs, miles, vertices, offsets = make_synthetic_links(5000)
+    link_store = LinkStore(anodes, bnodes, abbs, miles, vertices, offsets, storage.make_polyline)
+    itin_store = make_synthetic_itins(link_store, num_lines = 100, num_routes = 20)
+
+    workspace = storage.create_workspace(str(tmp_path_factory.mktemp("itins")), "itinerary_writer.gpkg")
+
+    single_fc = storage.create_feature_class(workspace, "itin_single", "POLYLINE", FIELD_TYPES)
+    write_itins_by_segment(storage, single_fc, itin_store, link_store)
+
+    writer = ItineraryWriter(link_store, storage)
+    bulk_fc = storage.create_feature_class(workspace, "itin_bulk", "POLYLINE", FIELD_TYPES)
+    records = writer.write(bulk_fc, itin_store)
+    route_fc = writer.write_routes(workspace, "route_bulk", itin_store, records)
+
+    return storage, link_store, itin_store, single_fc, bulk_fc, route_fc
+
+def test_rows_match_segment_by_segment(written):
+
+    storage, link_store, itin_store, single_fc, bulk_fc, route_fc = written
+    fields = ["SHAPE@"] + [field[0] for field in FIELD_TYPES]
+
+    single_rows = list(storage.read_rows(single_fc, fields))
+    bulk_rows = list(storage.read_rows(bulk_fc, fields))
+
+    assert len(bulk_rows) == itin_store.num_segments
+    assert bulk_rows == single_rows
+
+# some lines run against the link direction + some have a false link (no geometry)
+def test_routes_match_joined_vertices(written):
+
+    storage, link_store, itin_store, single_fc, bulk_fc, route_fc = written
+
+    route_rows = {row[1]: row[0] for row in storage.read_rows(route_fc, ["SHAPE@", "TRANSIT_LINE"])}
+    routes = join_route_vertices(itin_store, link_store)
+
+    for line in itin_store:
+        assert route_rows.get(line, []) == routes[line]
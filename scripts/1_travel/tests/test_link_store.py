@@ -0,0 +1,52 @@
+# test_link_store.py
+# tests of the link vertex store (modules/link_store.py)
+# author: ccai
+
+from modules.lazy_imports import np
+from modules.link_store import LinkStore
+from modules.synthetic_data import make_synthetic_links
+
+# helper function that makes polylines like the geopackage backend
+def make_polyline(link_vertices):
+    return [(float(x), float(y)) for x, y in link_vertices]
+
+def test_geometry_matches_vertices():
+
+    anodes, bnodes, abbs, miles, vertices, offsets = make_synthetic_links(2000)
+    link_store = LinkStore(anodes, bnodes, abbs, miles, vertices, offsets, make_polyline, cache_size = 100)
+
+    for i in range(0, len(anodes), 7):
+        for cache in [True, False]:
+            geom = link_store.geometry(anodes[i], bnodes[i], cache)
+            assert geom == make_polyline(vertices[offsets[i]: offsets[i + 1]])
+
+        assert link_store.abb(anodes[i], bnodes[i]) == abbs[i]
+        assert link_store.link_miles(anodes[i], bnodes[i]) == miles[i]
+
+    assert len(link_store.cache) == 100
+
+# links without a record in the other direction can be looked up both ways
+def test_one_way_records():
+
+    vertices = np.array([[0, 0], [1, 0], [1, 0], [2, 0], [2, 0], [3, 0]], dtype = np.float64)
+    link_store = LinkStore([1, 2, 3], [2, 3, 2], ["1-2-1", "2-3-1", "3-2-1"], [1.0, 1.0, 2.0],
+                           vertices, [0, 2, 4, 6], make_polyline)
+
+    assert (2, 1) in link_store
+    assert link_store.abb(2, 1) == "1-2-1"
+    assert link_store.abb(3, 2) == "3-2-1"
+    assert (1, 3) not in link_store
+    assert len(link_store) == 4
+
+    assert link_store.find_records([1, 2, 3, 1], [2, 1, 2, 3]).tolist() == [0, 0, 2, -1]
+    assert link_store.record_geometry(-1) == None
+
+def test_arrays_round_trip():
+
+    anodes, bnodes, abbs, miles, vertices, offsets = make_synthetic_links(500)
+    link_store = LinkStore(anodes, bnodes, abbs, miles, vertices, offsets, make_polyline)
+
+    shared = LinkStore.from_arrays(link_store.to_arrays(), make_polyline)
+
+    assert shared.index == link_store.index
+    assert shared.geometry(anodes[10], bnodes[10]) == link_store.geometry(anodes[10], bnodes[10])
@@ -0,0 +1,70 @@
+# test_node_index.py
+# tests of the nearest node index (modules/node_index.py) against brute force
+# author: ccai
+
+import random
+
+import pytest
+
+from modules.node_index import NodeIndex, ZoneNodeIndex
+from modules.synthetic_data import make_synthetic_nodes, brute_force_nearest
+
+@pytest.fixture(scope = "module")
+def synthetic_nodes():
+    return make_synthetic_nodes(num_nodes = 3000, num_zones = 20)
+
+# all nodes, most nodes available + one zone (clustered nodes, distances tie)
+@pytest.mark.parametrize("kind", ["all", "available", "zone"])
+def test_nearest_matches_brute_force(synthetic_nodes, kind):
+
+    node_ids, xs, ys, zones = synthetic_nodes
+    index = NodeIndex(node_ids, xs, ys)
+
+    rng = random.Random(1)
+
+    for i in range(200):
+
+        x = rng.uniform(-1e5, 1.1e6)
+        y = rng.uniform(-1e5, 1.1e6)
+
+        if kind == "all":
+            accept = None
+        elif kind == "available":
+            available = set(rng.sample(node_ids, len(node_ids) * 9 // 10))
+            accept = available.__contains__
+        else:
+            zone = rng.randrange(21)
+            accept = lambda node: zones[node] == zone
+
+        assert index.nearest(x, y, accept) == brute_force_nearest(node_ids, xs, ys, x, y, accept)
+
+def test_zone_index_matches_brute_force(synthetic_nodes):
+
+    node_ids, xs, ys, zones = synthetic_nodes
+    zone_index = ZoneNodeIndex(node_ids, xs, ys, [zones[node] for node in node_ids])
+
+    rng = random.Random(2)
+
+    for i in range(200):
+
+        x = rng.uniform(-1e5, 1.1e6)
+        y = rng.uniform(-1e5, 1.1e6)
+        zone = rng.randrange(21)
+
+        node, distance = zone_index.nearest_with_distance(x, y, zone)
+
+        assert node == brute_force_nearest(node_ids, xs, ys, x, y, lambda node: zones[node] == zone)
+
+# ties in distance go to the lowest node id
+def test_nearest_ties_and_empty():
+
+    index = NodeIndex([5, 3, 9], [0.0, 2.0, 1.0], [0.0, 0.0, 0.0])
+
+    assert index.nearest(1.0, 0.0) == 9
+    assert index.nearest(1.0, 1.0) == 9
+    assert index.nearest(1.5, 0.0) == 3
+    assert index.nearest_with_distance(0.5, 0.0, lambda node: node != 5) == (9, 0.5)
+    assert index.nearest_to_node(5, lambda node: node != 5) == 9
+    assert index.nearest(0.0, 0.0, lambda node: False) == None
+
+    assert NodeIndex([], [], []).nearest_with_distance(0.0, 0.0) == (None, None)
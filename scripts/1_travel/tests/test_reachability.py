@@ -0,0 +1,47 @@
+# test_reachability.py
+# tests of the reachability index (modules/reachability.py) against a search of the network
+# author: ccai
+
+import random
+
+import pytest
+
+from modules.lazy_imports import np, nx
+from modules.csr_graph import CSRGraph
+from modules.reachability import ReachabilityIndex
+
+# helper function that makes a random sparse directed network with many small components
+def make_network(num_nodes = 300, num_edges = 450, seed = 1):
+
+    rng = random.Random(seed)
+    edges = [(rng.randrange(num_nodes), rng.randrange(num_nodes)) for i in range(num_edges)]
+    anodes, bnodes = zip(*edges)
+
+    csr = CSRGraph(anodes, bnodes, [1.0] * num_edges)
+
+    return csr.tod_graph(np.ones(num_edges, dtype = bool))
+
+# the bitsets + the DAG search (max_bitset_comps = 0) agree with networkx on every pair
+@pytest.mark.parametrize("max_bitset_comps", [0, 20000])
+def test_reachable(max_bitset_comps):
+
+    G = make_network()
+    reach_index = ReachabilityIndex(G, max_bitset_comps)
+    nx_G = G.to_networkx()
+
+    assert (reach_index.reach == None) == (max_bitset_comps == 0)
+
+    for a in nx_G.nodes:
+        descendants = nx.descendants(nx_G, a) | {a}
+        for b in nx_G.nodes:
+            assert reach_index.reachable(a, b) == (b in descendants)
+
+    assert reach_index.reachable(0, -1) == False
+
+def test_report():
+
+    G = make_network()
+    num_comps = nx.number_strongly_connected_components(G.to_networkx())
+
+    assert f"in {num_comps} strongly connected components" in ReachabilityIndex(G).report()[0]
+    assert "reachability by search" in ReachabilityIndex(G, 0).report()[0]
@@ -0,0 +1,72 @@
+# test_run_clustering.py
+# tests of the indexed run clustering + segment packing (modules/run_clustering.py)
+# against comparing every remaining run against the base run
+# author: ccai
+
+import pytest
+
+from modules.lazy_imports import np
+from modules.run_clustering import cluster_runs, pack_itineraries, pack_segments, min_common
+from modules.itinerary_store import ItineraryStore
+from modules.synthetic_data import make_synthetic_day, make_string_sets, pairwise_cluster_runs
+
+COLUMNS = ["ITIN_A", "ITIN_B", "DWELL_CODE"]
+
+@pytest.fixture(scope = "module")
+def synthetic_day():
+
+    lines_dict, itin_df = make_synthetic_day(num_routes = 20, runs_per_route = 60,
+                                             patterns_per_route = 8, segs_per_run = 30)
+    seg_arrays, num_seg_dict = pack_itineraries(ItineraryStore.from_df(itin_df, columns = COLUMNS))
+
+    return lines_dict, seg_arrays, make_string_sets(itin_df)
+
+@pytest.mark.parametrize("threshold", [0, 0.5, 0.85, 0.9, 1, 1.1])
+def test_cluster_runs_matches_pairwise(synthetic_day, threshold):
+
+    lines_dict, seg_arrays, seg_sets = synthetic_day
+
+    assert cluster_runs(lines_dict, seg_arrays, threshold, start_group = 7) == \
+        pairwise_cluster_runs(lines_dict, seg_sets, threshold, start_group = 7)
+
+# a run without segments is its own group + joins any base run at threshold 0
+def test_cluster_runs_empty_runs():
+
+    seg_arrays = {"a": np.array([], dtype = np.int64), "b": np.array([1, 2], dtype = np.int64),
+                  "c": np.array([], dtype = np.int64), "d": np.array([1, 2, 3], dtype = np.int64)}
+    seg_sets = {run: set(segs.tolist()) for run, segs in seg_arrays.items()}
+    lines_dict = {"B-1": ["a", "b", "c", "d"], "B-2": []}
+
+    for threshold in [0, 0.85]:
+        assert cluster_runs(lines_dict, seg_arrays, threshold) == \
+            pairwise_cluster_runs(lines_dict, seg_sets, threshold)
+
+    assert cluster_runs(lines_dict, seg_arrays, 0.85) == {"a": 1, "b": 2, "c": 3, "d": 2}
+
+# k / n >= threshold is decided like the verification step, float rounding included
+def test_min_common():
+
+    for n in range(1, 200):
+        for threshold in [0.1, 0.3, 0.7, 0.85, 0.9, 1]:
+            k = min_common(n, threshold)
+            assert k / n >= threshold
+            assert k == 0 or (k - 1) / n < threshold
+
+    assert min_common(10, 1.1) == 11
+
+def test_pack_segments():
+
+    segs = pack_segments([1, 1, (1 << 30) - 1], [2, 2, 0], ["0", "1", "0"])
+
+    assert len(set(segs.tolist())) == 3
+    assert segs[0] != segs[1]
+    assert segs[0] == pack_segments([1], [2], ["0"])[0]
+
+@pytest.mark.parametrize("itin_a, itin_b, dw_code", [
+    ([-1], [2], ["0"]),
+    ([1], [1 << 30], ["0"]),
+    (list(range(9)), list(range(9)), [str(i) for i in range(9)])])
+def test_pack_segments_out_of_range(itin_a, itin_b, dw_code):
+
+    with pytest.raises(ValueError):
+        pack_segments(itin_a, itin_b, dw_code)
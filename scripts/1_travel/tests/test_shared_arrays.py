@@ -0,0 +1,50 @@
+# test_shared_arrays.py
+# tests of the shared memory arrays (modules/shared_arrays.py)
+# author: ccai
+
+from modules.lazy_imports import np
+from modules.storage import get_storage
+from modules.shared_arrays import (SharedArrays, attach_arrays, prefix_arrays, unprefix_arrays,
+                                   table_to_arrays, table_from_arrays)
+
+def test_attach_arrays():
+
+    arrays = {"a/ids": np.arange(5, dtype = np.int64), "a/xy": np.ones((3, 2)), "b/text": np.array(["x", "yz"])}
+
+    shared = SharedArrays(prefix_arrays("store", arrays))
+
+    try:
+        shm, attached = attach_arrays(shared.spec)
+        store = unprefix_arrays("store", attached)
+
+        for name in arrays:
+            assert np.array_equal(store[name], arrays[name])
+
+        del attached, store
+        shm.close()
+    finally:
+        shared.close()
+
+# a collapsed runs table shared through arrays reads back like read_table
+# (text with nulls, floats with nulls, integers + geometry)
+def test_table_round_trip(tmp_path):
+
+    storage = get_storage("gpkg")
+    gdb = storage.create_workspace(str(tmp_path), "collapsed_routes.gdb")
+    col_fc = storage.create_feature_class(gdb, "col_base_1", "POLYLINE",
+                                          [["TRANSIT_LINE", "TEXT"], ["DESCRIPTION", "TEXT"],
+                                           ["AVG_HEADWAY", "FLOAT"], ["SPEED", "SHORT"]])
+
+    fields = ["SHAPE@", "TRANSIT_LINE", "DESCRIPTION", "AVG_HEADWAY", "SPEED"]
+    storage.write_rows(col_fc, fields, [[[(0.0, 0.0), (1.0, 2.0)], "bus1", "Route 1", 10.5, 25],
+                                        [[(3.0, 3.0), (4.0, 4.0), (5.0, 6.0)], "bus2", None, None, 30]])
+
+    runs_df = storage.read_table(col_fc, fields)
+
+    attr_df, vertices, offsets = storage.read_geometry(col_fc, fields[1:])
+    shared_df = table_from_arrays(table_to_arrays(attr_df, vertices, offsets), storage.make_polyline)
+
+    assert list(shared_df.columns) == fields
+    assert shared_df.dtypes.to_dict() == runs_df.dtypes.to_dict()
+    assert shared_df.drop(columns = "SHAPE@").equals(runs_df.drop(columns = "SHAPE@"))
+    assert shared_df["SHAPE@"].tolist() == [list(shape) for shape in runs_df["SHAPE@"]]
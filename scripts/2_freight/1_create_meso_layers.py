@@ -6,25 +6,20 @@
 import os
 import shutil
 import sys
-import arcpy
 import math
-import pandas as pd
-import networkx as nx
 import time
+import argparse
+
+# arcpy, pandas + networkx are lazy proxies (imported the first time they are used,
+# so --help and argument errors return immediately) - shared with the travel stage
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "1_travel"))
+from modules.lazy_imports import arcpy, pd, nx
 
 ## FN.py
 
 ## Based on work by kcazzato
 ## Edited by ccai (2025)
 
-import os
-import shutil
-import sys
-import arcpy
-import math
-import pandas as pd
-import networkx as nx
-
 class FreightNetwork:
 
     # constructor
@@ -612,18 +607,26 @@ class FreightNetwork:
 
         print("Final meso network created.")
 
-start_time = time.time()
+def main():
+
+    start_time = time.time()
+
+    parser = argparse.ArgumentParser()
+    parser.parse_args()
+
+    FN = FreightNetwork()
+    FN.generate_mfhn()
+    FN.check_mfn_fcs()
+    FN.create_meso_layers()
 
-FN = FreightNetwork()
-FN.generate_mfhn()
-FN.check_mfn_fcs()
-FN.create_meso_layers()
+    end_time = time.time()
+    total_time = round(end_time - start_time)
+    minutes = math.floor(total_time / 60)
+    seconds = total_time % 60
 
-end_time = time.time()
-total_time = round(end_time - start_time)
-minutes = math.floor(total_time / 60)
-seconds = total_time % 60
+    print(f"{minutes}m {seconds}s to execute.")
 
-print(f"{minutes}m {seconds}s to execute.")
+    print("Done")
 
-print("Done")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -3,117 +3,129 @@
 
 import os
 import sys
-import arcpy
 import shutil
-import pandas as pd
+import argparse
 
-print("Creating meso override file...")
+# arcpy + pandas are lazy proxies (imported the first time they are used,
+# so --help returns immediately) - shared with the travel stage
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "1_travel"))
+from modules.lazy_imports import arcpy, pd
 
-sys_path = sys.argv[0]
-abs_path = os.path.abspath(sys_path)
-mfhrn_path = os.path.dirname(os.path.dirname(os.path.dirname(abs_path)))
+def main():
 
-arcpy.env.workspace = "memory"
+    parser = argparse.ArgumentParser()
+    parser.parse_args()
 
-in_folder = os.path.join(mfhrn_path, "input")
-mhn_in_folder = os.path.join(in_folder, "1_travel")
-mhn_in_gdb = os.path.join(mhn_in_folder, "MHN.gdb")
+    print("Creating meso override file...")
 
-hwylink_fc = os.path.join(mhn_in_gdb, "hwynet/hwynet_arc")
-base_hwylink = "base_hwylink"
+    sys_path = sys.argv[0]
+    abs_path = os.path.abspath(sys_path)
+    mfhrn_path = os.path.dirname(os.path.dirname(os.path.dirname(abs_path)))
 
-arcpy.management.CopyFeatures(hwylink_fc, base_hwylink)
-arcpy.management.AddField(base_hwylink, "MESO_flag", "TEXT") # to make my life easier 
+    arcpy.env.workspace = "memory"
 
-# all links where MESO = 1
-# failsafe for centroid connectors
-where_clause = "MESO = 1 AND TYPE1 <> '6'"
-base_meso = pd.DataFrame(
-    data = [row for row in arcpy.da.SearchCursor(base_hwylink, ["ABB"], where_clause)], 
-    columns = ["ABB"]).ABB.to_list()
+    in_folder = os.path.join(mfhrn_path, "input")
+    mhn_in_folder = os.path.join(in_folder, "1_travel")
+    mhn_in_gdb = os.path.join(mhn_in_folder, "MHN.gdb")
 
-# all links where POE 
-link_df = pd.DataFrame(
-    data = [row for row in arcpy.da.SearchCursor(base_hwylink, ["ANODE", "BNODE", "ABB"])], 
-    columns = ["ANODE", "BNODE", "ABB"])
+    hwylink_fc = os.path.join(mhn_in_gdb, "hwynet/hwynet_arc")
+    base_hwylink = "base_hwylink"
 
-poe = [3634, 3636, 3639, 3640, 3641, 3642, 3643, 3644, 3647, 3648] 
-poe_meso = link_df[link_df.ANODE.isin(poe) | link_df.BNODE.isin(poe)].ABB.to_list()
+    arcpy.management.CopyFeatures(hwylink_fc, base_hwylink)
+    arcpy.management.AddField(base_hwylink, "MESO_flag", "TEXT") # to make my life easier 
 
-all_meso = set(base_meso) | set(poe_meso)
+    # all links where MESO = 1
+    # failsafe for centroid connectors
+    where_clause = "MESO = 1 AND TYPE1 <> '6'"
+    base_meso = pd.DataFrame(
+        data = [row for row in arcpy.da.SearchCursor(base_hwylink, ["ABB"], where_clause)], 
+        columns = ["ABB"]).ABB.to_list()
 
-fields = ["ABB", "MESO_flag"]
-with arcpy.da.UpdateCursor(base_hwylink, fields) as ucursor:
-    for row in ucursor:
+    # all links where POE 
+    link_df = pd.DataFrame(
+        data = [row for row in arcpy.da.SearchCursor(base_hwylink, ["ANODE", "BNODE", "ABB"])], 
+        columns = ["ANODE", "BNODE", "ABB"])
 
-        abb = row[0]
-        if abb in base_meso:
-            row[1] = "base_meso"
-        if abb in poe_meso:
-            row[1] = "poe_meso"
+    poe = [3634, 3636, 3639, 3640, 3641, 3642, 3643, 3644, 3647, 3648] 
+    poe_meso = link_df[link_df.ANODE.isin(poe) | link_df.BNODE.isin(poe)].ABB.to_list()
 
-        ucursor.updateRow(row)
+    all_meso = set(base_meso) | set(poe_meso)
 
-arcpy.management.MakeFeatureLayer(base_hwylink, "meso_links", "MESO_flag IS NOT NULL")
-arcpy.analysis.PairwiseBuffer("meso_links", "meso_buffer_draft", "10 Feet")
-arcpy.management.DeleteField("meso_buffer_draft", ["ABB", "MESO_flag"], method = "KEEP_FIELDS")
+    fields = ["ABB", "MESO_flag"]
+    with arcpy.da.UpdateCursor(base_hwylink, fields) as ucursor:
+        for row in ucursor:
 
-arcpy.management.MakeFeatureLayer(base_hwylink, "non_meso_links", "MESO_flag IS NULL")
-arcpy.analysis.PairwiseBuffer("non_meso_links", "non_meso_buffer", "5 Feet")
-arcpy.analysis.PairwiseErase("meso_buffer_draft", "non_meso_buffer", "meso_buffer")
+            abb = row[0]
+            if abb in base_meso:
+                row[1] = "base_meso"
+            if abb in poe_meso:
+                row[1] = "poe_meso"
 
-arcpy.management.AddFields("meso_buffer", [["USE", "SHORT"]])
-arcpy.management.CalculateField("meso_buffer", "USE", "1")
+            ucursor.updateRow(row)
 
-out_folder = os.path.join(mfhrn_path, "output")
+    arcpy.management.MakeFeatureLayer(base_hwylink, "meso_links", "MESO_flag IS NOT NULL")
+    arcpy.analysis.PairwiseBuffer("meso_links", "meso_buffer_draft", "10 Feet")
+    arcpy.management.DeleteField("meso_buffer_draft", ["ABB", "MESO_flag"], method = "KEEP_FIELDS")
 
-if os.path.isdir(out_folder) != True:
-    os.mkdir(out_folder)
+    arcpy.management.MakeFeatureLayer(base_hwylink, "non_meso_links", "MESO_flag IS NULL")
+    arcpy.analysis.PairwiseBuffer("non_meso_links", "non_meso_buffer", "5 Feet")
+    arcpy.analysis.PairwiseErase("meso_buffer_draft", "non_meso_buffer", "meso_buffer")
 
-mfn_out_folder = os.path.join(out_folder, "2_freight")
+    arcpy.management.AddFields("meso_buffer", [["USE", "SHORT"]])
+    arcpy.management.CalculateField("meso_buffer", "USE", "1")
 
-if os.path.isdir(mfn_out_folder) == True:
-    shutil.rmtree(mfn_out_folder)
+    out_folder = os.path.join(mfhrn_path, "output")
 
-os.mkdir(mfn_out_folder)
+    if os.path.isdir(out_folder) != True:
+        os.mkdir(out_folder)
 
-# find any issues with the override file
-override_file_creation_errors = os.path.join(
-    mfn_out_folder, 
-    "override_file_creation_errors.txt")
+    mfn_out_folder = os.path.join(out_folder, "2_freight")
 
-arcpy.management.MakeFeatureLayer(base_hwylink, "all_links")
-arcpy.management.MakeFeatureLayer("meso_buffer", "meso_buffer_layer")
-arcpy.management.SelectLayerByLocation("all_links", "INTERSECT", "meso_buffer_layer")
-arcpy.management.CopyFeatures("all_links", "override_meso_links")
+    if os.path.isdir(mfn_out_folder) == True:
+        shutil.rmtree(mfn_out_folder)
 
-arcpy.management.Delete("meso_links")
-arcpy.management.Delete("non_meso_links")
-arcpy.management.Delete("all_links")
-arcpy.management.Delete("meso_buffer_layer")
+    os.mkdir(mfn_out_folder)
 
-override_meso = pd.DataFrame(
-    data = [row for row in arcpy.da.SearchCursor("override_meso_links", ["ABB"])], 
-    columns = ["ABB"]).ABB.to_list()
-override_meso = set(override_meso)
+    # find any issues with the override file
+    override_file_creation_errors = os.path.join(
+        mfn_out_folder, 
+        "override_file_creation_errors.txt")
 
-error_file= open(override_file_creation_errors, "a")
+    arcpy.management.MakeFeatureLayer(base_hwylink, "all_links")
+    arcpy.management.MakeFeatureLayer("meso_buffer", "meso_buffer_layer")
+    arcpy.management.SelectLayerByLocation("all_links", "INTERSECT", "meso_buffer_layer")
+    arcpy.management.CopyFeatures("all_links", "override_meso_links")
 
-# get meso links which weren't selected by the override file 
-missed_meso = all_meso - override_meso
-error_file.write(f"{len(missed_meso)} links are MESO but are not selected by the override.\n")
-error_file.write(str(missed_meso) + "\n")
+    arcpy.management.Delete("meso_links")
+    arcpy.management.Delete("non_meso_links")
+    arcpy.management.Delete("all_links")
+    arcpy.management.Delete("meso_buffer_layer")
 
-# get links which are not meso but were selected by the override file
-extra_meso = override_meso - all_meso
-error_file.write(f"{len(extra_meso)} links are not MESO but are selected by the override.\n")
-error_file.write(str(extra_meso) + "\n")
+    override_meso = pd.DataFrame(
+        data = [row for row in arcpy.da.SearchCursor("override_meso_links", ["ABB"])], 
+        columns = ["ABB"]).ABB.to_list()
+    override_meso = set(override_meso)
 
-error_file.close()
+    error_file= open(override_file_creation_errors, "a")
 
-override_meso_folder = os.path.join(mfn_out_folder, "override_meso")
-os.mkdir(override_meso_folder)
+    # get meso links which weren't selected by the override file 
+    missed_meso = all_meso - override_meso
+    error_file.write(f"{len(missed_meso)} links are MESO but are not selected by the override.\n")
+    error_file.write(str(missed_meso) + "\n")
 
-override_meso_shp = os.path.join(override_meso_folder, "override_meso.shp")
-arcpy.management.CopyFeatures("meso_buffer", override_meso_shp)
-print("Meso override file created.")
\ No newline at end of file
+    # get links which are not meso but were selected by the override file
+    extra_meso = override_meso - all_meso
+    error_file.write(f"{len(extra_meso)} links are not MESO but are selected by the override.\n")
+    error_file.write(str(extra_meso) + "\n")
+
+    error_file.close()
+
+    override_meso_folder = os.path.join(mfn_out_folder, "override_meso")
+    os.mkdir(override_meso_folder)
+
+    override_meso_shp = os.path.join(override_meso_folder, "override_meso.shp")
+    arcpy.management.CopyFeatures("meso_buffer", override_meso_shp)
+    print("Meso override file created.")
+
+if __name__ == "__main__":
+    main()